@@ -1,23 +1,29 @@
-import json
-from langchain_openai import ChatOpenAI
+import asyncio
+import os
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from langchain.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage
 from schemas.state import AgentState, EvaluationStatus
+from utils.llm_gateway import get_llm
+from utils.llm_cache import cached_invoke, acached_invoke, acache_lookup, acache_store
+from utils.llm_utils import estimate_tokens, truncate_tokens
+from utils.cv_compressor import compress_cv, job_description_token_budget
+from utils.skill_matcher import (
+    get_skill_matcher, prefilter_enabled, prefilter_min_recognized, prefilter_min_requirements, prefilter_stats
+)
+from utils.structured_output import needs_repair, parse_structured, validate_items
+from schemas.llm_outputs import CVEvaluation, CVBatchEntry, CVBatchEvaluation
+from utils.model_cascade import CascadeConfig, TRIAGE, ESCALATION, cascade_stats, get_cascade_policy
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.3)
+# Initialize LLM (calls go through the shared gateway: pooled client, rate limits, retries)
+llm = get_llm("cv_evaluator", model="gpt-4-turbo", temperature=0.3, json_mode=True)
 
-def evaluate_cv_node(state: AgentState) -> dict:
-    """
-    Node that evaluates the CV and returns initial score
-    
-    Input: cv_text, job_requirements, job_description
-    Output: cv_score, should_continue_technical, status
-    """
-    
-    prompt = ChatPromptTemplate.from_template("""
+CV_EVALUATION_PROMPT = ChatPromptTemplate.from_template("""
     EXPERT RECRUITER: Evaluate this CV for the position
 
     CANDIDATE CV:
@@ -44,46 +50,471 @@ def evaluate_cv_node(state: AgentState) -> dict:
       "continue": true/false
     }}
     """)
-    
-    chain = prompt | llm
-    
+
+def _cv_prompt_inputs(state: AgentState) -> dict:
+    """
+    Build the prompt variables for the CV evaluation chain
+
+    The CV is compressed to CV_PROMPT_TOKEN_BUDGET keeping the sections
+    most relevant to the job requirements; the description is cut to
+    JOB_DESCRIPTION_TOKEN_BUDGET
+    """
+    return {
+        "cv_text": compress_cv(state.cv_text, state.job_requirements).text,
+        "job_requirements": ", ".join(state.job_requirements),
+        "job_description": truncate_tokens(state.job_description, job_description_token_budget())
+    }
+
+def _cv_output(evaluation: CVEvaluation) -> dict:
+    """Node output from one parsed CV evaluation"""
+    cv_score = evaluation.score
+    should_continue = evaluation.continue_ if evaluation.continue_ is not None else cv_score >= 50
+
+    logger.info(f"CV Score: {cv_score}, Continue: {should_continue}")
+
+    return {
+        "cv_score": cv_score,
+        "should_continue_technical": should_continue,
+        "status": EvaluationStatus.TECHNICAL_INTERVIEW if should_continue
+                 else EvaluationStatus.SCORING,
+        "notes": f"CV Score: {cv_score}. Skills: {evaluation.skills_found}"
+    }
+
+def _parse_cv_response(response) -> dict:
+    """Turn the raw LLM response into the node output"""
+    return _cv_output(parse_structured(response, CVEvaluation, node="evaluate_cv"))
+
+def _prefilter_output(state: AgentState):
+    """
+    Local skill match run before the LLM
+
+    Returns the node output for a clear reject, None when the CV should
+    go to the LLM. A wrong local reject costs far more than an LLM call,
+    so a CV is only rejected when it meets none of the requirements and
+    at least SKILL_PREFILTER_MIN_REQUIREMENTS of them name a known skill
+    (and no fewer than a SKILL_PREFILTER_MIN_RECOGNIZED share)
+    """
+    if not prefilter_enabled() or not state.job_requirements:
+        return None
+
+    match = get_skill_matcher(state.job_requirements).match(state.cv_text)
+    checked = len(match.matched) + len(match.missing)
+    if checked < prefilter_min_requirements() or match.recognized < prefilter_min_recognized():
+        prefilter_stats.record_skipped()
+        return None
+
+    rejected = not match.matched
+    prefilter_stats.record(match.coverage, rejected)
+
+    if not rejected:
+        return None
+
+    cv_score = round(match.coverage * 100, 2)
+    logger.info(f"Pre-filter reject: coverage {match.coverage:.2f}, missing {match.missing}")
+
+    return {
+        "cv_score": cv_score,
+        "should_continue_technical": False,
+        "prefiltered": True,
+        "status": EvaluationStatus.SCORING,
+        "notes": f"CV Score: {cv_score}. Pre-filter reject, missing requirements: {match.missing}"
+    }
+
+def _cv_error_output(state: AgentState, e: Exception) -> dict:
+    """Node output when the CV evaluation fails"""
+    logger.error(f"CV evaluation error: {e}")
+    return {
+        "cv_score": 0,
+        "should_continue_technical": False,
+        "status": EvaluationStatus.FAILED,
+        "errors": [f"CV evaluation error: {str(e)}"]
+    }
+
+# ============== MODEL CASCADE ==============
+
+@lru_cache(maxsize=None)
+def _tier_llm(tier: str, model: str):
+    """Chat model of a cascade tier (own caller name in /llm/stats)"""
+    return get_llm(f"cv_evaluator_{tier}", model=model, temperature=0.3, json_mode=True)
+
+def _cascade_config(state: AgentState) -> Optional[CascadeConfig]:
+    """Cascade settings of the state's company, None when it is off"""
+    config = get_cascade_policy().for_company(state.company_id)
+    return config if config.enabled else None
+
+def _tier_parse(tier: str, model: str, usage: Dict[str, Any]) -> Callable:
+    """Parser recording the tier's answer; usage receives the answer's token counts"""
+    started = time.perf_counter()
+
+    def parse(response):
+        usage.update(getattr(response, "usage_metadata", None) or {})
+        cascade_stats.record_call(tier, model, time.perf_counter() - started, usage or None)
+        return _parse_cv_response(response)
+
+    return parse
+
+def _triage_output(config: CascadeConfig, output: dict) -> dict:
+    return {**output, "notes": f"{output['notes']}. Triage: {config.triage_model}"}
+
+def _escalated_output(config: CascadeConfig, output: dict, triage_score: Optional[float]) -> dict:
+    triage = f"triage {config.triage_model} scored {triage_score}" if triage_score is not None else "triage failed"
+    return {**output, "notes": f"{output['notes']}. Escalated to {config.escalation_model} ({triage})"}
+
+def _settles(config: CascadeConfig, triage: Optional[dict]) -> bool:
+    """Whether the triage answer is kept: outside the uncertainty band"""
+    return triage is not None and not config.in_band(triage["cv_score"])
+
+def _evaluate_cv_cascade(state: AgentState, config: CascadeConfig) -> dict:
+    """
+    Score with the triage model, escalate borderline scores
+
+    A triage call that fails or doesn't parse escalates too, so the
+    cascade never answers worse than the escalation model alone
+    """
+    inputs = _cv_prompt_inputs(state)
+    triage, usage = None, {}
+    try:
+        triage = cached_invoke(
+            CV_EVALUATION_PROMPT, _tier_llm(TRIAGE, config.triage_model), inputs,
+            parse=_tier_parse(TRIAGE, config.triage_model, usage), bypass=state.bypass_cache
+        )
+    except Exception as e:
+        logger.warning(f"Triage CV evaluation failed, escalating: {e}")
+
+    if _settles(config, triage):
+        cascade_stats.record_decision(config, triage["cv_score"], usage)
+        return _triage_output(config, triage)
+
+    triage_score = triage["cv_score"] if triage else None
+    try:
+        output = cached_invoke(
+            CV_EVALUATION_PROMPT, _tier_llm(ESCALATION, config.escalation_model), inputs,
+            parse=_tier_parse(ESCALATION, config.escalation_model, {}), bypass=state.bypass_cache
+        )
+    except Exception as e:
+        cascade_stats.record_decision(config, triage_score, escalated=True)
+        return _cv_error_output(state, e)
+
+    cascade_stats.record_decision(config, triage_score, escalated=True, final_score=output["cv_score"])
+    return _escalated_output(config, output, triage_score)
+
+async def _aescalate(state: AgentState, config: CascadeConfig, triage_score: Optional[float]) -> dict:
+    try:
+        output = await acached_invoke(
+            CV_EVALUATION_PROMPT, _tier_llm(ESCALATION, config.escalation_model), _cv_prompt_inputs(state),
+            parse=_tier_parse(ESCALATION, config.escalation_model, {}), bypass=state.bypass_cache
+        )
+    except Exception as e:
+        cascade_stats.record_decision(config, triage_score, escalated=True)
+        return _cv_error_output(state, e)
+
+    cascade_stats.record_decision(config, triage_score, escalated=True, final_score=output["cv_score"])
+    return _escalated_output(config, output, triage_score)
+
+async def _aevaluate_cv_cascade(state: AgentState, config: CascadeConfig) -> dict:
+    """Async variant of _evaluate_cv_cascade"""
+    triage, usage = None, {}
+    try:
+        triage = await acached_invoke(
+            CV_EVALUATION_PROMPT, _tier_llm(TRIAGE, config.triage_model), _cv_prompt_inputs(state),
+            parse=_tier_parse(TRIAGE, config.triage_model, usage), bypass=state.bypass_cache
+        )
+    except Exception as e:
+        logger.warning(f"Triage CV evaluation failed, escalating: {e}")
+
+    if _settles(config, triage):
+        cascade_stats.record_decision(config, triage["cv_score"], usage)
+        return _triage_output(config, triage)
+
+    return await _aescalate(state, config, triage["cv_score"] if triage else None)
+
+def evaluate_cv_node(state: AgentState) -> dict:
+    """
+    Node that evaluates the CV and returns initial score
+
+    Input: cv_text, job_requirements, job_description
+    Output: cv_score, should_continue_technical, status
+
+    CVs matching almost none of the requirements are rejected locally,
+    without an LLM call. Companies with the model cascade enabled are
+    scored by the cheap triage model first, escalating borderline CVs.
+    Responses are served from the LLM cache unless state.bypass_cache
+    """
+
+    # CV already scored upstream by aevaluate_cv_batch
+    if state.cv_score is not None:
+        return {"current_step": "evaluate_cv"}
+
+    rejected = _prefilter_output(state)
+    if rejected:
+        return rejected
+
+    config = _cascade_config(state)
+    if config:
+        return _evaluate_cv_cascade(state, config)
+
+    try:
+        return cached_invoke(
+            CV_EVALUATION_PROMPT, llm, _cv_prompt_inputs(state),
+            parse=_parse_cv_response, bypass=state.bypass_cache
+        )
+
+    except Exception as e:
+        return _cv_error_output(state, e)
+
+async def aevaluate_cv_node(state: AgentState) -> dict:
+    """
+    Async variant of evaluate_cv_node, awaits the LLM without blocking the event loop
+    """
+
+    # CV already scored upstream by aevaluate_cv_batch
+    if state.cv_score is not None:
+        return {"current_step": "evaluate_cv"}
+
+    rejected = _prefilter_output(state)
+    if rejected:
+        return rejected
+
+    return await _aevaluate_cv_single(state)
+
+async def _aevaluate_cv_single(state: AgentState) -> dict:
+    config = _cascade_config(state)
+    if config:
+        return await _aevaluate_cv_cascade(state, config)
+
+    try:
+        return await acached_invoke(
+            CV_EVALUATION_PROMPT, llm, _cv_prompt_inputs(state),
+            parse=_parse_cv_response, bypass=state.bypass_cache
+        )
+
+    except Exception as e:
+        return _cv_error_output(state, e)
+
+# ============== BATCHED EVALUATION ==============
+
+BATCH_CV_EVALUATION_PROMPT = ChatPromptTemplate.from_template("""
+    EXPERT RECRUITER: Evaluate each of these CVs for the same position
+
+    POSITION REQUIRED:
+    {job_requirements}
+
+    JOB DESCRIPTION:
+    {job_description}
+
+    CANDIDATES:
+    {candidates}
+
+    ANALYSIS, for EACH candidate independently:
+    1. Score CV (0-100) based on match with requirements
+    2. Skills detected
+    3. Knowledge gaps
+    4. Should continue to technical interview?
+
+    RESPOND IN VALID JSON ONLY, an object whose "candidates" array has one
+    object per candidate, using the ref given in each candidate header:
+    {{
+      "candidates": [
+        {{
+          "ref": "C1",
+          "score": 0-100,
+          "skills_found": ["skill1", "skill2"],
+          "gaps": ["gap1"],
+          "summary": "Brief analysis",
+          "continue": true/false
+        }}
+      ]
+    }}
+    """)
+
+def _cv_batch_budget() -> int:
+    return int(os.getenv("CV_BATCH_TOKEN_BUDGET", "6000"))
+
+def _cv_batch_max_size() -> int:
+    return int(os.getenv("CV_BATCH_MAX_SIZE", "8"))
+
+def _pack_cv_batches(states: List[AgentState]) -> List[List[int]]:
+    """
+    Group state indexes into prompts that fit CV_BATCH_TOKEN_BUDGET
+
+    All states share the job, so the fixed part of the prompt is only
+    counted once per batch
+    """
+    first = _cv_prompt_inputs(states[0])
+    overhead = estimate_tokens(
+        BATCH_CV_EVALUATION_PROMPT.format(
+            job_requirements=first["job_requirements"],
+            job_description=first["job_description"],
+            candidates=""
+        )
+    )
+    # Room for the answer object of each candidate
+    per_candidate_output = 80
+
+    budget = _cv_batch_budget()
+    max_size = _cv_batch_max_size()
+    batches, current, used = [], [], overhead
+
+    for i, state in enumerate(states):
+        cost = estimate_tokens(_cv_prompt_inputs(state)["cv_text"]) + per_candidate_output
+        if current and (used + cost > budget or len(current) >= max_size):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+def _batch_candidate(ref: str, cv_text: str) -> str:
+    return f"### CANDIDATE ref={ref}\n{cv_text}"
+
+def _cv_batch_entry_inputs(state: AgentState) -> dict:
+    """
+    Batch prompt inputs with this CV alone as C1
+
+    Cache key of the CV's batched evaluation: kept apart from the single
+    prompt's entries, which that prompt never produced, and invalidated
+    by changes to the batch prompt
+    """
+    inputs = _cv_prompt_inputs(state)
+    return {
+        "job_requirements": inputs["job_requirements"],
+        "job_description": inputs["job_description"],
+        "candidates": _batch_candidate("C1", inputs["cv_text"])
+    }
+
+def _parse_cv_batch_response(response) -> Dict[str, CVBatchEntry]:
+    """ref -> parsed evaluation, skipping malformed entries"""
+    batch = parse_structured(response, CVBatchEvaluation, node="evaluate_cv_batch")
+    entries = validate_items(batch.candidates, CVBatchEntry, node="evaluate_cv_batch")
+    return {entry.ref: entry for entry in entries if entry is not None}
+
+async def _aevaluate_cv_chunk(states: List[AgentState], batch_llm=None,
+                              config: Optional[CascadeConfig] = None) -> Tuple[List[Optional[dict]], Dict[str, float]]:
+    """
+    One LLM call for a chunk of CVs; None for entries that didn't parse
+
+    Also returns each entry's share of the call's token usage. With a
+    cascade config, batch_llm is the triage model and the call is
+    recorded as a triage call
+    """
+    batch_llm = batch_llm or llm
+    candidates = "\n\n".join(
+        _batch_candidate(f"C{n + 1}", _cv_prompt_inputs(state)["cv_text"])
+        for n, state in enumerate(states)
+    )
+    first = _cv_prompt_inputs(states[0])
+
     try:
-        response = chain.invoke({
-            "cv_text": state.cv_text[:2000],  # Limit size
-            "job_requirements": ", ".join(state.job_requirements),
-            "job_description": state.job_description[:500]
+        started = time.perf_counter()
+        response = await (BATCH_CV_EVALUATION_PROMPT | batch_llm).ainvoke({
+            "job_requirements": first["job_requirements"],
+            "job_description": first["job_description"],
+            "candidates": candidates
         })
-        
-        # Clean response
-        content = response.content.strip()
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:].strip()
-            content = content.rstrip("```").strip()
-        
-        result = json.loads(content)
-        cv_score = float(result.get("score", 0))
-        should_continue = result.get("continue", cv_score >= 50)
-        
-        logger.info(f"CV Score: {cv_score}, Continue: {should_continue}")
-        
-        return {
-            "cv_score": cv_score,
-            "should_continue_technical": should_continue,
-            "status": EvaluationStatus.TECHNICAL_INTERVIEW if should_continue 
-                     else EvaluationStatus.SCORING,
-            "notes": f"CV Score: {cv_score}. Skills: {result.get('skills_found', [])}"
-        }
-    
+        usage = getattr(response, "usage_metadata", None) or {}
+        if config:
+            cascade_stats.record_call(TRIAGE, config.triage_model, time.perf_counter() - started, usage or None)
+        by_ref = _parse_cv_batch_response(response)
+        repaired = needs_repair(response.content)
     except Exception as e:
-        logger.error(f"CV evaluation error: {e}")
-        return {
-            "cv_score": 0,
-            "should_continue_technical": False,
-            "status": EvaluationStatus.FAILED,
-            "errors": state.errors + [f"CV evaluation error: {str(e)}"]
-        }
+        logger.warning(f"Batched CV evaluation failed, falling back to single calls: {e}")
+        return [None] * len(states), {}
+
+    outputs = []
+    for n, state in enumerate(states):
+        entry = by_ref.get(f"C{n + 1}")
+        if entry is None:
+            outputs.append(None)
+            continue
+        # Later batches with this CV and job are answered from the cache;
+        # a repaired (likely truncated) answer is not worth replaying
+        if not repaired:
+            await acache_store(
+                BATCH_CV_EVALUATION_PROMPT, batch_llm, _cv_batch_entry_inputs(state),
+                entry.model_dump_json(by_alias=True, exclude={"ref"})
+            )
+        outputs.append(_cv_output(entry))
+    share = {key: value / len(states) for key, value in usage.items() if key in ("input_tokens", "output_tokens")}
+    return outputs, share
+
+async def aevaluate_cv_batch(states: List[AgentState]) -> List[dict]:
+    """
+    Evaluate several CVs for the same job with as few LLM calls as possible
+
+    Pre-filter rejects and CVs already evaluated in an earlier batch
+    (cached under the batch prompt) are resolved locally; the
+    rest is packed N per prompt within CV_BATCH_TOKEN_BUDGET. Entries
+    missing from, or malformed in, the batched answer fall back to a
+    single evaluate call. With the model cascade enabled for the
+    company, the batched prompts go to the triage model and borderline
+    entries are escalated one by one. Returns one evaluate_cv node
+    output per state, in input order
+    """
+    config = _cascade_config(states[0])
+    batch_llm = _tier_llm(TRIAGE, config.triage_model) if config else llm
+    outputs: List[Optional[dict]] = [None] * len(states)
+    usage_shares: Dict[int, Dict[str, float]] = {}
+    pending: List[int] = []
+    triaged: List[int] = []
+
+    for i, state in enumerate(states):
+        rejected = _prefilter_output(state)
+        if rejected:
+            outputs[i] = rejected
+            continue
+
+        if not state.bypass_cache:
+            cached = await acache_lookup(BATCH_CV_EVALUATION_PROMPT, batch_llm, _cv_batch_entry_inputs(state))
+            if cached is not None:
+                try:
+                    outputs[i] = _parse_cv_response(AIMessage(content=cached))
+                    if config:
+                        cascade_stats.record_call(TRIAGE, config.triage_model, 0.0, None)
+                    triaged.append(i)
+                    continue
+                except Exception:
+                    pass
+
+        pending.append(i)
+
+    if pending:
+        pending_states = [states[i] for i in pending]
+        chunks = _pack_cv_batches(pending_states)
+        results = await asyncio.gather(*(
+            _aevaluate_cv_chunk([pending_states[j] for j in chunk], batch_llm, config) for chunk in chunks
+        ))
+        for chunk, (chunk_outputs, share) in zip(chunks, results):
+            for j, output in zip(chunk, chunk_outputs):
+                outputs[pending[j]] = output
+                if output is not None:
+                    usage_shares[pending[j]] = share
+                    triaged.append(pending[j])
+
+    fallback = [i for i in pending if outputs[i] is None]
+    if fallback:
+        logger.info(f"Batched CV evaluation: {len(fallback)}/{len(states)} entries fall back to single calls")
+        singles = await asyncio.gather(*(_aevaluate_cv_single(states[i]) for i in fallback))
+        for i, output in zip(fallback, singles):
+            outputs[i] = output
+
+    if config:
+        escalate = []
+        for i in triaged:
+            if _settles(config, outputs[i]):
+                cascade_stats.record_decision(config, outputs[i]["cv_score"], usage_shares.get(i))
+                outputs[i] = _triage_output(config, outputs[i])
+            else:
+                escalate.append(i)
+        escalated = await asyncio.gather(*(
+            _aescalate(states[i], config, outputs[i]["cv_score"]) for i in escalate
+        ))
+        for i, output in zip(escalate, escalated):
+            outputs[i] = output
+
+    return outputs
 
 def should_continue_to_interview(state: AgentState) -> bool:
     """
@@ -1,32 +1,19 @@
-import json
-from langchain_openai import ChatOpenAI
+import os
+from typing import List
 from langchain.prompts import ChatPromptTemplate
-from schemas.state import AgentState, EvaluationStatus
+from schemas.state import AgentState
+from utils.llm_gateway import get_llm
+from utils.structured_output import parse_structured
+from schemas.llm_outputs import QuestionOutput, QuestionListOutput
+from utils.question_bank import BehavioralQuestionPool, TechnicalQuestionBank, difficulty_band
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.7)
+# Initialize LLM (calls go through the shared gateway: pooled client, rate limits, retries)
+llm = get_llm("interviewer", model="gpt-4-turbo", temperature=0.7, json_mode=True)
 
-def ask_technical_question_node(state: AgentState) -> dict:
-    """
-    Node that generates technical interview questions
-    
-    Input: job_requirements, cv_score, previous_questions
-    Output: questions_asked list
-    """
-    
-    num_tech_questions = len([
-        q for q in state.questions_asked 
-        if "técnica" in q.lower() or "technical" in q.lower()
-    ])
-    
-    # Stop if enough technical questions
-    if num_tech_questions >= 3:
-        return {"status": EvaluationStatus.BEHAVIORAL_INTERVIEW}
-    
-    prompt = ChatPromptTemplate.from_template("""
+TECHNICAL_QUESTION_PROMPT = ChatPromptTemplate.from_template("""
     TECHNICAL INTERVIEWER: Generate one technical question
 
     CONTEXT:
@@ -36,90 +23,219 @@ def ask_technical_question_node(state: AgentState) -> dict:
     - Question #{question_number}
 
     Generate ONE NEW technical question appropriate for the level.
-    
+
     RESPOND IN JSON:
     {{"question": "Your question here?"}}
     """)
-    
-    chain = prompt | llm
-    
+
+TECHNICAL_BANK_PROMPT = ChatPromptTemplate.from_template("""
+    TECHNICAL INTERVIEWER: Generate {count} technical questions
+
+    CONTEXT:
+    - Position: {job_requirements}
+    - Candidate level: {band}
+
+    Generate {count} DIFFERENT technical questions appropriate for the level,
+    covering the position requirements.
+
+    RESPOND IN JSON:
+    {{"questions": ["Your question here?"]}}
+    """)
+
+BEHAVIORAL_POOL_PROMPT = ChatPromptTemplate.from_template("""
+    BEHAVIORAL INTERVIEWER: Generate {count} behavioral questions
+
+    Generate {count} NEW, varied behavioral questions to assess soft skills
+    and adaptability. Do not repeat any of these existing questions:
+    {existing_questions}
+
+    RESPOND IN JSON:
+    {{"questions": ["Your question here?"]}}
+    """)
+
+def _parse_question(response) -> str:
+    """Extract the generated question from the LLM response"""
+    return parse_structured(response, QuestionOutput, node="technical_question").question
+
+def _parse_question_list(response, node: str) -> List[str]:
+    """Extract a {"questions": [...]} list from the LLM response"""
+    return parse_structured(response, QuestionListOutput, node=node).questions
+
+def _count_technical_questions(state: AgentState) -> int:
+    return len([
+        q for q in state.questions_asked
+        if "técnica" in q.lower() or "technical" in q.lower()
+    ])
+
+def _count_behavioral_questions(state: AgentState) -> int:
+    return len([
+        q for q in state.questions_asked
+        if "behavior" in q.lower() or "conflicto" in q.lower()
+    ])
+
+def _technical_prompt_inputs(state: AgentState, num_tech_questions: int) -> dict:
+    return {
+        "job_requirements": ", ".join(state.job_requirements),
+        "cv_score": state.cv_score or 0,
+        "previous_questions": state.questions_asked[-2:] if state.questions_asked else [],
+        "question_number": num_tech_questions + 1
+    }
+
+def _technical_error_output(state: AgentState, e: Exception) -> dict:
+    logger.error(f"Technical question error: {e}")
+    return {
+        "questions_asked": ["What is your experience with the main tech stack?"],
+        "errors": [str(e)]
+    }
+
+def _behavioral_error_output(state: AgentState, e: Exception) -> dict:
+    logger.error(f"Behavioral question error: {e}")
+    return {
+        "questions_asked": ["Tell me about a challenge you overcame"],
+        "errors": [str(e)]
+    }
+
+def ask_technical_question_node(state: AgentState) -> dict:
+    """
+    Node that generates technical interview questions
+
+    Input: job_requirements, cv_score, previous_questions
+    Output: new questions, appended to questions_asked by the state reducer
+
+    Sync path (scripts): one LLM call per question. The async variant
+    serves from the per-job question bank instead
+    """
+
+    num_tech_questions = _count_technical_questions(state)
+
+    # Stop if enough technical questions. No status write: this branch runs
+    # in parallel with the behavioral one and only appends to reducer fields
+    if num_tech_questions >= 3:
+        return {"questions_asked": []}
+
+    chain = TECHNICAL_QUESTION_PROMPT | llm
+
     try:
-        response = chain.invoke({
-            "job_requirements": ", ".join(state.job_requirements),
-            "cv_score": state.cv_score or 0,
-            "previous_questions": state.questions_asked[-2:] if state.questions_asked else [],
-            "question_number": num_tech_questions + 1
-        })
-        
-        # Clean response
-        content = response.content.strip()
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:].strip()
-            content = content.rstrip("```").strip()
-        
-        result = json.loads(content)
-        
+        response = chain.invoke(_technical_prompt_inputs(state, num_tech_questions))
+
         return {
-            "questions_asked": state.questions_asked + [result.get("question", "Default question")]
+            "questions_asked": [_parse_question(response)]
         }
-    
+
     except Exception as e:
-        logger.error(f"Technical question error: {e}")
-        return {
-            "questions_asked": state.questions_asked + ["What is your experience with the main tech stack?"],
-            "errors": state.errors + [str(e)]
-        }
+        return _technical_error_output(state, e)
+
+async def aask_technical_question_node(state: AgentState) -> dict:
+    """
+    Async variant of ask_technical_question_node
+
+    Questions come from the technical question bank, keyed by job and
+    difficulty band (from cv_score): generated once per key, then served
+    from memory and refreshed in the background when stale
+    """
+
+    num_tech_questions = _count_technical_questions(state)
+
+    # Stop if enough technical questions (see ask_technical_question_node)
+    if num_tech_questions >= 3:
+        return {"questions_asked": []}
+
+    try:
+        questions = await get_technical_bank().get_questions(
+            state.job_id,
+            difficulty_band(state.cv_score),
+            state.job_requirements,
+            exclude=state.questions_asked
+        )
+        if not questions:
+            raise ValueError("No technical questions available for this job")
+
+        return {"questions_asked": questions}
+
+    except Exception as e:
+        return _technical_error_output(state, e)
+
+async def generate_technical_questions(requirements: List[str], band: str, count: int) -> List[str]:
+    """
+    One LLM call producing a question set for the technical bank
+    """
+    response = await (TECHNICAL_BANK_PROMPT | llm).ainvoke({
+        "job_requirements": ", ".join(requirements),
+        "band": band,
+        "count": count
+    })
+    return _parse_question_list(response, node="technical_bank")
+
+_technical_bank = None
+
+def get_technical_bank() -> TechnicalQuestionBank:
+    """Process-wide technical question bank, filled with generate_technical_questions"""
+    global _technical_bank
+    if _technical_bank is None:
+        _technical_bank = TechnicalQuestionBank(
+            generator=generate_technical_questions,
+            questions_per_entry=int(os.getenv("TECHNICAL_BANK_QUESTIONS", "8")),
+            ttl_seconds=float(os.getenv("TECHNICAL_BANK_TTL_SECONDS", str(6 * 3600))),
+            max_entries=int(os.getenv("TECHNICAL_BANK_MAX_ENTRIES", "300")),
+            retry_after_seconds=float(os.getenv("TECHNICAL_BANK_RETRY_AFTER_SECONDS", "60"))
+        )
+    return _technical_bank
+
+async def generate_behavioral_questions(count: int, existing: List[str]) -> List[str]:
+    """
+    One LLM call producing a batch of questions for the behavioral pool
+    """
+    response = await (BEHAVIORAL_POOL_PROMPT | llm).ainvoke({
+        "count": count,
+        "existing_questions": "\n".join(f"- {q}" for q in existing[-50:])
+    })
+    return _parse_question_list(response, node="behavioral_pool")
+
+_behavioral_pool = None
+
+def get_behavioral_pool() -> BehavioralQuestionPool:
+    """Process-wide behavioral question pool, refilled with generate_behavioral_questions"""
+    global _behavioral_pool
+    if _behavioral_pool is None:
+        _behavioral_pool = BehavioralQuestionPool(
+            path=os.getenv("BEHAVIORAL_POOL_PATH", "data/behavioral_questions.json"),
+            generator=generate_behavioral_questions,
+            low_watermark=int(os.getenv("BEHAVIORAL_POOL_LOW_WATERMARK", "5")),
+            refill_size=int(os.getenv("BEHAVIORAL_POOL_REFILL_SIZE", "10")),
+            max_size=int(os.getenv("BEHAVIORAL_POOL_MAX_SIZE", "200"))
+        )
+    return _behavioral_pool
 
 def ask_behavioral_question_node(state: AgentState) -> dict:
     """
-    Node that generates behavioral interview questions
-    
+    Node that picks a behavioral interview question
+
     Input: previous_questions
-    Output: questions_asked list
+    Output: new questions, appended to questions_asked by the state reducer
+
+    Questions come from the local pool, no LLM call on the request path;
+    the pool refills itself in the background when it runs low
     """
-    
-    num_behavioral = len([
-        q for q in state.questions_asked 
-        if "behavior" in q.lower() or "conflicto" in q.lower()
-    ])
-    
-    # Stop if enough behavioral questions
-    if num_behavioral >= 2:
-        return {"status": EvaluationStatus.SCORING}
-    
-    prompt = ChatPromptTemplate.from_template("""
-    BEHAVIORAL INTERVIEWER: Generate one behavioral question
-
-    Generate ONE NEW behavioral question to assess soft skills and adaptability.
-    
-    RESPOND IN JSON:
-    {{"question": "Your question here?"}}
-    """)
-    
-    chain = prompt | llm
-    
+
+    # Stop if enough behavioral questions (see ask_technical_question_node)
+    if _count_behavioral_questions(state) >= 2:
+        return {"questions_asked": []}
+
     try:
-        response = chain.invoke({})
-        
-        # Clean response
-        content = response.content.strip()
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:].strip()
-            content = content.rstrip("```").strip()
-        
-        result = json.loads(content)
-        
-        return {
-            "questions_asked": state.questions_asked + [result.get("question", "Default question")]
-        }
-    
+        questions = get_behavioral_pool().draw(exclude=state.questions_asked)
+        if not questions:
+            raise ValueError("Behavioral question pool is empty")
+
+        return {"questions_asked": questions}
+
     except Exception as e:
-        logger.error(f"Behavioral question error: {e}")
-        return {
-            "questions_asked": state.questions_asked + ["Tell me about a challenge you overcame"],
-            "errors": state.errors + [str(e)]
-        }
+        return _behavioral_error_output(state, e)
+
+async def aask_behavioral_question_node(state: AgentState) -> dict:
+    """
+    Async variant of ask_behavioral_question_node
+
+    Drawing is local; awaiting only matters for the background refill,
+    which needs the running event loop
+    """
+    return ask_behavioral_question_node(state)
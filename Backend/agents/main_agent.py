@@ -1,46 +1,64 @@
-
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from schemas.state import AgentState
-from .cv_evaluator import evaluate_cv_node, should_continue_to_interview
-from .interviewer import ask_technical_question_node, ask_behavioral_question_node
-from .scorer import score_candidate_node
+from utils.metrics import instrument_node
+from .cv_evaluator import evaluate_cv_node, aevaluate_cv_node, should_continue_to_interview
+from .interviewer import (
+    ask_technical_question_node, aask_technical_question_node,
+    ask_behavioral_question_node, aask_behavioral_question_node
+)
+from .scorer import score_candidate_node, ascore_candidate_node
+
+def _node(name: str, func, afunc) -> RunnableLambda:
+    """Graph node with its sync and async implementation, timed into /metrics"""
+    timed, atimed = instrument_node(name, func, afunc)
+    return RunnableLambda(timed, afunc=atimed)
+
+def route_after_cv(state: AgentState):
+    """
+    Conditional router: both interview branches, or straight to scoring
+    """
+    if should_continue_to_interview(state):
+        return ["technical_questions", "behavioral_questions"]
+    return "score"
 
 def create_recruitment_agent():
     """
     Creates and returns the compiled LangGraph recruitment evaluation agent
-    
+
     Flow:
     1. evaluate_cv → cv_score, should_continue decision
-    2. (if should_continue) → ask_technical_question → ask_behavioral_question
-    3. score_candidate → final scores and recommendation
+    2. (if should_continue) → ask_technical_question and ask_behavioral_question
+       in parallel, both appending to questions_asked through the state reducer
+    3. score_candidate → final scores and recommendation, once both branches finish
+
+    Every node carries a sync and an async implementation, so the graph
+    works with agent.invoke (scripts) and agent.ainvoke (FastAPI); node
+    durations and errors are recorded for /metrics
     """
-    
+
     # Create the graph
     graph = StateGraph(AgentState)
-    
+
     # Add nodes
-    graph.add_node("evaluate_cv", evaluate_cv_node)
-    graph.add_node("technical_questions", ask_technical_question_node)
-    graph.add_node("behavioral_questions", ask_behavioral_question_node)
-    graph.add_node("score", score_candidate_node)
-    
+    graph.add_node("evaluate_cv", _node("evaluate_cv", evaluate_cv_node, aevaluate_cv_node))
+    graph.add_node("technical_questions", _node("technical_questions", ask_technical_question_node, aask_technical_question_node))
+    graph.add_node("behavioral_questions", _node("behavioral_questions", ask_behavioral_question_node, aask_behavioral_question_node))
+    graph.add_node("score", _node("score", score_candidate_node, ascore_candidate_node))
+
     # Set entry point
     graph.set_entry_point("evaluate_cv")
-    
-    # Add conditional edges
+
+    # Add conditional edges: fan out to both question branches
     graph.add_conditional_edges(
         "evaluate_cv",
-        should_continue_to_interview,
-        {
-            True: "technical_questions",
-            False: "score"
-        }
+        route_after_cv,
+        ["technical_questions", "behavioral_questions", "score"]
     )
-    
-    # Add regular edges
-    graph.add_edge("technical_questions", "behavioral_questions")
-    graph.add_edge("behavioral_questions", "score")
+
+    # Add regular edges: score waits for both branches (join)
+    graph.add_edge(["technical_questions", "behavioral_questions"], "score")
     graph.add_edge("score", END)
-    
+
     # Compile and return
     return graph.compile()
@@ -1,23 +1,17 @@
-import json
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from schemas.state import AgentState, EvaluationStatus
+from utils.llm_gateway import get_llm
+from utils.llm_cache import cached_invoke, acached_invoke
+from utils.structured_output import parse_structured
+from schemas.llm_outputs import ScoreOutput
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.2)
+# Initialize LLM (calls go through the shared gateway: pooled client, rate limits, retries)
+llm = get_llm("scorer", model="gpt-4-turbo", temperature=0.2, json_mode=True)
 
-def score_candidate_node(state: AgentState) -> dict:
-    """
-    Node that calculates final scores
-    
-    Input: cv_score, questions_asked, job_requirements
-    Output: technical_score, behavioral_score, overall_score, recommendation
-    """
-    
-    prompt = ChatPromptTemplate.from_template("""
+SCORING_PROMPT = ChatPromptTemplate.from_template("""
     SENIOR EVALUATOR: Calculate final scores for the candidate
 
     DATA:
@@ -39,54 +33,102 @@ def score_candidate_node(state: AgentState) -> dict:
       "recommendation": "hire/maybe/reject"
     }}
     """)
-    
-    chain = prompt | llm
-    
+
+def _score_prompt_inputs(state: AgentState) -> dict:
+    return {
+        "cv_score": state.cv_score or 0,
+        "num_tech_questions": len(state.questions_asked) // 2,
+        "num_behavioral_questions": len(state.questions_asked) // 3,
+        "job_requirements": ", ".join(state.job_requirements)
+    }
+
+def _parse_score_response(state: AgentState, response) -> dict:
+    """Turn the raw LLM response into final scores"""
+    result = parse_structured(response, ScoreOutput, node="score_candidate")
+
+    technical = result.technical_score
+    behavioral = result.behavioral_score
+
+    # Formula: (CV*0.2) + (Technical*0.4) + (Behavioral*0.4)
+    overall = (
+        (state.cv_score or 0) * 0.2 +
+        technical * 0.4 +
+        behavioral * 0.4
+    )
+
+    logger.info(f"Scores - Technical: {technical}, Behavioral: {behavioral}, Overall: {overall}")
+
+    return {
+        "technical_score": technical,
+        "behavioral_score": behavioral,
+        "overall_score": round(overall, 2),
+        "recommendation": result.recommendation,
+        "status": EvaluationStatus.COMPLETED
+    }
+
+def _prefiltered_scores(state: AgentState) -> dict:
+    """
+    Final scores for a CV rejected by the local pre-filter, no LLM call
+
+    There was no interview, so every score is the requirement coverage
+    """
+    score = state.cv_score or 0
+    return {
+        "technical_score": score,
+        "behavioral_score": score,
+        "overall_score": round(score, 2),
+        "recommendation": "reject",
+        "status": EvaluationStatus.COMPLETED
+    }
+
+def _score_error_output(state: AgentState, e: Exception) -> dict:
+    logger.error(f"Scoring error: {e}")
+    return {
+        "technical_score": 60,
+        "behavioral_score": 60,
+        "overall_score": 60,
+        "recommendation": "reject",
+        "status": EvaluationStatus.FAILED,
+        "errors": [f"Scoring error: {str(e)}"]
+    }
+
+def score_candidate_node(state: AgentState) -> dict:
+    """
+    Node that calculates final scores
+
+    Input: cv_score, questions_asked, job_requirements
+    Output: technical_score, behavioral_score, overall_score, recommendation
+
+    Responses are served from the LLM cache unless state.bypass_cache
+    """
+
+    if state.prefiltered:
+        return _prefiltered_scores(state)
+
     try:
-        response = chain.invoke({
-            "cv_score": state.cv_score or 0,
-            "num_tech_questions": len(state.questions_asked) // 2,
-            "num_behavioral_questions": len(state.questions_asked) // 3,
-            "job_requirements": ", ".join(state.job_requirements)
-        })
-        
-        # Clean response
-        content = response.content.strip()
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:].strip()
-            content = content.rstrip("```").strip()
-        
-        result = json.loads(content)
-        
-        technical = float(result.get("technical_score", 60))
-        behavioral = float(result.get("behavioral_score", 60))
-        
-        # Formula: (CV*0.2) + (Technical*0.4) + (Behavioral*0.4)
-        overall = (
-            (state.cv_score or 0) * 0.2 +
-            technical * 0.4 +
-            behavioral * 0.4
+        return cached_invoke(
+            SCORING_PROMPT, llm, _score_prompt_inputs(state),
+            parse=lambda response: _parse_score_response(state, response),
+            bypass=state.bypass_cache
         )
-        
-        logger.info(f"Scores - Technical: {technical}, Behavioral: {behavioral}, Overall: {overall}")
-        
-        return {
-            "technical_score": technical,
-            "behavioral_score": behavioral,
-            "overall_score": round(overall, 2),
-            "recommendation": result.get("recommendation", "reject"),
-            "status": EvaluationStatus.COMPLETED
-        }
-    
+
+    except Exception as e:
+        return _score_error_output(state, e)
+
+async def ascore_candidate_node(state: AgentState) -> dict:
+    """
+    Async variant of score_candidate_node
+    """
+
+    if state.prefiltered:
+        return _prefiltered_scores(state)
+
+    try:
+        return await acached_invoke(
+            SCORING_PROMPT, llm, _score_prompt_inputs(state),
+            parse=lambda response: _parse_score_response(state, response),
+            bypass=state.bypass_cache
+        )
+
     except Exception as e:
-        logger.error(f"Scoring error: {e}")
-        return {
-            "technical_score": 60,
-            "behavioral_score": 60,
-            "overall_score": 60,
-            "recommendation": "reject",
-            "status": EvaluationStatus.FAILED,
-            "errors": state.errors + [f"Scoring error: {str(e)}"]
-        }
+        return _score_error_output(state, e)
@@ -0,0 +1,122 @@
+"""
+Benchmark: blocking agent.invoke vs concurrent agent.ainvoke
+
+Plugs a stub model that sleeps for a fixed latency into the LLM
+gateway, so no OpenAI key is spent while calls still go through the
+gateway's limits. Run from the Backend directory:
+
+    python -m benchmarks.bench_async_agent --evaluations 50 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# Every run must reach the stub LLM, identical CVs would otherwise hit the cache
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from agents.main_agent import create_recruitment_agent
+from schemas.state import AgentState
+from utils.llm_gateway import get_llm_gateway
+
+
+def _stub_reply(prompt_value) -> AIMessage:
+    """Canned JSON answer for each node prompt"""
+    text = prompt_value.to_string()
+    if "EXPERT RECRUITER" in text:
+        payload = {"score": 72, "skills_found": ["python"], "gaps": [], "summary": "ok", "continue": True}
+    elif '"questions"' in text:
+        # Question bank / pool refills ask for a list
+        payload = {"questions": [f"Question {i} about the role?" for i in range(10)]}
+    elif "SENIOR EVALUATOR" in text:
+        payload = {"technical_score": 70, "behavioral_score": 65, "recommendation": "maybe"}
+    else:
+        payload = {"question": "Describe a technical challenge you solved?"}
+    return AIMessage(content=json.dumps(payload))
+
+
+def install_stub_llm(latency: float):
+    """Make the gateway build a stub with a fixed per-call latency instead of ChatOpenAI"""
+
+    def reply(prompt_value):
+        time.sleep(latency)
+        return _stub_reply(prompt_value)
+
+    async def areply(prompt_value):
+        await asyncio.sleep(latency)
+        return _stub_reply(prompt_value)
+
+    stub = RunnableLambda(reply, afunc=areply)
+    get_llm_gateway().set_model_factory(lambda model, temperature: stub)
+
+
+def _state(i: int) -> AgentState:
+    return AgentState(
+        candidate_id=f"cand-{i}",
+        job_id="job-bench",
+        company_id="company-bench",
+        cv_text="Python developer with FastAPI and PostgreSQL experience",
+        job_requirements=["python", "fastapi", "postgresql"]
+    )
+
+
+async def _loop_lag_probe(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Max delay seen by a ticker coroutine, i.e. how long /health would wait"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(evaluations: int, latency: float) -> dict:
+    agent = create_recruitment_agent()
+
+    async def blocking():
+        # What the endpoint used to do: a sync invoke inside the event loop
+        for i in range(evaluations):
+            agent.invoke(_state(i))
+
+    async def concurrent():
+        await asyncio.gather(*(agent.ainvoke(_state(i)) for i in range(evaluations)))
+
+    report = {"evaluations": evaluations, "llm_latency_s": latency}
+    for name, scenario in (("blocking_invoke", blocking), ("concurrent_ainvoke", concurrent)):
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_loop_lag_probe(stop))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        await scenario()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        report[name] = {
+            "total_s": round(elapsed, 3),
+            "evaluations_per_s": round(evaluations / elapsed, 2),
+            "max_event_loop_lag_s": round(await probe, 3)
+        }
+    gateway = get_llm_gateway().stats()
+    report["llm_gateway"] = {
+        key: gateway[key] for key in ("calls", "max_concurrency", "limiter_waits", "limiter_wait_s")
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency per call (s)")
+    args = parser.parse_args()
+
+    install_stub_llm(args.latency)
+    print(json.dumps(asyncio.run(run(args.evaluations, args.latency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
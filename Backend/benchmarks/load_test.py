@@ -0,0 +1,280 @@
+"""
+Load test: /evaluate and /batch-evaluate fully offline
+
+Runs the real FastAPI app in process (lifespan included) with the
+StubLLM behind the LLM gateway and an InMemoryDatabase in place of
+Supabase (benchmarks/stubs.py), so no OpenAI key or Supabase project is
+needed. Every SQLite store goes to a temporary directory.
+
+For each scenario, --concurrency clients send requests back to back
+(closed loop) until --requests have completed, after --warmup requests
+that are not measured (they fill the question pools). Reported per
+scenario: p50/p95/p99/max latency, requests and candidates per second,
+error count, and memory (RSS growth, peak RSS, and the Python heap peak
+with --tracemalloc, which slows the run down).
+
+Results are printed and, with --output, written as JSON; --baseline
+adds the change against an earlier run's JSON. Run from the Backend
+directory:
+
+    python -m benchmarks.load_test --scenarios evaluate batch-evaluate \\
+        --concurrency 20 --requests 200 --latency-scale 0.2 --output run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+_DATA_DIR = tempfile.mkdtemp(prefix="load-test-")
+for _name, _file in (
+    ("LLM_CACHE_PATH", "llm_cache.db"), ("TASK_QUEUE_PATH", "tasks.db"), ("OUTBOX_PATH", "outbox.db"),
+    ("IDEMPOTENCY_PATH", "idempotency.db"), ("CV_STORE_PATH", "cv_texts.db"),
+    ("BEHAVIORAL_POOL_PATH", "behavioral_questions.json"), ("CV_CASCADE_CONFIG_PATH", "cascade_config.json")
+):
+    os.environ.setdefault(_name, os.path.join(_DATA_DIR, _file))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# Checked at startup but never used, the database is the in-memory stand-in
+os.environ.setdefault("SUPABASE_URL", "http://supabase.invalid")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "benchmark")
+# Every request must reach the stub LLM, repeated prompts would otherwise hit the cache
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+import httpx
+
+from benchmarks.stubs import InMemoryDatabase, StubLLM
+from utils.llm_gateway import get_llm_gateway
+
+SCENARIOS = ("evaluate", "batch-evaluate")
+SKILLS = ["python", "fastapi", "postgresql", "docker", "aws", "react", "redis", "kubernetes"]
+
+
+def _evaluation_request(scenario: str, i: int, jobs: int, companies: int) -> dict:
+    """Distinct candidate and CV for every i, so neither idempotency nor the LLM cache answers"""
+    job = i % jobs
+    requirements = SKILLS[job % 4:job % 4 + 4]
+    return {
+        "candidate_id": f"{scenario}-cand-{i}",
+        "job_id": f"job-{job}",
+        "company_id": f"company-{i % companies}",
+        "cv_text": (
+            f"Candidate {i}. Backend developer with {3 + i % 8} years of experience. "
+            f"Skills: {', '.join(requirements[:2 + i % 3])}. Built APIs serving {i * 7 % 900 + 100}k requests a day."
+        ),
+        "job_requirements": requirements,
+        "job_description": f"Backend engineer for team {job}"
+    }
+
+
+def _memory_mb() -> dict:
+    """Current and peak resident set size of this process"""
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = peak / 2 ** 20 if platform.system() == "Darwin" else peak / 2 ** 10
+    if current is not None:
+        peak = max(peak, current)
+    return {"rss_mb": round(current, 1) if current is not None else None, "peak_rss_mb": round(peak, 1)}
+
+
+def _percentiles(latencies: list) -> dict:
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2)
+    }
+
+
+async def _send(client: httpx.AsyncClient, scenario: str, i: int, args) -> int:
+    """One request; returns the number of candidates evaluated, raises on failure"""
+    if scenario == "evaluate":
+        response = await client.post("/evaluate", json=_evaluation_request(scenario, i, args.jobs, args.companies))
+        response.raise_for_status()
+        if not response.json().get("success"):
+            raise RuntimeError(response.json().get("error"))
+        return 1
+
+    batch = [
+        _evaluation_request(scenario, i * args.batch_size + k, args.jobs, args.companies)
+        for k in range(args.batch_size)
+    ]
+    response = await client.post("/batch-evaluate", json=batch)
+    response.raise_for_status()
+    completed = response.json().get("completed", 0)
+    if completed < len(batch):
+        raise RuntimeError(f"{len(batch) - completed} of {len(batch)} candidates failed")
+    return completed
+
+
+async def _run_scenario(client: httpx.AsyncClient, scenario: str, args, offset: int) -> dict:
+    for i in range(args.warmup):
+        await _send(client, scenario, offset + i, args)
+
+    latencies, errors = [], []
+    candidates = 0
+    next_index = iter(range(offset + args.warmup, offset + args.warmup + args.requests))
+
+    async def worker():
+        nonlocal candidates
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                evaluated = await _send(client, scenario, i, args)
+                latencies.append(time.perf_counter() - started)
+                candidates += evaluated
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    memory_before = _memory_mb()
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    tracemalloc.stop()
+    memory_after = _memory_mb()
+
+    return {
+        "requests": args.requests,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "candidates_per_s": round(candidates / elapsed, 2),
+        "latency": _percentiles(latencies),
+        "memory": {
+            **memory_after,
+            "rss_growth_mb": (
+                round(memory_after["rss_mb"] - memory_before["rss_mb"], 1)
+                if memory_after["rss_mb"] is not None else None
+            ),
+            "python_heap_peak_mb": round(heap_peak / 2 ** 20, 1) if heap_peak is not None else None
+        }
+    }
+
+
+def _compare(report: dict, baseline: dict) -> dict:
+    """Relative change of the headline numbers against a baseline run (+ is higher)"""
+    changes = {}
+    for scenario, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        pairs = {
+            "requests_per_s": (before.get("requests_per_s"), result["requests_per_s"]),
+            **{
+                key: (before.get("latency", {}).get(key), result["latency"].get(key))
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+            },
+            "peak_rss_mb": (before.get("memory", {}).get("peak_rss_mb"), result["memory"]["peak_rss_mb"])
+        }
+        changes[scenario] = {
+            key: f"{(new - old) / old:+.1%}" for key, (old, new) in pairs.items() if old and new is not None
+        }
+    return changes
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    import main as api
+
+    stub = StubLLM(seed=args.seed, latency_scale=args.latency_scale)
+    stub.install()
+    database = InMemoryDatabase(latency=args.db_latency)
+
+    async def create_db_client():
+        return database
+
+    api.create_db_client = create_db_client
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "scenarios": {}
+    }
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            for n, scenario in enumerate(args.scenarios):
+                report["scenarios"][scenario] = await _run_scenario(client, scenario, args, offset=n * 10 ** 6)
+
+    gateway = get_llm_gateway().stats()
+    report["llm_gateway"] = {
+        key: gateway[key] for key in (
+            "calls", "errors", "retries", "max_concurrency", "limiter_waits", "limiter_wait_s",
+            "input_tokens", "output_tokens", "cost_usd"
+        )
+    }
+    report["stub_llm"] = stub.stats()
+    report["database"] = {
+        "calls": database.calls,
+        "evaluations": len(database.evaluations),
+        "candidates": len(database.candidates)
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=10, help="clients sending requests at once")
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured requests before each scenario")
+    parser.add_argument("--batch-size", type=int, default=10, help="candidates per /batch-evaluate request")
+    parser.add_argument("--jobs", type=int, default=4, help="distinct job postings in the requests")
+    parser.add_argument("--companies", type=int, default=3, help="distinct companies in the requests")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier on stub LLM latencies (0 = no sleeps, measures app overhead)")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="in-memory database round trip (s)")
+    parser.add_argument("--seed", type=int, default=0, help="stub LLM seed, same seed = same answers")
+    parser.add_argument("--tracemalloc", action="store_true", help="also measure the Python heap peak (slower)")
+    parser.add_argument("--output", type=Path, help="write the report to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="earlier report to compare against")
+
+    try:
+        args = parser.parse_args()
+        report = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+    if args.baseline:
+        report["vs_baseline"] = _compare(report, json.loads(args.baseline.read_text()))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Offline stand-ins for the paid and remote dependencies of the API
+
+- StubLLM: plugs into the LLM gateway in place of ChatOpenAI. Answers
+  every agent prompt with valid JSON, reports usage_metadata token
+  counts, and sleeps for a lognormal latency (time to first token plus
+  time per output token, per model), like a real provider's long tail.
+  Everything derives from a seeded hash of the prompt, so two runs with
+  the same seed get the same answers, tokens and latencies.
+- InMemoryDatabase: same methods and return values as SupabaseClient,
+  kept in dicts, with an optional fixed round-trip latency.
+
+Used by benchmarks.load_test; importable from any other benchmark.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from utils.company_stats import StatsAccumulator
+from utils.llm_gateway import get_llm_gateway
+from utils.llm_utils import estimate_tokens
+from utils.pagination import decode_cursor, page_response, with_keyset
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Median latency of one model: first_token_s + per_token_s * output tokens, lognormal spread sigma"""
+    first_token_s: float
+    per_token_s: float
+    sigma: float = 0.35
+
+
+# Rough shape of hosted chat models; only the ratios matter at --latency-scale < 1
+LATENCY_PROFILES = {
+    "gpt-4-turbo": LatencyProfile(first_token_s=0.6, per_token_s=0.03),
+    "gpt-4o": LatencyProfile(first_token_s=0.35, per_token_s=0.012),
+    "gpt-4o-mini": LatencyProfile(first_token_s=0.25, per_token_s=0.007),
+}
+DEFAULT_PROFILE = LatencyProfile(first_token_s=0.4, per_token_s=0.015)
+
+_REF_RE = re.compile(r"CANDIDATE ref=(C\d+)")
+_COUNT_RE = re.compile(r"Generate (\d+)")
+
+
+class StubLLM:
+    """
+    Deterministic fake chat model for the LLM gateway
+
+    install() makes the gateway build one stub runnable per model, so
+    calls still go through its rate limits, retries and accounting.
+    latency_scale shrinks every sleep (0 disables them) to trade realism
+    for shorter runs
+    """
+
+    def __init__(self, seed: int = 0, latency_scale: float = 1.0,
+                 profiles: Optional[Dict[str, LatencyProfile]] = None):
+        self.seed = seed
+        self.latency_scale = latency_scale
+        self.profiles = profiles or LATENCY_PROFILES
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency_s = 0.0
+
+    def install(self):
+        get_llm_gateway().set_model_factory(self.model)
+
+    def model(self, model: str, temperature: float = 0.0) -> RunnableLambda:
+        """Runnable answering prompt values like ChatOpenAI(model) would"""
+
+        def reply(prompt_value):
+            message, latency = self._answer(model, prompt_value.to_string())
+            time.sleep(latency)
+            return message
+
+        async def areply(prompt_value):
+            message, latency = self._answer(model, prompt_value.to_string())
+            await asyncio.sleep(latency)
+            return message
+
+        return RunnableLambda(reply, afunc=areply, name=f"stub-{model}")
+
+    def _answer(self, model: str, prompt: str):
+        digest = hashlib.sha256(f"{self.seed}:{model}:{prompt}".encode()).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+
+        content = json.dumps(_payload(prompt, rng))
+        usage = {
+            "input_tokens": estimate_tokens(prompt),
+            "output_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+
+        profile = self.profiles.get(model, DEFAULT_PROFILE)
+        median = profile.first_token_s + profile.per_token_s * usage["output_tokens"]
+        latency = median * math.exp(rng.gauss(0, profile.sigma)) * self.latency_scale
+
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += usage["input_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            self.latency_s += latency
+        return AIMessage(content=content, usage_metadata=usage), latency
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "avg_latency_ms": round(self.latency_s / self.calls * 1000, 2) if self.calls else 0,
+            }
+
+
+def _cv_answer(rng: random.Random) -> Dict[str, Any]:
+    # Mostly decent CVs, a tail of weak ones, so both cascade tiers get work
+    score = round(min(max(rng.gauss(66, 16), 5), 98))
+    return {
+        "score": score,
+        "skills_found": rng.sample(["python", "fastapi", "postgresql", "docker", "aws", "react"], 3),
+        "gaps": ["kubernetes"] if score < 70 else [],
+        "summary": "Solid backend profile" if score >= 60 else "Limited match with the role",
+        "continue": score >= 50,
+    }
+
+
+def _payload(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    """Canned answer for each agent prompt, matching its schema (schemas/llm_outputs.py)"""
+    if "Evaluate each of these CVs" in prompt:
+        return {"candidates": [{"ref": ref, **_cv_answer(rng)} for ref in _REF_RE.findall(prompt)]}
+    if "EXPERT RECRUITER" in prompt:
+        return _cv_answer(rng)
+    if "SENIOR EVALUATOR" in prompt:
+        technical, behavioral = rng.randint(40, 95), rng.randint(40, 95)
+        average = (technical + behavioral) / 2
+        recommendation = "hire" if average >= 75 else "maybe" if average >= 50 else "reject"
+        return {"technical_score": technical, "behavioral_score": behavioral, "recommendation": recommendation}
+    if '"questions"' in prompt:
+        match = _COUNT_RE.search(prompt)
+        count = int(match.group(1)) if match else 5
+        return {"questions": [f"Question {rng.randint(1, 10 ** 6)} about the role?" for _ in range(count)]}
+    return {"question": f"Describe a technical challenge number {rng.randint(1, 10 ** 6)} you solved?"}
+
+
+class _Response:
+    """What supabase-py's execute() returns, as far as callers look at it"""
+
+    def __init__(self, data: Any):
+        self.data = data
+
+
+class InMemoryDatabase:
+    """
+    SupabaseClient stand-in kept in memory
+
+    Same methods, arguments and return values (None on failure), blocking
+    like the real client so call_db runs it in a worker thread; latency
+    is slept on every call to mimic the REST round trip
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.candidates: Dict[str, Dict[str, Any]] = {}
+        self.evaluations: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.calls = 0
+
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # ============== CANDIDATES ==============
+
+    def create_candidate(self, data: Dict[str, Any]):
+        self._round_trip()
+        row = {"id": str(uuid.uuid4()), **data}
+        with self._lock:
+            self.candidates[row["id"]] = row
+        return _Response([row])
+
+    def get_candidate(self, candidate_id: str):
+        self._round_trip()
+        row = self.candidates.get(candidate_id)
+        return _Response(dict(row)) if row else None
+
+    def update_candidate(self, candidate_id: str, data: Dict[str, Any]):
+        self._round_trip()
+        with self._lock:
+            row = self.candidates.setdefault(candidate_id, {"id": candidate_id})
+            row.update(data)
+            return _Response([dict(row)])
+
+    def update_candidates(self, updates: List[Dict[str, Any]]):
+        self._round_trip()
+        with self._lock:
+            for update in updates:
+                self.candidates.setdefault(update["id"], {"id": update["id"]}).update(update)
+        return _Response(len(updates))
+
+    # ============== EVALUATIONS ==============
+
+    def create_evaluation(self, evaluation_data: Dict[str, Any]):
+        return self.create_evaluations([evaluation_data])
+
+    def create_evaluations(self, evaluations: List[Dict[str, Any]]):
+        self._round_trip()
+        inserted = []
+        with self._lock:
+            for evaluation in evaluations:
+                row = {"id": str(uuid.uuid4()), **evaluation}
+                # Duplicates (same id) are ignored, like upsert(ignore_duplicates=True)
+                if row["id"] not in self.evaluations:
+                    self.evaluations[row["id"]] = row
+                    inserted.append(row)
+        return _Response(inserted)
+
+    def get_evaluation(self, evaluation_id: str):
+        self._round_trip()
+        row = self.evaluations.get(evaluation_id)
+        return _Response(dict(row)) if row else None
+
+    def _company_rows(self, company_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [row for row in self.evaluations.values() if row.get("company_id") == company_id]
+        return sorted(rows, key=lambda row: (str(row.get("evaluated_at")), str(row["id"])), reverse=True)
+
+    def get_evaluations_by_company(self, company_id: str, limit: int = 100):
+        self._round_trip()
+        return self._company_rows(company_id)[:limit]
+
+    def get_evaluations_page(self, company_id: str, limit: int = 100, cursor: Optional[str] = None,
+                             fields: Optional[List[str]] = None):
+        self._round_trip()
+        rows = self._company_rows(company_id)
+        if cursor:
+            after = decode_cursor(cursor)
+            rows = [row for row in rows if (str(row.get("evaluated_at")), str(row["id"])) < after]
+        columns = with_keyset(fields)
+        return page_response([{c: row.get(c) for c in columns} for row in rows[:limit + 1]], limit)
+
+    # ============== JOBS ==============
+
+    def get_job(self, job_id: str):
+        self._round_trip()
+        row = self.jobs.get(job_id)
+        return _Response(dict(row)) if row else None
+
+    # ============== STATS ==============
+
+    def get_stats(self, company_id: str):
+        stats = self.get_stats_accumulator(company_id)
+        return stats.to_response() if stats is not None else {}
+
+    def get_stats_accumulator(self, company_id: str, days: int = 30) -> Optional[StatsAccumulator]:
+        self._round_trip()
+        return StatsAccumulator.from_rows(self._company_rows(company_id))
@@ -0,0 +1,22 @@
+-- /stats/{company_id}: aggregate in the database instead of shipping
+-- every evaluation row to the backend.
+
+-- Covering index: the aggregate is answered by an index-only scan
+CREATE INDEX IF NOT EXISTS idx_evaluations_company_stats
+    ON evaluations (company_id) INCLUDE (overall_score, recommendation);
+
+CREATE OR REPLACE FUNCTION company_stats(p_company_id uuid)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_evaluations', COUNT(*),
+        'score_sum', COALESCE(SUM(COALESCE(overall_score, 0)), 0),
+        'recommended', COUNT(*) FILTER (WHERE recommendation = 'hire'),
+        'maybe', COUNT(*) FILTER (WHERE recommendation = 'maybe'),
+        'rejected', COUNT(*) FILTER (WHERE recommendation = 'reject')
+    )
+    FROM evaluations
+    WHERE company_id = p_company_id;
+$$;
@@ -0,0 +1,59 @@
+-- /stats/{company_id}: score histogram and daily buckets on top of the
+-- counts from 001. Loaded once per company by the backend stats cache,
+-- which then keeps the numbers up to date itself.
+
+-- Covering index now also carries evaluated_at for the daily buckets
+DROP INDEX IF EXISTS idx_evaluations_company_stats;
+CREATE INDEX IF NOT EXISTS idx_evaluations_company_stats
+    ON evaluations (company_id) INCLUDE (overall_score, recommendation, evaluated_at);
+
+-- New optional argument: drop the 001 signature so calls stay unambiguous
+DROP FUNCTION IF EXISTS company_stats(uuid);
+
+CREATE OR REPLACE FUNCTION company_stats(p_company_id uuid, p_days integer DEFAULT 30)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    WITH company AS (
+        SELECT COALESCE(overall_score, 0) AS score,
+               recommendation,
+               (evaluated_at AT TIME ZONE 'UTC')::date AS day
+        FROM evaluations
+        WHERE company_id = p_company_id
+    )
+    SELECT json_build_object(
+        'total_evaluations', totals.total,
+        'score_sum', totals.score_sum,
+        'recommended', totals.recommended,
+        'maybe', totals.maybe,
+        'rejected', totals.rejected,
+        -- bucket (0-9, ten points each, 100 in the last) -> evaluations
+        'histogram', (
+            SELECT COALESCE(json_object_agg(bucket, n), '{}'::json)
+            FROM (
+                SELECT LEAST(GREATEST(FLOOR(score / 10), 0), 9)::int AS bucket, COUNT(*) AS n
+                FROM company
+                GROUP BY 1
+            ) h
+        ),
+        -- last p_days UTC days -> evaluations and score sum
+        'daily', (
+            SELECT COALESCE(json_object_agg(day, json_build_object('count', n, 'score_sum', s)), '{}'::json)
+            FROM (
+                SELECT day, COUNT(*) AS n, SUM(score) AS s
+                FROM company
+                WHERE day > (now() AT TIME ZONE 'UTC')::date - p_days
+                GROUP BY 1
+            ) d
+        )
+    )
+    FROM (
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(score), 0) AS score_sum,
+               COUNT(*) FILTER (WHERE recommendation = 'hire') AS recommended,
+               COUNT(*) FILTER (WHERE recommendation = 'maybe') AS maybe,
+               COUNT(*) FILTER (WHERE recommendation = 'reject') AS rejected
+        FROM company
+    ) totals;
+$$;
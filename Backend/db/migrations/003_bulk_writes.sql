@@ -0,0 +1,21 @@
+-- Bulk candidate updates for the write-behind outbox: one request
+-- updates every candidate of a flush instead of one PATCH each.
+
+-- p_updates: [{"id": "...", "overall_score": 87.5, "status": "completed"}, ...]
+-- Only the keys present in an update are written.
+CREATE OR REPLACE FUNCTION update_candidates(p_updates jsonb)
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE candidates AS c
+        SET overall_score = CASE WHEN u.data ? 'overall_score'
+                                 THEN (u.data->>'overall_score')::double precision
+                                 ELSE c.overall_score END,
+            status = CASE WHEN u.data ? 'status' THEN u.data->>'status' ELSE c.status END
+        FROM jsonb_array_elements(p_updates) AS u(data)
+        WHERE c.id = (u.data->>'id')::uuid
+        RETURNING 1
+    )
+    SELECT COUNT(*)::integer FROM updated;
+$$;
@@ -0,0 +1,4 @@
+-- /evaluations/{company_id}: keyset pagination on (evaluated_at, id),
+-- newest first. Each page is one index range scan, however deep.
+CREATE INDEX IF NOT EXISTS idx_evaluations_company_keyset
+    ON evaluations (company_id, evaluated_at DESC, id DESC);
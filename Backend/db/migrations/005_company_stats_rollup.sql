@@ -0,0 +1,227 @@
+-- /stats/{company_id}: keep the numbers of 002 pre-aggregated per company,
+-- so company_stats() reads a handful of rows instead of scanning every
+-- evaluation of the company (002 grew linearly: ~250 ms at 1M rows).
+--
+-- Statement-level triggers fold each INSERT / UPDATE / DELETE into the
+-- rollup tables, grouped first, so a bulk write from the outbox costs one
+-- upsert per (company, day, bucket, recommendation) rather than per row.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS company_stats_totals (
+    company_id uuid PRIMARY KEY,
+    total bigint NOT NULL DEFAULT 0,
+    score_sum double precision NOT NULL DEFAULT 0,
+    recommended bigint NOT NULL DEFAULT 0,
+    maybe bigint NOT NULL DEFAULT 0,
+    rejected bigint NOT NULL DEFAULT 0
+);
+
+-- bucket: 0-9, ten points each, 100 in the last (same as 002)
+CREATE TABLE IF NOT EXISTS company_stats_buckets (
+    company_id uuid NOT NULL,
+    bucket smallint NOT NULL,
+    evaluations bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, bucket)
+);
+
+-- day: UTC date of evaluated_at
+CREATE TABLE IF NOT EXISTS company_stats_daily (
+    company_id uuid NOT NULL,
+    day date NOT NULL,
+    evaluations bigint NOT NULL DEFAULT 0,
+    score_sum double precision NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, day)
+);
+
+-- Change of a group of evaluations; n and score_sum are negative for removals
+DROP TYPE IF EXISTS company_stats_delta CASCADE;
+CREATE TYPE company_stats_delta AS (
+    company_id uuid,
+    day date,
+    bucket integer,
+    recommendation text,
+    n bigint,
+    score_sum double precision
+);
+
+CREATE OR REPLACE FUNCTION company_stats_bucket(p_score double precision)
+RETURNS integer
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT LEAST(GREATEST(FLOOR(COALESCE(p_score, 0) / 10), 0), 9)::integer;
+$$;
+
+-- Upserts run in key order so concurrent writers lock rows in the same order
+CREATE OR REPLACE FUNCTION company_stats_apply(p_deltas company_stats_delta[])
+RETURNS void
+LANGUAGE sql
+AS $$
+    INSERT INTO company_stats_totals AS t (company_id, total, score_sum, recommended, maybe, rejected)
+    SELECT company_id,
+           SUM(n),
+           SUM(score_sum),
+           COALESCE(SUM(n) FILTER (WHERE recommendation = 'hire'), 0),
+           COALESCE(SUM(n) FILTER (WHERE recommendation = 'maybe'), 0),
+           COALESCE(SUM(n) FILTER (WHERE recommendation = 'reject'), 0)
+    FROM unnest(p_deltas)
+    GROUP BY company_id
+    ORDER BY company_id
+    ON CONFLICT (company_id) DO UPDATE SET
+        total = t.total + EXCLUDED.total,
+        score_sum = t.score_sum + EXCLUDED.score_sum,
+        recommended = t.recommended + EXCLUDED.recommended,
+        maybe = t.maybe + EXCLUDED.maybe,
+        rejected = t.rejected + EXCLUDED.rejected;
+
+    INSERT INTO company_stats_buckets AS b (company_id, bucket, evaluations)
+    SELECT company_id, bucket, SUM(n)
+    FROM unnest(p_deltas)
+    GROUP BY company_id, bucket
+    ORDER BY company_id, bucket
+    ON CONFLICT (company_id, bucket) DO UPDATE SET
+        evaluations = b.evaluations + EXCLUDED.evaluations;
+
+    INSERT INTO company_stats_daily AS d (company_id, day, evaluations, score_sum)
+    SELECT company_id, day, SUM(n), SUM(score_sum)
+    FROM unnest(p_deltas)
+    GROUP BY company_id, day
+    ORDER BY company_id, day
+    ON CONFLICT (company_id, day) DO UPDATE SET
+        evaluations = d.evaluations + EXCLUDED.evaluations,
+        score_sum = d.score_sum + EXCLUDED.score_sum;
+$$;
+
+-- Transition tables can't be shared across events, hence one branch per operation
+CREATE OR REPLACE FUNCTION company_stats_rollup()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deltas company_stats_delta[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(ROW(company_id, day, bucket, recommendation, n, score_sum)::company_stats_delta)
+        INTO deltas
+        FROM (
+            SELECT company_id, (evaluated_at AT TIME ZONE 'UTC')::date AS day,
+                   company_stats_bucket(overall_score) AS bucket, recommendation,
+                   COUNT(*) AS n, SUM(COALESCE(overall_score, 0)) AS score_sum
+            FROM new_rows
+            GROUP BY 1, 2, 3, 4
+        ) grouped;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(ROW(company_id, day, bucket, recommendation, -n, -score_sum)::company_stats_delta)
+        INTO deltas
+        FROM (
+            SELECT company_id, (evaluated_at AT TIME ZONE 'UTC')::date AS day,
+                   company_stats_bucket(overall_score) AS bucket, recommendation,
+                   COUNT(*) AS n, SUM(COALESCE(overall_score, 0)) AS score_sum
+            FROM old_rows
+            GROUP BY 1, 2, 3, 4
+        ) grouped;
+    ELSE
+        SELECT array_agg(ROW(company_id, day, bucket, recommendation, n, score_sum)::company_stats_delta)
+        INTO deltas
+        FROM (
+            SELECT company_id, (evaluated_at AT TIME ZONE 'UTC')::date AS day,
+                   company_stats_bucket(overall_score) AS bucket, recommendation,
+                   SUM(sign) AS n, SUM(sign * COALESCE(overall_score, 0)) AS score_sum
+            FROM (
+                SELECT company_id, evaluated_at, overall_score, recommendation, 1 AS sign FROM new_rows
+                UNION ALL
+                SELECT company_id, evaluated_at, overall_score, recommendation, -1 AS sign FROM old_rows
+            ) changed
+            GROUP BY 1, 2, 3, 4
+            HAVING SUM(sign) <> 0 OR SUM(sign * COALESCE(overall_score, 0)) <> 0
+        ) grouped;
+    END IF;
+
+    IF deltas IS NOT NULL THEN
+        PERFORM company_stats_apply(deltas);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION company_stats_reset()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE company_stats_totals, company_stats_buckets, company_stats_daily;
+    RETURN NULL;
+END;
+$$;
+
+-- No writes between the backfill and the triggers taking over
+LOCK TABLE evaluations IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS evaluations_company_stats_insert ON evaluations;
+CREATE TRIGGER evaluations_company_stats_insert
+    AFTER INSERT ON evaluations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION company_stats_rollup();
+
+DROP TRIGGER IF EXISTS evaluations_company_stats_update ON evaluations;
+CREATE TRIGGER evaluations_company_stats_update
+    AFTER UPDATE ON evaluations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION company_stats_rollup();
+
+DROP TRIGGER IF EXISTS evaluations_company_stats_delete ON evaluations;
+CREATE TRIGGER evaluations_company_stats_delete
+    AFTER DELETE ON evaluations
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION company_stats_rollup();
+
+DROP TRIGGER IF EXISTS evaluations_company_stats_truncate ON evaluations;
+CREATE TRIGGER evaluations_company_stats_truncate
+    AFTER TRUNCATE ON evaluations
+    FOR EACH STATEMENT EXECUTE FUNCTION company_stats_reset();
+
+-- Backfill from the rows already there (one scan, at migration time only)
+TRUNCATE company_stats_totals, company_stats_buckets, company_stats_daily;
+SELECT company_stats_apply(ARRAY(
+    SELECT ROW(company_id, day, bucket, recommendation, n, score_sum)::company_stats_delta
+    FROM (
+        SELECT company_id, (evaluated_at AT TIME ZONE 'UTC')::date AS day,
+               company_stats_bucket(overall_score) AS bucket, recommendation,
+               COUNT(*) AS n, SUM(COALESCE(overall_score, 0)) AS score_sum
+        FROM evaluations
+        GROUP BY 1, 2, 3, 4
+    ) grouped
+));
+
+-- Same signature and JSON as 002, read from the rollups: cost no longer
+-- depends on how many evaluations the company has
+CREATE OR REPLACE FUNCTION company_stats(p_company_id uuid, p_days integer DEFAULT 30)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_evaluations', COALESCE(t.total, 0),
+        'score_sum', COALESCE(t.score_sum, 0),
+        'recommended', COALESCE(t.recommended, 0),
+        'maybe', COALESCE(t.maybe, 0),
+        'rejected', COALESCE(t.rejected, 0),
+        'histogram', (
+            SELECT COALESCE(json_object_agg(bucket, evaluations), '{}'::json)
+            FROM company_stats_buckets
+            WHERE company_id = p_company_id AND evaluations <> 0
+        ),
+        'daily', (
+            SELECT COALESCE(json_object_agg(day, json_build_object('count', evaluations, 'score_sum', score_sum)), '{}'::json)
+            FROM company_stats_daily
+            WHERE company_id = p_company_id
+              AND day > (now() AT TIME ZONE 'UTC')::date - p_days
+              AND evaluations <> 0
+        )
+    )
+    FROM (SELECT 1) AS one
+    LEFT JOIN company_stats_totals t ON t.company_id = p_company_id;
+$$;
+
+COMMIT;
@@ -0,0 +1,39 @@
+-- Tables used by the backend, as they exist in the Supabase project.
+-- Apply to a local Postgres to run the backend or the benchmarks
+-- against it; migrations/ holds the changes made on top.
+-- Requires Postgres 13+ (built-in gen_random_uuid).
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    company_id uuid NOT NULL,
+    title text,
+    description text,
+    requirements jsonb DEFAULT '[]'::jsonb,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS candidates (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    company_id uuid,
+    job_id uuid,
+    name text,
+    email text,
+    cv_text text,
+    cv_url text,
+    overall_score double precision,
+    status text DEFAULT 'pending',
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS evaluations (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    candidate_id uuid NOT NULL,
+    job_id uuid NOT NULL,
+    company_id uuid NOT NULL,
+    technical_score double precision,
+    behavioral_score double precision,
+    overall_score double precision,
+    recommendation text,
+    interview_transcript jsonb,
+    evaluated_at timestamptz NOT NULL DEFAULT now()
+);
@@ -2,16 +2,42 @@ import os
 import logging
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from typing import List, Optional
 import asyncio
+import json
+import time
+import uuid
+from functools import partial
+from dataclasses import asdict
+from datetime import datetime, timezone
 
 
-from schemas.state import AgentState
+from schemas.state import AgentState, apply_state_update
 from agents.main_agent import create_recruitment_agent
-from utils.supabase_client import SupabaseClient
+from agents.cv_evaluator import aevaluate_cv_batch
+from agents.interviewer import get_behavioral_pool, get_technical_bank
+from utils.database import create_db_client, close_db_client, call_db
 from utils.llm_utils import validate_api_keys
+from utils.scheduler import FairScheduler
+from utils.task_queue import TaskQueue, TaskWorkerPool
+from utils.llm_cache import get_llm_cache
+from utils.llm_gateway import get_llm_gateway
+from utils.structured_output import structured_output_stats
+from utils.skill_matcher import prefilter_stats
+from utils.model_cascade import cascade_stats, get_cascade_policy
+from utils.company_stats import CompanyStatsCache
+from utils.outbox import Outbox, OutboxFlusher, OutboxKind
+from utils.pagination import parse_fields, decode_cursor
+from utils.cv_ingest import CVTextStore, CVIngestor, CVUploadError
+from utils.cv_compressor import compression_stats
+from utils.vector_index import CandidateIndex
+from utils.metrics import REGISTRY, EVALUATIONS_IN_FLIGHT, EVALUATION_DURATION, company_context
+from utils.idempotency import IdempotencyStore, IdempotentRunner, IdempotencyConflict, idempotency_key, request_fingerprint
 
 
 
@@ -22,23 +48,80 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize clients
-supabase_client = None
+# Initialize clients (db_client: SupabaseClient or AsyncPostgresClient, see DB_BACKEND)
+db_client = None
 agent = None
 
+# Shared by /evaluate and /batch-evaluate so one company's batch can't starve the rest
+scheduler = FairScheduler(int(os.getenv("EVALUATION_CONCURRENCY", "10")))
+
+# Per-job CV similarity index, to shortlist large pools before running the agent
+candidate_index = CandidateIndex(
+    dim=int(os.getenv("VECTOR_INDEX_DIM", "2048")),
+    max_jobs=int(os.getenv("VECTOR_INDEX_MAX_JOBS", "200"))
+)
+
+# Background evaluation queue (POST /tasks/evaluate)
+task_queue = None
+task_workers = None
+
+# Per-company dashboard stats, kept up to date on every saved evaluation
+stats_cache = None
+
+# Write-behind buffer for evaluation results (durable, flushed in bulk)
+outbox = None
+outbox_flusher = None
+
+# Uploaded CV files -> text, stored by content hash (POST /cv/upload)
+cv_ingestor = None
+
+# Retries and double submits of an evaluation run it once (Idempotency-Key)
+idempotency = None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global supabase_client, agent
+    global db_client, agent, task_queue, task_workers, stats_cache, outbox, outbox_flusher, cv_ingestor, idempotency
     
     logger.info("🚀 Starting Sumak ARP Backend...")
     
-    # Initialize Supabase
+    # Initialize database client (Supabase REST or direct Postgres pool)
     try:
-        supabase_client = SupabaseClient()
-        logger.info("✅ Supabase connected")
+        db_client = await create_db_client()
+        logger.info(f"✅ Database connected ({type(db_client).__name__})")
     except Exception as e:
-        logger.error(f"❌ Supabase connection failed: {e}")
+        logger.error(f"❌ Database connection failed: {e}")
+    
+    # Initialize company stats cache (reconciled against Supabase periodically)
+    if db_client:
+        daily_days = int(os.getenv("STATS_DAILY_DAYS", "30"))
+        stats_cache = CompanyStatsCache(
+            loader=partial(db_client.get_stats_accumulator, days=daily_days),
+            max_entries=int(os.getenv("STATS_CACHE_MAX_ENTRIES", "1000")),
+            daily_days=daily_days
+        )
+        stats_cache.start(float(os.getenv("STATS_RECONCILE_SECONDS", "300")))
+    
+    # Initialize write-behind outbox (Supabase writes leave the request path)
+    if db_client and os.getenv("OUTBOX_ENABLED", "true").lower() != "false":
+        try:
+            outbox = Outbox(os.getenv("OUTBOX_PATH", "data/outbox.db"))
+            outbox_flusher = OutboxFlusher(
+                outbox,
+                sinks={
+                    OutboxKind.EVALUATION: db_client.create_evaluations,
+                    OutboxKind.CANDIDATE_UPDATE: db_client.update_candidates
+                },
+                batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "100")),
+                flush_interval=float(os.getenv("OUTBOX_FLUSH_INTERVAL_SECONDS", "1.0")),
+                max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")),
+                on_delivered=record_delivered_stats
+            )
+            outbox_flusher.start()
+            logger.info("✅ Outbox started")
+        except Exception as e:
+            logger.error(f"❌ Outbox initialization failed: {e}")
+            outbox = outbox_flusher = None
     
     # Initialize LangGraph Agent
     try:
@@ -47,12 +130,81 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Agent initialization failed: {e}")
     
+    # Warm the behavioral question pool (refills in the background if low)
+    try:
+        get_behavioral_pool().maybe_refill()
+        logger.info("✅ Behavioral question pool loaded")
+    except Exception as e:
+        logger.error(f"❌ Behavioral question pool failed: {e}")
+    
+    # Initialize background task queue
+    try:
+        task_queue = TaskQueue(
+            os.getenv("TASK_QUEUE_PATH", "data/tasks.db"),
+            lease_seconds=float(os.getenv("TASK_LEASE_SECONDS", "120")),
+            max_attempts=int(os.getenv("TASK_MAX_ATTEMPTS", "3")),
+            retention_seconds=float(os.getenv("TASK_RETENTION_SECONDS", str(7 * 24 * 3600)))
+        )
+        task_workers = TaskWorkerPool(
+            task_queue,
+            run_evaluation,
+            workers=int(os.getenv("TASK_WORKERS", "4"))
+        )
+        task_workers.start()
+        logger.info(f"✅ Task queue started with {task_workers.workers} workers")
+    except Exception as e:
+        logger.error(f"❌ Task queue initialization failed: {e}")
+        task_queue = task_workers = None
+    
+    # Initialize CV upload ingestion (text extraction runs in worker processes)
+    try:
+        cv_ingestor = CVIngestor(
+            CVTextStore(os.getenv("CV_STORE_PATH", "data/cv_texts.db")),
+            workers=int(os.getenv("CV_EXTRACTION_WORKERS", "2")),
+            max_bytes=int(float(os.getenv("CV_UPLOAD_MAX_MB", "50")) * 1024 * 1024),
+            max_chars=int(os.getenv("CV_MAX_TEXT_CHARS", "200000")),
+            timeout=float(os.getenv("CV_EXTRACTION_TIMEOUT_SECONDS", "60"))
+        )
+        logger.info("✅ CV ingestion ready")
+    except Exception as e:
+        logger.error(f"❌ CV ingestion initialization failed: {e}")
+    
+    # Initialize idempotent evaluation results
+    if os.getenv("IDEMPOTENCY_ENABLED", "true").lower() != "false":
+        try:
+            idempotency_store = IdempotencyStore(
+                os.getenv("IDEMPOTENCY_PATH", "data/idempotency.db"),
+                ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+            )
+            purged = idempotency_store.purge_expired()
+            idempotency = IdempotentRunner(idempotency_store)
+            logger.info(f"✅ Idempotency store ready ({purged} expired results purged)")
+        except Exception as e:
+            logger.error(f"❌ Idempotency store initialization failed: {e}")
+    
     # Validate API keys
     validate_api_keys()
     
     yield
     
     logger.info("🛑 Shutting down Sumak ARP Backend")
+    if task_workers:
+        await task_workers.stop()
+    if task_queue:
+        task_queue.close()
+    if stats_cache:
+        await stats_cache.stop()
+    if outbox_flusher:
+        await outbox_flusher.stop()
+    if outbox:
+        outbox.close()
+    if cv_ingestor:
+        cv_ingestor.close()
+        cv_ingestor.store.close()
+    if idempotency:
+        idempotency.store.close()
+    await get_llm_gateway().aclose()
+    await close_db_client(db_client)
 
 # Create FastAPI app
 app = FastAPI(
@@ -71,6 +223,490 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==================== HELPERS ====================
+
+@asynccontextmanager
+async def agent_slot(company_id: str):
+    """
+    FairScheduler slot for one agent run
+
+    The run is counted in evaluations_in_flight and timed, and its LLM
+    spend is attributed to the company in /metrics
+    """
+    with company_context(company_id):
+        async with scheduler.slot(company_id):
+            EVALUATIONS_IN_FLIGHT.inc()
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                EVALUATIONS_IN_FLIGHT.dec()
+                EVALUATION_DURATION.observe(time.perf_counter() - started)
+
+async def run_agent(state: AgentState) -> AgentState:
+    """
+    Run the LangGraph agent without blocking the event loop
+
+    The graph is driven through ainvoke so every LLM call is awaited;
+    LangGraph hands back the final channel values as a dict, which is
+    turned back into an AgentState for the callers. Runs are bounded by
+    the shared FairScheduler, queued per company
+    """
+    async with agent_slot(state.company_id):
+        result = await agent.ainvoke(state)
+    return AgentState(**result) if isinstance(result, dict) else result
+
+def validate_evaluation_request(request: dict):
+    """Raise 400 if the evaluation request lacks a required field"""
+    required_fields = ["candidate_id", "job_id", "company_id"]
+    for field in required_fields:
+        if field not in request:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required field: {field}"
+            )
+    if "cv_text" not in request and "cv_hash" not in request:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing required field: cv_text (or cv_hash of an uploaded CV)"
+        )
+
+async def resolve_cv_text(request: dict) -> dict:
+    """Request with cv_text filled in from the stored upload when it only has cv_hash"""
+    if "cv_text" in request or "cv_hash" not in request:
+        return request
+    if cv_ingestor is None:
+        raise HTTPException(status_code=503, detail="CV ingestion not available")
+    cv_text = await asyncio.to_thread(cv_ingestor.store.get_text, request["cv_hash"])
+    if cv_text is None:
+        raise HTTPException(status_code=404, detail=f"No uploaded CV with hash {request['cv_hash']}")
+    return {**request, "cv_text": cv_text}
+
+def group_requests_by_job(requests: List[dict], exclude: frozenset = frozenset()):
+    """
+    Split batch indexes into same-job groups (batched CV prompting) and singles
+
+    Requests are grouped only when company, job id, requirements and
+    description all match, since they share one prompt (and the
+    company's model cascade settings). Indexes in exclude (answered
+    without running the agent) always go to singles
+    """
+    groups = {}
+    singles = []
+    batching = os.getenv("CV_BATCH_ENABLED", "true").lower() != "false"
+
+    for i, req in enumerate(requests):
+        if i in exclude:
+            singles.append(i)
+            continue
+        try:
+            validate_evaluation_request(req)
+        except HTTPException:
+            singles.append(i)
+            continue
+        if "cv_text" not in req:
+            # cv_hash that didn't resolve: run_evaluation reports the error
+            singles.append(i)
+            continue
+        key = (
+            req.get("company_id"),
+            req.get("job_id"),
+            tuple(req.get("job_requirements", [])),
+            req.get("job_description", "")
+        )
+        groups.setdefault(key, []).append(i)
+
+    batched = []
+    for indexes in groups.values():
+        if batching and len(indexes) > 1:
+            batched.append(indexes)
+        else:
+            singles.extend(indexes)
+    return batched, singles
+
+def build_agent_state(request: dict, cv_result: Optional[dict] = None) -> AgentState:
+    """
+    AgentState for an evaluation request
+
+    cv_result is an evaluate_cv output computed upstream (batched CV
+    evaluation); the graph then skips its own CV LLM call
+    """
+    return AgentState(
+        candidate_id=request.get("candidate_id"),
+        job_id=request.get("job_id"),
+        company_id=request.get("company_id"),
+        cv_text=request.get("cv_text", ""),
+        job_requirements=request.get("job_requirements", []),
+        job_description=request.get("job_description", ""),
+        bypass_cache=bool(request.get("bypass_cache", False)),
+        **(cv_result or {})
+    )
+
+def evaluation_idempotency(request: dict, header_key: Optional[str] = None):
+    """(key, fingerprint) of an evaluation request, None when it must not be deduplicated"""
+    if idempotency is None or request.get("bypass_cache"):
+        return None
+    return idempotency_key(request, header_key or request.get("idempotency_key")), request_fingerprint(request)
+
+def record_stats(evaluation: dict):
+    """Apply a saved evaluation row to the company stats cache"""
+    if stats_cache:
+        stats_cache.record(
+            evaluation["company_id"],
+            evaluation["overall_score"],
+            evaluation["recommendation"],
+            evaluation["evaluated_at"]
+        )
+
+def record_delivered_stats(kind: str, payloads: List[dict]):
+    """Outbox callback: evaluations count in the stats once Supabase has them"""
+    if kind == OutboxKind.EVALUATION:
+        for evaluation in payloads:
+            record_stats(evaluation)
+
+async def save_evaluation(result: AgentState):
+    """
+    Persist a finished evaluation
+
+    Queued in the outbox and flushed in bulk in the background, or
+    written directly when the outbox is disabled. The company stats
+    cache counts it only once it is saved. Failures are logged
+    """
+    try:
+        evaluation_data = {
+            "id": str(uuid.uuid4()),
+            "candidate_id": result.candidate_id,
+            "job_id": result.job_id,
+            "company_id": result.company_id,
+            "technical_score": float(result.technical_score or 0),
+            "behavioral_score": float(result.behavioral_score or 0),
+            "overall_score": float(result.overall_score or 0),
+            "recommendation": result.recommendation,
+            "interview_transcript": {
+                "questions": result.questions_asked,
+                "notes": result.notes
+            },
+            "evaluated_at": datetime.now(timezone.utc).isoformat()
+        }
+        candidate_update = {
+            "overall_score": result.overall_score,
+            "status": "completed"
+        }
+        
+        if outbox:
+            await asyncio.to_thread(outbox.add, [
+                (OutboxKind.EVALUATION, evaluation_data),
+                (OutboxKind.CANDIDATE_UPDATE, {"id": result.candidate_id, **candidate_update})
+            ])
+            outbox_flusher.notify(2)
+            # Counted in the stats cache once delivered (record_delivered_stats)
+            logger.info(f"✅ Evaluation queued for Supabase")
+        else:
+            saved = await call_db(db_client.create_evaluation, evaluation_data) is not None
+            await call_db(db_client.update_candidate, result.candidate_id, candidate_update)
+            logger.info(f"✅ Evaluation saved to Supabase")
+            if saved:
+                record_stats(evaluation_data)
+    except Exception as e:
+        logger.warning(f"⚠️ Supabase save failed: {e}")
+
+def evaluation_response(result: AgentState) -> dict:
+    """Response body of a finished evaluation"""
+    return {
+        "success": True,
+        "candidate_id": result.candidate_id,
+        "cv_score": round(result.cv_score or 0, 2),
+        "technical_score": round(result.technical_score or 0, 2),
+        "behavioral_score": round(result.behavioral_score or 0, 2),
+        "overall_score": round(result.overall_score or 0, 2),
+        "recommendation": result.recommendation,
+        "status": result.status.value,
+        "notes": result.notes
+    }
+
+async def execute_evaluation(request: dict, cv_result: Optional[dict] = None) -> dict:
+    """Agent run, persistence and response for a validated request"""
+    
+    # Create agent state
+    state = build_agent_state(request, cv_result)
+    
+    # Execute agent
+    logger.info(f"🤖 Running agent for {state.candidate_id}")
+    result = await run_agent(state)
+    
+    # Save to Supabase
+    await save_evaluation(result)
+    
+    # Return results
+    return evaluation_response(result)
+
+async def run_evaluation(request: dict, cv_result: Optional[dict] = None,
+                         idempotency_header: Optional[str] = None) -> dict:
+    """
+    Full evaluation of one request: agent run, persistence and response
+
+    Shared by /evaluate, /batch-evaluate and the task workers. Requests
+    with the same idempotency key (header, body idempotency_key, or
+    request fingerprint) run once; repeats get the stored response
+    marked idempotent_replay, a key reused with another body gets a 422
+    """
+    
+    try:
+        logger.info(f"📝 Evaluating candidate: {request.get('candidate_id')}")
+        
+        # Validate request
+        validate_evaluation_request(request)
+        request = await resolve_cv_text(request)
+        
+        dedupe = evaluation_idempotency(request, idempotency_header)
+        if dedupe is None:
+            return await execute_evaluation(request, cv_result)
+        
+        key, fingerprint = dedupe
+        result, outcome = await idempotency.run(key, fingerprint, partial(execute_evaluation, request, cv_result))
+        if outcome != IdempotentRunner.EXECUTED:
+            logger.info(f"♻️ Evaluation of {request.get('candidate_id')} served idempotently ({outcome})")
+            return {**result, "idempotent_replay": True}
+        return result
+    
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Evaluation error: {e}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e),
+            "status": "failed"
+        }
+
+async def iter_batch_evaluations(requests: List[dict], idle_timeout: Optional[float] = None):
+    """
+    Evaluate a batch, yielding (index, result, seconds) as each candidate finishes
+
+    First-finished order. Results pass through a bounded queue, so a slow
+    consumer holds evaluations back instead of piling results up in
+    memory. With idle_timeout, None is yielded whenever nothing finished
+    for that long (stream heartbeats). Closing the generator early (client
+    gone) cancels the evaluations still running
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("BATCH_STREAM_BUFFER", "32")))
+
+    async def resolve(request: dict) -> dict:
+        try:
+            return await resolve_cv_text(request)
+        except HTTPException:
+            return request
+
+    # Uploaded CVs (cv_hash) are looked up first so they can join same-job CV batches
+    requests = await asyncio.gather(*(resolve(request) for request in requests))
+
+    async def replayed(index: int, seen: set) -> bool:
+        """Already evaluated, or a repeat of an earlier item: kept out of CV batches"""
+        request = requests[index]
+        if "cv_text" not in request:
+            return False
+        dedupe = evaluation_idempotency(request)
+        if dedupe is None:
+            return False
+        if dedupe[0] in seen:
+            return True
+        seen.add(dedupe[0])
+        try:
+            return await asyncio.to_thread(idempotency.store.get, dedupe[0]) is not None
+        except Exception:
+            return False
+
+    seen_keys: set = set()
+    exclude = frozenset([i for i in range(len(requests)) if await replayed(i, seen_keys)])
+
+    async def evaluate_item(index: int, cv_result: Optional[dict] = None):
+        item_started = time.perf_counter()
+        try:
+            result = await run_evaluation(requests[index], cv_result)
+        except HTTPException as e:
+            result = {"success": False, "error": e.detail, "status": "failed"}
+        except Exception as e:
+            logger.error(f"❌ Batch item {index} failed: {e}")
+            result = {"success": False, "error": str(e), "status": "failed"}
+        await queue.put((index, result, time.perf_counter() - item_started))
+
+    async def evaluate_job_group(indexes: List[int]):
+        cv_results = [None] * len(indexes)
+        try:
+            states = [build_agent_state(requests[i]) for i in indexes]
+            with company_context(states[0].company_id):
+                async with scheduler.slot(states[0].company_id):
+                    cv_results = await aevaluate_cv_batch(states)
+        except Exception as e:
+            logger.warning(f"⚠️ Batched CV evaluation failed, evaluating one by one: {e}")
+        await asyncio.gather(*(
+            evaluate_item(i, cv_result) for i, cv_result in zip(indexes, cv_results)
+        ))
+
+    groups, singles = group_requests_by_job(requests, exclude)
+    for indexes in groups:
+        first = requests[indexes[0]]
+        get_technical_bank().warm(first["job_id"], first.get("job_requirements", []))
+    tasks = [
+        *(asyncio.create_task(evaluate_job_group(indexes)) for indexes in groups),
+        *(asyncio.create_task(evaluate_item(i)) for i in singles)
+    ]
+
+    try:
+        remaining = len(requests)
+        while remaining:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            remaining -= 1
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+class BatchTiming:
+    """Running batch timing (no per-item list, so memory stays flat)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.items = 0
+        self.completed = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def add(self, result: dict, seconds: float):
+        self.items += 1
+        self.completed += 1 if result.get("success") else 0
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+
+    def to_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "avg_item_ms": round(self.latency_sum / self.items * 1000, 2) if self.items else 0,
+            "max_item_ms": round(self.latency_max * 1000, 2),
+            "items_per_second": round(self.items / elapsed, 2) if elapsed > 0 else 0,
+            "concurrency_limit": scheduler.max_concurrency
+        }
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream"
+}
+
+def encode_stream_record(record: dict, stream_format: str) -> str:
+    data = json.dumps(record, default=str, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {record['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+# State fields sent with every /evaluate/stream node event
+PROGRESS_FIELDS = (
+    "status", "cv_score", "prefiltered", "questions_asked",
+    "technical_score", "behavioral_score", "overall_score", "recommendation"
+)
+
+async def iter_evaluation_progress(state: AgentState):
+    """
+    Run the agent for one candidate, yielding stream records as nodes start and finish
+
+    Node timings come from LangGraph's debug events (task scheduled) and
+    update events (task finished), so the parallel question branches are
+    timed separately. The last record is the saved result. Closing the
+    generator (client gone) cancels the running nodes and frees the
+    scheduler slot; nothing is saved then
+    """
+    started = time.perf_counter()
+    node_started = {}
+    node_ms = {}
+    snapshot = state.model_dump()
+    finished = False
+
+    def elapsed_ms(since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 2)
+
+    try:
+        async with agent_slot(state.company_id):
+            async for mode, chunk in agent.astream(state, stream_mode=["updates", "debug"]):
+                if mode == "debug":
+                    if chunk["type"] == "task":
+                        node = chunk["payload"]["name"]
+                        node_started[node] = time.perf_counter()
+                        yield {"type": "node_start", "node": node, "elapsed_ms": elapsed_ms(started)}
+                    continue
+
+                for node, update in chunk.items():
+                    apply_state_update(snapshot, update or {})
+                    node_ms[node] = elapsed_ms(node_started.get(node, started))
+                    yield {
+                        "type": "node",
+                        "node": node,
+                        "duration_ms": node_ms[node],
+                        "elapsed_ms": elapsed_ms(started),
+                        "update": jsonable_encoder(update or {}),
+                        "state": jsonable_encoder({k: snapshot.get(k) for k in PROGRESS_FIELDS})
+                    }
+
+        result = AgentState(**snapshot)
+        await save_evaluation(result)
+        finished = True
+        yield {
+            "type": "result",
+            **evaluation_response(result),
+            "timing": {"elapsed_ms": elapsed_ms(started), "nodes_ms": node_ms}
+        }
+    finally:
+        if not finished:
+            logger.info(f"🛑 Evaluation stream for {state.candidate_id} stopped after {elapsed_ms(started)} ms")
+
+def runtime_metrics():
+    """/metrics families read at scrape time from the scheduler and the LLM gateway"""
+    sched = scheduler.stats()
+    yield "scheduler_active_runs", "gauge", "Scheduler slots in use", [({}, sched["active"])]
+    yield "scheduler_queued_runs", "gauge", "Runs waiting for a scheduler slot", [
+        ({"company": company}, queued) for company, queued in sched["queued_by_company"].items()
+    ] or [({"company": "none"}, 0)]
+
+    gateway = get_llm_gateway().stats()
+    yield "llm_gateway_in_flight", "gauge", "LLM calls in flight", [({}, gateway["in_flight"])]
+    yield "llm_gateway_waiting", "gauge", "LLM calls waiting for a concurrency slot", [({}, gateway["waiting"])]
+    yield "llm_retries_total", "counter", "LLM calls retried", [
+        ({"caller": name}, caller["retries"]) for name, caller in gateway["callers"].items()
+    ]
+    yield "llm_throttled_total", "counter", "LLM calls throttled by the provider (429)", [({}, gateway["provider_429"])]
+    yield "llm_limiter_wait_seconds_total", "counter", "Time spent waiting on the RPM/TPM limits", [
+        ({}, gateway["limiter_wait_s"])
+    ]
+
+def storage_metrics():
+    """/metrics families read from the SQLite-backed LLM cache, outbox and task queue"""
+    cache = get_llm_cache()
+    if cache is not None:
+        cache_stats = cache.stats()
+        yield "llm_cache_hits_total", "counter", "LLM cache hits", [({}, cache_stats["hits"])]
+        yield "llm_cache_misses_total", "counter", "LLM cache misses", [({}, cache_stats["misses"])]
+        yield "llm_cache_hit_ratio", "gauge", "LLM cache hits over lookups", [({}, cache_stats["hit_ratio"])]
+
+    if outbox is not None:
+        outbox_stats = outbox.stats()
+        yield "outbox_pending_writes", "gauge", "Writes waiting in the outbox", [({}, outbox_stats["pending"])]
+        yield "outbox_parked_writes", "gauge", "Writes parked after too many failures", [({}, outbox_stats["parked"])]
+
+    if task_queue is not None:
+        queue_stats = task_queue.stats()
+        yield "task_queue_tasks", "gauge", "Background tasks by status", [
+            ({"status": status}, queue_stats[status]) for status in ("queued", "running", "completed", "failed")
+        ]
+
+REGISTRY.add_collector(runtime_metrics)
+REGISTRY.add_collector(storage_metrics, blocking=True)
+
 # ==================== ENDPOINTS ====================
 
 @app.get("/")
@@ -88,7 +724,7 @@ async def health():
     """Health check endpoint"""
     try:
         # Check critical services
-        supabase_status = "✓" if supabase_client else "✗"
+        supabase_status = "✓" if db_client else "✗"
         agent_status = "✓" if agent else "✗"
         openai_key = "✓" if os.getenv("OPENAI_API_KEY") else "✗"
         
@@ -96,6 +732,7 @@ async def health():
             "status": "healthy",
             "services": {
                 "supabase": supabase_status,
+                "db_backend": os.getenv("DB_BACKEND", "supabase"),
                 "agent": agent_status,
                 "openai": openai_key,
                 "timestamp": asyncio.get_event_loop().time()
@@ -105,8 +742,17 @@ async def health():
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencia por nodo, tokens
+    y coste por empresa, caché LLM, evaluaciones en curso y base de datos
+    """
+    storage = await asyncio.to_thread(REGISTRY.collect_blocking)
+    return PlainTextResponse(REGISTRY.render(storage), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/evaluate")
-async def evaluate_candidate(request: dict):
+async def evaluate_candidate(request: dict, idempotency_key: Optional[str] = Header(None)):
     """
     Evalúa un candidato completamente
     
@@ -116,160 +762,627 @@ async def evaluate_candidate(request: dict):
         "job_id": "str",
         "company_id": "str",
         "cv_text": "str",
+        "cv_hash": "str (alternativa a cv_text: hash devuelto por /cv/upload)",
+        "idempotency_key": "str (opcional, igual que la cabecera Idempotency-Key)",
         "job_requirements": ["skill1", "skill2"],
-        "job_description": "str (opcional)"
+        "job_description": "str (opcional)",
+        "bypass_cache": false (opcional, ignora la caché de respuestas LLM
+                               y fuerza una nueva evaluación)
     }
+
+    Reintentos y envíos duplicados (misma empresa, candidato, puesto, CV,
+    requisitos y descripción, o misma cabecera Idempotency-Key) no repiten
+    la evaluación: devuelven el resultado guardado con
+    "idempotent_replay": true. Reutilizar una Idempotency-Key con otro
+    body devuelve 422.
     """
     
-    try:
-        logger.info(f"📝 Evaluating candidate: {request.get('candidate_id')}")
-        
-        # Validate request
-        required_fields = ["candidate_id", "job_id", "company_id", "cv_text"]
-        for field in required_fields:
-            if field not in request:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required field: {field}"
-                )
-        
-        # Create agent state
-        state = AgentState(
-            candidate_id=request.get("candidate_id"),
-            job_id=request.get("job_id"),
-            company_id=request.get("company_id"),
-            cv_text=request.get("cv_text", ""),
-            job_requirements=request.get("job_requirements", []),
-            job_description=request.get("job_description", "")
-        )
-        
-        # Execute agent
-        logger.info(f"🤖 Running agent for {state.candidate_id}")
-        result = agent.invoke(state)
-        
-        # Save to Supabase (non-blocking)
+    return await run_evaluation(request, idempotency_header=idempotency_key)
+
+@app.post("/evaluate/stream")
+async def evaluate_candidate_stream(request: dict, idempotency_key: Optional[str] = Header(None)):
+    """
+    Evalúa un candidato enviando el progreso de cada nodo por SSE
+
+    Mismo body que /evaluate. Eventos:
+    - node_start: un nodo empieza (evaluate_cv, technical_questions, behavioral_questions, score)
+    - node: un nodo termina, con su duración, lo que cambió y el estado parcial
+      (cv_score, preguntas hasta ahora, puntuaciones...)
+    - result: resultado final guardado, igual que /evaluate, con tiempos por nodo
+    - error: la evaluación falló
+    Cerrar la conexión cancela la evaluación y libera el worker.
+    Si la evaluación ya estaba hecha (ver idempotencia en /evaluate) se
+    envía solo el evento result, con "idempotent_replay": true.
+    """
+    validate_evaluation_request(request)
+    request = await resolve_cv_text(request)
+    state = build_agent_state(request)
+    logger.info(f"📝 Streaming evaluation of candidate: {state.candidate_id}")
+
+    dedupe = evaluation_idempotency(request, idempotency_key)
+    stored = None
+    if dedupe:
         try:
-            evaluation_data = {
-                "candidate_id": result.candidate_id,
-                "job_id": result.job_id,
-                "company_id": result.company_id,
-                "technical_score": float(result.technical_score or 0),
-                "behavioral_score": float(result.behavioral_score or 0),
-                "overall_score": float(result.overall_score or 0),
-                "recommendation": result.recommendation,
-                "interview_transcript": {
-                    "questions": result.questions_asked,
-                    "notes": result.notes
-                }
-            }
-            
-            supabase_client.create_evaluation(evaluation_data)
-            supabase_client.update_candidate(
-                result.candidate_id,
-                {
-                    "overall_score": result.overall_score,
-                    "status": "completed"
-                }
-            )
-            logger.info(f"✅ Evaluation saved to Supabase")
+            stored = await idempotency.lookup(*dedupe)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    async def events():
+        if stored is not None:
+            yield encode_stream_record({"type": "result", **stored, "idempotent_replay": True}, "sse")
+            return
+        try:
+            async for record in iter_evaluation_progress(state):
+                if record["type"] == "result" and dedupe:
+                    response = {k: v for k, v in record.items() if k not in ("type", "timing")}
+                    await idempotency.remember(*dedupe, response)
+                yield encode_stream_record(record, "sse")
         except Exception as e:
-            logger.warning(f"⚠️ Supabase save failed: {e}")
-        
-        # Return results
-        return {
-            "success": True,
-            "candidate_id": result.candidate_id,
-            "cv_score": round(result.cv_score or 0, 2),
-            "technical_score": round(result.technical_score or 0, 2),
-            "behavioral_score": round(result.behavioral_score or 0, 2),
-            "overall_score": round(result.overall_score or 0, 2),
-            "recommendation": result.recommendation,
-            "status": result.status.value,
-            "notes": result.notes
-        }
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"❌ Evaluation error: {e}", exc_info=True)
-        return {
-            "success": False,
-            "error": str(e),
-            "status": "failed"
-        }
+            logger.error(f"❌ Evaluation stream error: {e}", exc_info=True)
+            yield encode_stream_record({"type": "error", "success": False, "error": str(e), "status": "failed"}, "sse")
+
+    return StreamingResponse(
+        events(),
+        media_type=STREAM_FORMATS["sse"],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/batch-evaluate")
-async def batch_evaluate_candidates(requests: list):
+async def batch_evaluate_candidates(requests: List[dict]):
     """
     Evalúa múltiples candidatos en batch
+
+    Los candidatos se evalúan en paralelo, limitados por EVALUATION_CONCURRENCY
+    y repartidos de forma justa entre empresas. Los candidatos de un mismo
+    puesto comparten prompts de evaluación de CV (varios CVs por llamada).
+    Los resultados se devuelven en el mismo orden que la entrada.
+    Para recibirlos a medida que terminan, usar /batch-evaluate/stream.
     """
-    results = []
-    
-    for req in requests:
-        result = await evaluate_candidate(req)
-        results.append(result)
-    
+    timing = BatchTiming()
+    results: List[Optional[dict]] = [None] * len(requests)
+
+    async for index, result, seconds in iter_batch_evaluations(requests):
+        results[index] = result
+        timing.add(result, seconds)
+
     return {
         "success": True,
         "total": len(requests),
-        "completed": sum(1 for r in results if r.get("success")),
-        "results": results
+        "completed": timing.completed,
+        "results": results,
+        "timing": timing.to_dict()
+    }
+
+@app.post("/batch-evaluate/stream")
+async def batch_evaluate_candidates_stream(requests: List[dict], format: str = "ndjson"):
+    """
+    Evalúa múltiples candidatos en batch y envía cada resultado en cuanto termina
+
+    format=ndjson (una línea JSON por registro) o format=sse (Server-Sent
+    Events). Registros, en orden de finalización:
+    {"type": "result", "index": 3, "candidate_id": "...", "item_ms": 812.4, "result": {...}}
+    ...
+    {"type": "summary", "total": 10, "completed": 9, "failed": 1, "timing": {...}}
+    Mientras no termina ningún candidato se envían latidos (heartbeat)
+    para que los proxies no corten la conexión.
+    """
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(STREAM_FORMATS)}")
+
+    async def records():
+        timing = BatchTiming()
+        heartbeat = float(os.getenv("BATCH_STREAM_HEARTBEAT_SECONDS", "15"))
+        async for item in iter_batch_evaluations(requests, idle_timeout=heartbeat):
+            if item is None:
+                yield ": keepalive\n\n" if format == "sse" else encode_stream_record({"type": "heartbeat"}, format)
+                continue
+            index, result, seconds = item
+            timing.add(result, seconds)
+            yield encode_stream_record({
+                "type": "result",
+                "index": index,
+                "candidate_id": requests[index].get("candidate_id"),
+                "item_ms": round(seconds * 1000, 2),
+                "result": result
+            }, format)
+
+        yield encode_stream_record({
+            "type": "summary",
+            "success": True,
+            "total": len(requests),
+            "completed": timing.completed,
+            "failed": timing.items - timing.completed,
+            "timing": timing.to_dict()
+        }, format)
+
+    return StreamingResponse(
+        records(),
+        media_type=STREAM_FORMATS[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/cv/upload")
+async def upload_cv(file: UploadFile = File(...)):
+    """
+    Sube un CV (PDF, DOCX o TXT) y extrae su texto
+
+    El archivo se copia por bloques a disco mientras se calcula su hash, sin
+    cargarlo entero en memoria (hasta CV_UPLOAD_MAX_MB). La extracción corre
+    en un pool de procesos. El texto se guarda por hash de contenido: volver
+    a subir el mismo archivo no lo procesa de nuevo (cached=true).
+    Devuelve cv_hash, que /evaluate acepta en lugar de cv_text.
+    """
+    if cv_ingestor is None:
+        raise HTTPException(status_code=503, detail="CV ingestion not available")
+    try:
+        entry = await cv_ingestor.ingest(file)
+    except CVUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        await file.close()
+
+    return {
+        "success": True,
+        "cv_hash": entry["hash"],
+        "filename": file.filename,
+        "kind": entry["kind"],
+        "size_bytes": entry["size_bytes"],
+        "chars": entry["chars"],
+        "cached": entry["cached"]
+    }
+
+@app.get("/cv/stats")
+async def get_cv_ingest_stats():
+    """
+    Subidas de CV, extracciones hechas y evitadas por hash, y tokens
+    ahorrados al comprimir los CVs en los prompts
+    """
+    compression = compression_stats.snapshot()
+    if cv_ingestor is None:
+        return {"success": True, "enabled": False, "compression": compression}
+    return {"success": True, "enabled": True, "stats": cv_ingestor.stats(), "compression": compression}
+
+@app.get("/cv/{cv_hash}")
+async def get_uploaded_cv(cv_hash: str, include_text: bool = False):
+    """
+    Datos de un CV subido (y su texto extraído con include_text=true)
+    """
+    if cv_ingestor is None:
+        raise HTTPException(status_code=503, detail="CV ingestion not available")
+    entry = await asyncio.to_thread(cv_ingestor.store.get, cv_hash, include_text)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="CV not found")
+    return {"success": True, "cv": entry}
+
+@app.get("/shortlist/stats")
+async def get_shortlist_stats():
+    """
+    Puestos y candidatos en el índice de similitud, y memoria usada
+    """
+    return {"success": True, "stats": candidate_index.stats()}
+
+@app.post("/shortlist/{job_id}/candidates")
+async def index_shortlist_candidates(job_id: str, candidates: List[dict]):
+    """
+    Añade candidatos al índice de similitud del puesto
+
+    Body: [{"candidate_id": "str", "cv_text": "str"}, ...] (o cv_hash de un
+    CV subido en lugar de cv_text). Volver a añadir un candidato reemplaza
+    su vector.
+    """
+    indexed, skipped = [], []
+    for candidate in candidates:
+        if "candidate_id" not in candidate:
+            skipped.append({"candidate_id": None, "error": "Missing required field: candidate_id"})
+            continue
+        try:
+            candidate = await resolve_cv_text(candidate)
+        except HTTPException as e:
+            skipped.append({"candidate_id": candidate["candidate_id"], "error": e.detail})
+            continue
+        if not candidate.get("cv_text"):
+            skipped.append({"candidate_id": candidate["candidate_id"], "error": "Missing required field: cv_text"})
+            continue
+        indexed.append((str(candidate["candidate_id"]), candidate["cv_text"]))
+
+    added = await asyncio.to_thread(candidate_index.add, job_id, indexed)
+    return {
+        "success": True,
+        "job_id": job_id,
+        "indexed": added,
+        "skipped": skipped,
+        "pool_size": candidate_index.size(job_id)
+    }
+
+@app.post("/shortlist/{job_id}")
+async def shortlist_candidates(job_id: str, request: dict):
+    """
+    Mejores candidatos del puesto por similitud del CV con el puesto
+
+    Request body:
+    {
+        "job_requirements": ["skill1", "skill2"],
+        "job_description": "str (opcional)",
+        "limit": 50 (opcional)
+    }
+    Ranking local (similitud coseno, sin LLM) en milisegundos. Evaluar
+    después solo la shortlist con /batch-evaluate o /tasks/batch-evaluate.
+    """
+    requirements = request.get("job_requirements", [])
+    query = "\n".join([*requirements, request.get("job_description", "")]).strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Missing required field: job_requirements or job_description")
+    try:
+        limit = int(request.get("limit", 50))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="limit must be an integer")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+
+    started = time.perf_counter()
+    results = await asyncio.to_thread(candidate_index.search, job_id, query, limit)
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"No candidates indexed for job {job_id}")
+
+    return {
+        "success": True,
+        "job_id": job_id,
+        "pool_size": candidate_index.size(job_id),
+        "shortlist": [{"candidate_id": cid, "similarity": score} for cid, score in results],
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
     }
 
+@app.delete("/shortlist/{job_id}/candidates/{candidate_id}")
+async def remove_shortlist_candidate(job_id: str, candidate_id: str):
+    """
+    Quita un candidato del índice de similitud del puesto
+    """
+    if not candidate_index.remove(job_id, candidate_id):
+        raise HTTPException(status_code=404, detail="Candidate not indexed")
+    return {"success": True, "pool_size": candidate_index.size(job_id)}
+
+@app.delete("/shortlist/{job_id}")
+async def drop_shortlist_index(job_id: str):
+    """
+    Borra el índice de similitud del puesto
+    """
+    return {"success": True, "removed": candidate_index.drop(job_id)}
+
+@app.post("/tasks/evaluate")
+async def submit_evaluation_task(request: dict, idempotency_key: Optional[str] = Header(None)):
+    """
+    Encola la evaluación de un candidato y devuelve el task_id de inmediato
+
+    El cuerpo es el mismo que en /evaluate (también la cabecera
+    Idempotency-Key). El resultado se consulta en GET /tasks/{task_id}/result
+    """
+    if task_queue is None:
+        raise HTTPException(status_code=503, detail="Task queue not available")
+    validate_evaluation_request(request)
+    if idempotency_key:
+        request = {**request, "idempotency_key": idempotency_key}
+    task_id = await asyncio.to_thread(task_queue.submit, request)
+    task_workers.notify()
+
+    return {"success": True, "task_id": task_id, "status": "queued"}
+
+@app.post("/tasks/batch-evaluate")
+async def submit_batch_evaluation_tasks(requests: List[dict]):
+    """
+    Encola varias evaluaciones, una tarea por candidato
+    """
+    if task_queue is None:
+        raise HTTPException(status_code=503, detail="Task queue not available")
+    for req in requests:
+        validate_evaluation_request(req)
+    task_ids = await asyncio.to_thread(task_queue.submit_many, requests)
+    task_workers.notify()
+
+    return {"success": True, "total": len(task_ids), "task_ids": task_ids, "status": "queued"}
+
+@app.get("/idempotency/stats")
+async def get_idempotency_stats():
+    """
+    Evaluaciones ejecutadas, unidas a una en curso y servidas del almacén
+    """
+    if idempotency is None:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "stats": await asyncio.to_thread(idempotency.stats)}
+
+@app.get("/tasks/stats")
+async def get_task_queue_stats():
+    """
+    Profundidad y antigüedad de la cola de evaluaciones
+    """
+    if task_queue is None:
+        return {"success": True, "enabled": False}
+    stats = await asyncio.to_thread(task_queue.stats)
+    stats["workers"] = task_workers.workers
+    return {"success": True, "enabled": True, "stats": stats}
+
+@app.get("/tasks/{task_id}")
+async def get_task_status(task_id: str):
+    """
+    Estado de una tarea de evaluación
+    """
+    if task_queue is None:
+        raise HTTPException(status_code=503, detail="Task queue not available")
+    task = await asyncio.to_thread(task_queue.get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+
+    task.pop("result")
+    return {"success": True, **task}
+
+@app.get("/tasks/{task_id}/result")
+async def get_task_result(task_id: str):
+    """
+    Resultado de una tarea de evaluación terminada
+    """
+    if task_queue is None:
+        raise HTTPException(status_code=503, detail="Task queue not available")
+    task = await asyncio.to_thread(task_queue.get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+
+    if task["status"] not in ("completed", "failed"):
+        return {"success": False, "task_id": task_id, "status": task["status"], "error": "Task not finished"}
+
+    return {
+        "success": task["status"] == "completed",
+        "task_id": task_id,
+        "status": task["status"],
+        "error": task["error"],
+        "result": task["result"]
+    }
+
+@app.get("/cache/stats")
+async def get_llm_cache_stats():
+    """
+    Aciertos y fallos de la caché de respuestas LLM
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "stats": await asyncio.to_thread(cache.stats)}
+
+@app.get("/llm/stats")
+async def get_llm_gateway_stats():
+    """
+    Llamadas LLM por nodo: esperas en cola, limitación (local y 429 del
+    proveedor), reintentos, tokens y coste estimado; y por nodo, respuestas
+    JSON válidas, reparadas y descartadas
+    """
+    return {
+        "success": True,
+        "stats": get_llm_gateway().stats(),
+        "structured_output": structured_output_stats.snapshot()
+    }
+
+@app.get("/outbox/stats")
+async def get_outbox_stats():
+    """
+    Escrituras pendientes hacia Supabase y latencia de los flush
+    """
+    if outbox is None:
+        return {"success": True, "enabled": False}
+    return {
+        "success": True,
+        "enabled": True,
+        "outbox": await asyncio.to_thread(outbox.stats),
+        "flusher": outbox_flusher.stats()
+    }
+
+@app.post("/outbox/flush")
+async def flush_outbox(requeue_parked: bool = False):
+    """
+    Fuerza un flush del outbox (opcionalmente reintenta las escrituras aparcadas)
+    """
+    if outbox is None:
+        raise HTTPException(status_code=503, detail="Outbox not enabled")
+    requeued = await asyncio.to_thread(outbox.requeue_parked) if requeue_parked else 0
+    flushed = await outbox_flusher.flush()
+    return {"success": True, "flushed": flushed, "requeued": requeued}
+
+@app.get("/prefilter/stats")
+async def get_prefilter_stats():
+    """
+    CVs descartados por el pre-filtro local y llamadas LLM ahorradas
+    """
+    return {"success": True, "stats": prefilter_stats.snapshot()}
+
+@app.get("/cascade/stats")
+async def get_cascade_stats():
+    """
+    Cascada de modelos en la evaluación de CV: tasa de escalado al modelo
+    grande, histograma de puntuaciones del modelo barato, y latencia y
+    coste ahorrados, para ajustar la banda de incertidumbre
+    """
+    return {"success": True, "config": get_cascade_policy().snapshot(), "stats": cascade_stats.snapshot()}
+
+@app.get("/cascade/config/{company_id}")
+async def get_cascade_config(company_id: str):
+    """
+    Configuración de la cascada de modelos de una empresa
+    """
+    policy = get_cascade_policy()
+    return {
+        "success": True,
+        "company_id": company_id,
+        "config": asdict(policy.for_company(company_id)),
+        "overrides": policy.overrides(company_id)
+    }
+
+@app.put("/cascade/config/{company_id}")
+async def update_cascade_config(company_id: str, request: dict):
+    """
+    Ajusta la cascada de modelos de una empresa
+
+    Request body (todos opcionales, los no enviados siguen el valor por defecto):
+    {
+        "enabled": true,
+        "triage_model": "gpt-4o-mini",
+        "escalation_model": "gpt-4-turbo",
+        "band_low": 40,
+        "band_high": 70
+    }
+    Los CVs con puntuación del modelo barato dentro de [band_low, band_high]
+    se vuelven a evaluar con el modelo grande.
+    """
+    try:
+        config = await asyncio.to_thread(get_cascade_policy().update, company_id, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "company_id": company_id, "config": asdict(config)}
+
+@app.delete("/cascade/config/{company_id}")
+async def reset_cascade_config(company_id: str):
+    """
+    Vuelve a la configuración de cascada por defecto para una empresa
+    """
+    reset = await asyncio.to_thread(get_cascade_policy().reset, company_id)
+    return {"success": True, "company_id": company_id, "reset": reset}
+
+@app.get("/questions/stats")
+async def get_question_bank_stats():
+    """
+    Estado del pool de preguntas de comportamiento y del banco técnico
+    """
+    return {
+        "success": True,
+        "behavioral_pool": get_behavioral_pool().stats(),
+        "technical_bank": get_technical_bank().stats()
+    }
+
+@app.post("/questions/warm")
+async def warm_technical_questions(request: dict):
+    """
+    Genera en segundo plano el banco de preguntas técnicas de un puesto
+
+    Request body:
+    {
+        "job_id": "str",
+        "job_requirements": ["skill1", "skill2"]
+    }
+    """
+    if "job_id" not in request:
+        raise HTTPException(status_code=400, detail="Missing required field: job_id")
+
+    get_technical_bank().warm(request["job_id"], request.get("job_requirements", []))
+    return {"success": True, "job_id": request["job_id"], "status": "warming"}
+
 @app.get("/evaluations/{company_id}")
-async def get_evaluations(company_id: str, limit: int = 100):
+async def get_evaluations(company_id: str, limit: int = 100, cursor: Optional[str] = None,
+                          fields: Optional[str] = None):
     """
-    Obtiene evaluaciones de una PYME
+    Obtiene evaluaciones de una PYME, de la más reciente a la más antigua
+
+    Paginación por cursor: next_cursor de la respuesta se pasa como
+    cursor para la página siguiente (null en la última). fields limita
+    las columnas, p. ej. fields=id,candidate_id,overall_score,recommendation
+    para listados sin interview_transcript
     """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    try:
+        columns = parse_fields(fields)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        evaluations = supabase_client.get_evaluations_by_company(company_id, limit)
+        page = await call_db(db_client.get_evaluations_page, company_id, limit, cursor, columns)
+        if page is None:
+            return {"success": False, "error": "Could not load evaluations"}
         return {
             "success": True,
             "company_id": company_id,
-            "count": len(evaluations),
-            "evaluations": evaluations
+            "count": len(page["evaluations"]),
+            "evaluations": page["evaluations"],
+            "next_cursor": page["next_cursor"]
         }
     except Exception as e:
         logger.error(f"Error getting evaluations: {e}")
         return {"success": False, "error": str(e)}
 
+@app.get("/stats/cache")
+async def get_stats_cache_stats():
+    """
+    Estado de la caché de estadísticas por PYME
+    """
+    if stats_cache is None:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "stats": stats_cache.stats()}
+
+@app.post("/stats/cache/reconcile")
+async def reconcile_stats_cache():
+    """
+    Recalcula desde Supabase las estadísticas en caché
+    """
+    if stats_cache is None:
+        raise HTTPException(status_code=503, detail="Stats cache not available")
+    drifted = await stats_cache.reconcile()
+    return {"success": True, "drifted": drifted}
+
 @app.get("/stats/{company_id}")
 async def get_company_stats(company_id: str):
     """
     Obtiene estadísticas de una PYME
+
+    Servidas desde memoria: se cargan de Supabase en la primera consulta
+    y se actualizan con cada evaluación guardada
     """
     try:
-        stats = supabase_client.get_stats(company_id)
+        if stats_cache is not None:
+            stats = await stats_cache.get(company_id)
+        else:
+            stats = await call_db(db_client.get_stats, company_id)
         return {
             "success": True,
             "company_id": company_id,
-            "stats": stats
+            "stats": stats or {}
         }
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         return {"success": False, "error": str(e)}
 
+@app.delete("/stats/{company_id}/cache")
+async def invalidate_company_stats(company_id: str):
+    """
+    Descarta las estadísticas en caché de una PYME (se recargan en la próxima consulta)
+    """
+    if stats_cache is None:
+        return {"success": True, "invalidated": 0}
+    return {"success": True, "invalidated": stats_cache.invalidate(company_id)}
+
 # ==================== ERROR HANDLERS ====================
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Handle HTTP exceptions"""
     logger.error(f"HTTP Error: {exc.detail}")
-    return {
-        "success": False,
-        "error": exc.detail,
-        "status_code": exc.status_code
-    }
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "success": False,
+            "error": exc.detail,
+            "status_code": exc.status_code
+        }
+    )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Handle general exceptions"""
     logger.error(f"Unhandled error: {exc}", exc_info=True)
-    return {
-        "success": False,
-        "error": "Internal server error",
-        "detail": str(exc)
-    }
+    return JSONResponse(
+        status_code=500,
+        content={
+            "success": False,
+            "error": "Internal server error",
+            "detail": str(exc)
+        }
+    )
 
 # ==================== RUN ====================
 
@@ -0,0 +1,110 @@
+from typing import Any, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+RECOMMENDATIONS = ("hire", "maybe", "reject")
+
+def _string_list(value: Any) -> List[str]:
+    """A list of strings from whatever the model sent (a string, mixed items)"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, str) and item.strip()]
+    return []
+
+class CVEvaluation(BaseModel):
+    """CV evaluation answer (CV_EVALUATION_PROMPT)"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    score: float
+    skills_found: List[str] = []
+    gaps: List[str] = []
+    summary: str = ""
+    continue_: Optional[bool] = Field(None, alias="continue")
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def _score_number(cls, value):
+        # "85", "85/100", "85%"
+        if isinstance(value, str):
+            value = value.split("/")[0].strip().rstrip("%")
+        return value
+
+    @field_validator("score")
+    @classmethod
+    def _score_range(cls, value: float) -> float:
+        return min(max(value, 0.0), 100.0)
+
+    @field_validator("skills_found", "gaps", mode="before")
+    @classmethod
+    def _lists(cls, value):
+        return _string_list(value)
+
+    @field_validator("summary", mode="before")
+    @classmethod
+    def _summary(cls, value):
+        return value if isinstance(value, str) else ""
+
+class CVBatchEntry(CVEvaluation):
+    """One candidate of a batched CV evaluation answer"""
+    ref: str
+
+    @field_validator("ref", mode="before")
+    @classmethod
+    def _ref(cls, value):
+        return str(value) if isinstance(value, (int, str)) else value
+
+class CVBatchEvaluation(BaseModel):
+    """Batched CV evaluation answer; entries are validated one by one"""
+    candidates: List[Any] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def _wrap(cls, value):
+        # A bare array, or the list under another common key
+        if isinstance(value, list):
+            return {"candidates": value}
+        if isinstance(value, dict) and "candidates" not in value:
+            return {"candidates": value.get("results") or value.get("evaluations") or []}
+        return value
+
+class ScoreOutput(BaseModel):
+    """
+    Final scoring answer (SCORING_PROMPT)
+
+    Every field is required: a truncated answer missing one is invalid,
+    never completed with made-up scores
+    """
+    technical_score: float
+    behavioral_score: float
+    recommendation: str
+
+    @field_validator("technical_score", "behavioral_score")
+    @classmethod
+    def _score_range(cls, value: float) -> float:
+        return min(max(value, 0.0), 100.0)
+
+    @field_validator("recommendation", mode="before")
+    @classmethod
+    def _recommendation(cls, value):
+        # "Hire", "maybe - needs ...", "hire/maybe/reject" echoed back;
+        # naming none of them (e.g. cut to "hi") is invalid
+        text = value.lower() if isinstance(value, str) else ""
+        found = [r for r in RECOMMENDATIONS if r in text]
+        if not found:
+            raise ValueError(f"recommendation must be one of {RECOMMENDATIONS}")
+        return found[0] if len(found) == 1 else "reject"
+
+class QuestionOutput(BaseModel):
+    """Single generated interview question"""
+    question: str = "Default question"
+
+class QuestionListOutput(BaseModel):
+    """Generated interview question set"""
+    questions: List[str] = []
+
+    @field_validator("questions", mode="before")
+    @classmethod
+    def _questions(cls, value):
+        return _string_list(value)
@@ -1,4 +1,5 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Annotated
+import operator
 from pydantic import BaseModel
 from enum import Enum
 from datetime import datetime
@@ -41,17 +42,21 @@ class AgentState(BaseModel):
     overall_score: Optional[float] = None
     
     # Interview data
-    questions_asked: List[str] = []
+    # Reducer fields: nodes return only new items, which LangGraph appends,
+    # so the parallel question branches never overwrite each other
+    questions_asked: Annotated[List[str], operator.add] = []
     answers_given: List[str] = []
     
     # Results
     recommendation: str = ""
     notes: str = ""
-    errors: List[str] = []
+    errors: Annotated[List[str], operator.add] = []
     
     # Control flow
     should_continue_technical: bool = True
     should_continue_behavioral: bool = True
+    bypass_cache: bool = False  # Skip LLM cache lookups for this run
+    prefiltered: bool = False  # Rejected by the local skill pre-filter, no LLM scoring
     
     # Timestamps
     created_at: datetime = None
@@ -63,3 +68,16 @@ class AgentState(BaseModel):
             self.created_at = datetime.now()
         if self.updated_at is None:
             self.updated_at = datetime.now()
+
+def apply_state_update(state: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a node's update to a state dict the way the graph does
+
+    Fields annotated with a reducer (questions_asked, errors) combine the
+    old and new values; every other field is overwritten
+    """
+    for key, value in update.items():
+        field = AgentState.model_fields.get(key)
+        reducer = next((m for m in field.metadata if callable(m)), None) if field else None
+        state[key] = reducer(state.get(key) or [], value) if reducer else value
+    return state
@@ -0,0 +1,97 @@
+"""
+Batched CV evaluation: packing CVs into prompts and caching the entries
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import utils.llm_cache as llm_cache
+from agents.cv_evaluator import (
+    BATCH_CV_EVALUATION_PROMPT, CV_EVALUATION_PROMPT, _aevaluate_cv_chunk, _cv_batch_entry_inputs,
+    _cv_prompt_inputs, _pack_cv_batches
+)
+from schemas.state import AgentState
+from utils.llm_cache import LLMCache, acache_lookup
+
+
+def _state(n, cv_text=None):
+    return AgentState(
+        candidate_id=f"c{n}", job_id="j1", company_id="co1", job_requirements=["Python", "Docker"],
+        job_description="Backend engineer", cv_text=cv_text or f"Candidate {n}. Python and Docker."
+    )
+
+
+class PackCvBatchesTest(unittest.TestCase):
+
+    def test_max_size(self):
+        with mock.patch.dict(os.environ, {"CV_BATCH_MAX_SIZE": "3", "CV_BATCH_TOKEN_BUDGET": "100000"}):
+            self.assertEqual(_pack_cv_batches([_state(n) for n in range(7)]), [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_token_budget(self):
+        states = [_state(n) for n in range(4)]
+        sizes = {}
+        for budget in (100000, 450):
+            with mock.patch.dict(os.environ, {"CV_BATCH_MAX_SIZE": "8", "CV_BATCH_TOKEN_BUDGET": str(budget)}):
+                batches = _pack_cv_batches(states)
+            self.assertEqual([i for batch in batches for i in batch], [0, 1, 2, 3])
+            sizes[budget] = len(batches)
+        # The fixed part of the prompt is counted once per batch, not per CV
+        self.assertEqual(sizes[100000], 1)
+        self.assertTrue(1 < sizes[450] < 4)
+
+    def test_oversized_cv_gets_its_own_batch(self):
+        with mock.patch.dict(os.environ, {"CV_BATCH_MAX_SIZE": "8", "CV_BATCH_TOKEN_BUDGET": "10"}):
+            self.assertEqual(_pack_cv_batches([_state(n) for n in range(3)]), [[0], [1], [2]])
+
+
+class CvBatchCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.previous = llm_cache._llm_cache
+        llm_cache._llm_cache = LLMCache(os.path.join(self.directory.name, "cache.db"))
+
+    def tearDown(self):
+        llm_cache._llm_cache._conn.close()
+        llm_cache._llm_cache = self.previous
+        self.directory.cleanup()
+
+    def _llm(self, content):
+        return RunnableLambda(lambda prompt_value: AIMessage(content=content))
+
+    async def test_entries_are_cached_under_the_batch_prompt_only(self):
+        states = [_state(0), _state(1)]
+        answer = json.dumps({"candidates": [
+            {"ref": "C1", "score": 81, "summary": "ok", "continue": True},
+            {"ref": "C2", "score": 42, "summary": "weak", "continue": False}
+        ]})
+        batch_llm = self._llm(answer)
+        outputs, _ = await _aevaluate_cv_chunk(states, batch_llm)
+
+        self.assertEqual([output["cv_score"] for output in outputs], [81, 42])
+        self.assertIsNone(await acache_lookup(CV_EVALUATION_PROMPT, batch_llm, _cv_prompt_inputs(states[1])))
+        cached = await acache_lookup(BATCH_CV_EVALUATION_PROMPT, batch_llm, _cv_batch_entry_inputs(states[1]))
+        self.assertEqual(json.loads(cached)["score"], 42)
+
+    async def test_repaired_batch_answer_is_not_cached(self):
+        answer = '{"candidates": [{"ref": "C1", "score": 81, "summary": "cut he'
+        outputs, _ = await _aevaluate_cv_chunk([_state(0)], self._llm(answer))
+
+        self.assertEqual(outputs[0]["cv_score"], 81)
+        self.assertEqual(llm_cache._llm_cache.stats()["writes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
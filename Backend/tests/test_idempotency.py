@@ -0,0 +1,40 @@
+"""
+Idempotency keys and request fingerprints
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from utils.idempotency import idempotency_key, request_fingerprint
+
+REQUEST = {
+    "company_id": "co1", "candidate_id": "c1", "job_id": "j1", "cv_text": "Python developer",
+    "job_requirements": ["Python"], "job_description": "Backend engineer"
+}
+
+
+class IdempotencyKeyTest(unittest.TestCase):
+
+    def test_same_request_same_key(self):
+        self.assertEqual(idempotency_key(dict(REQUEST)), idempotency_key(dict(REQUEST)))
+
+    def test_fingerprint_covers_every_input_of_the_evaluation(self):
+        for field, value in (
+            ("company_id", "co2"), ("candidate_id", "c2"), ("job_id", "j2"), ("cv_text", "Java developer"),
+            ("job_requirements", ["Python", "Docker"]), ("job_description", "Data engineer")
+        ):
+            with self.subTest(field=field):
+                self.assertNotEqual(request_fingerprint({**REQUEST, field: value}), request_fingerprint(REQUEST))
+
+    def test_header_key_is_scoped_to_the_company(self):
+        self.assertNotEqual(
+            idempotency_key(REQUEST, "retry-1"), idempotency_key({**REQUEST, "company_id": "co2"}, "retry-1")
+        )
+        self.assertEqual(idempotency_key(REQUEST, "retry-1"), idempotency_key({**REQUEST, "cv_text": "x"}, "retry-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+LLMCache: content-addressed LLM responses in memory and SQLite
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import utils.llm_cache as llm_cache
+from utils.llm_cache import LLMCache, acached_invoke
+
+
+class LLMCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.db")
+        self.cache = LLMCache(self.path, ttl_seconds=60, max_memory_entries=2)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.directory.cleanup()
+
+    def test_miss_then_hit(self):
+        key = LLMCache.make_key("gpt-4o", 0.0, "prompt")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, "answer")
+        self.assertEqual(self.cache.get(key), "answer")
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_ratio"]), (1, 1, 0.5))
+
+    def test_key_covers_model_temperature_and_prompt(self):
+        key = LLMCache.make_key("gpt-4o", 0.0, "prompt")
+        self.assertNotEqual(key, LLMCache.make_key("gpt-4o-mini", 0.0, "prompt"))
+        self.assertNotEqual(key, LLMCache.make_key("gpt-4o", 0.2, "prompt"))
+        self.assertNotEqual(key, LLMCache.make_key("gpt-4o", 0.0, "prompt "))
+
+    def test_disk_hit_after_memory_eviction_and_restart(self):
+        keys = [LLMCache.make_key("m", 0.0, str(n)) for n in range(3)]
+        for n, key in enumerate(keys):
+            self.cache.set(key, f"answer {n}")
+        self.assertEqual(self.cache.get(keys[0]), "answer 0")
+        self.assertEqual(self.cache.stats()["disk_hits"], 1)
+
+        reopened = LLMCache(self.path, ttl_seconds=60)
+        try:
+            self.assertEqual(reopened.get(keys[2]), "answer 2")
+        finally:
+            reopened._conn.close()
+
+    def test_expired_entry_is_a_miss(self):
+        key = LLMCache.make_key("m", 0.0, "prompt")
+        self.cache.set(key, "answer")
+        with mock.patch("utils.llm_cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.stats()["disk_entries"], 0)
+
+
+class CachedInvokeTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.previous = llm_cache._llm_cache
+        llm_cache._llm_cache = LLMCache(os.path.join(self.directory.name, "cache.db"))
+        self.prompt = ChatPromptTemplate.from_template("Evaluate {cv}")
+        self.calls = 0
+
+        def answer(prompt_value):
+            self.calls += 1
+            return AIMessage(content=f'{{"call": {self.calls}}}')
+
+        self.llm = RunnableLambda(answer)
+
+    def tearDown(self):
+        llm_cache._llm_cache._conn.close()
+        llm_cache._llm_cache = self.previous
+        self.directory.cleanup()
+
+    async def _invoke(self, cv, bypass=False):
+        return await acached_invoke(self.prompt, self.llm, {"cv": cv}, parse=lambda r: r.content, bypass=bypass)
+
+    async def test_repeated_prompt_is_answered_from_cache(self):
+        self.assertEqual(await self._invoke("a"), '{"call": 1}')
+        self.assertEqual(await self._invoke("a"), '{"call": 1}')
+        self.assertEqual(await self._invoke("b"), '{"call": 2}')
+        self.assertEqual(self.calls, 2)
+
+    async def test_bypass_calls_the_llm_and_refreshes_the_entry(self):
+        await self._invoke("a")
+        self.assertEqual(await self._invoke("a", bypass=True), '{"call": 2}')
+        self.assertEqual(await self._invoke("a"), '{"call": 2}')
+        self.assertEqual(llm_cache._llm_cache.stats()["bypassed"], 1)
+
+    async def test_answer_that_fails_to_parse_is_not_cached(self):
+        def parse(response):
+            raise ValueError("bad answer")
+
+        with self.assertRaises(ValueError):
+            await acached_invoke(self.prompt, self.llm, {"cv": "a"}, parse=parse)
+        self.assertEqual(await self._invoke("a"), '{"call": 2}')
+
+
+if __name__ == "__main__":
+    unittest.main()
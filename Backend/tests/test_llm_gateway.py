@@ -0,0 +1,78 @@
+"""
+LLMGateway retries and rate-limit accounting, with a stub model
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from utils.llm_gateway import GatewayLLM, LLMGateway
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+class _Model:
+    """Fails with 429 the first failures calls, then answers"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, prompt_value):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise _RateLimited("rate limited")
+        usage = {"input_tokens": 100, "output_tokens": 50, "total_tokens": 150}
+        return AIMessage(content="ok", usage_metadata=usage)
+
+
+class GatewayRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    def _gateway(self, model: _Model) -> LLMGateway:
+        gateway = LLMGateway(
+            rpm_limit=60, tpm_limit=600, max_retries=3, retry_base_seconds=0, expected_output_tokens=100
+        )
+        gateway.set_model_factory(lambda name, temperature: RunnableLambda(model))
+        return gateway
+
+    def _tokens_used(self, gateway: LLMGateway) -> float:
+        bucket = gateway._tokens
+        bucket.adjust(0)
+        return bucket.capacity - bucket._tokens
+
+    def _requests_used(self, gateway: LLMGateway) -> float:
+        bucket = gateway._requests
+        bucket.adjust(0)
+        return bucket.capacity - bucket._tokens
+
+    async def test_retries_reserve_tokens_once(self):
+        model = _Model(failures=2)
+        gateway = self._gateway(model)
+        await GatewayLLM(gateway, "test", "gpt-4o", 0.0).ainvoke("prompt")
+
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(gateway.stats()["retries"], 2)
+        # Settled to the real usage of the one successful attempt
+        self.assertAlmostEqual(self._tokens_used(gateway), 150, delta=5)
+        self.assertAlmostEqual(self._requests_used(gateway), 3, delta=0.1)
+
+    def test_final_failure_gives_tokens_back(self):
+        model = _Model(failures=10)
+        gateway = self._gateway(model)
+        with self.assertLogs("utils.llm_gateway", "ERROR"), self.assertRaises(_RateLimited):
+            GatewayLLM(gateway, "test", "gpt-4o", 0.0).invoke("prompt")
+
+        self.assertEqual(model.calls, 4)
+        self.assertAlmostEqual(self._tokens_used(gateway), 0, delta=5)
+        self.assertEqual(gateway.stats()["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Outbox delivery through outages and bad writes
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+from utils.outbox import Outbox, OutboxFlusher, OutboxKind
+
+
+class _Sink:
+    """Bulk insert standing in for Supabase: None when down or given a bad write"""
+
+    def __init__(self):
+        self.up = True
+        self.calls = 0
+        self.rows = []
+
+    async def __call__(self, payloads):
+        self.calls += 1
+        if not self.up or any(p.get("bad") for p in payloads):
+            return None
+        self.rows.extend(payloads)
+        return payloads
+
+
+class OutboxFlusherTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.outbox = Outbox(os.path.join(self.directory.name, "outbox.db"))
+        self.sink = _Sink()
+        self.flusher = OutboxFlusher(
+            self.outbox, {OutboxKind.EVALUATION: self.sink},
+            batch_size=100, flush_interval=0.01, max_attempts=3, max_backoff=1.0
+        )
+
+    def tearDown(self):
+        self.outbox.close()
+        self.directory.cleanup()
+
+    def _add(self, payloads):
+        self.outbox.add([(OutboxKind.EVALUATION, p) for p in payloads])
+
+    async def test_outage_then_recovery_parks_nothing(self):
+        self._add([{"n": i} for i in range(10)])
+        self.sink.up = False
+        with self.assertLogs("utils.outbox", "WARNING"):
+            for _ in range(20):
+                self.assertEqual(await self.flusher.flush(), 0)
+
+        stats = self.outbox.stats()
+        self.assertEqual((stats["pending"], stats["parked"]), (10, 0))
+        self.assertTrue(all(row["attempts"] == 0 for row in self.outbox.pending(100)))
+        # A bulk call and at most 3 single ones per flush
+        self.assertLessEqual(self.sink.calls, 20 * 4)
+        self.assertGreater(self.flusher.stats()["retry_delay_s"], self.flusher.flush_interval)
+
+        self.sink.up = True
+        self.assertEqual(await self.flusher.flush(), 10)
+        self.assertEqual(self.outbox.stats()["pending"], 0)
+        self.assertEqual(sorted(p["n"] for p in self.sink.rows), list(range(10)))
+        self.assertEqual(self.flusher.stats()["retry_delay_s"], self.flusher.flush_interval)
+
+    async def test_bad_write_is_parked_and_good_ones_delivered(self):
+        self._add([{"n": 0, "bad": True}, {"n": 1}, {"n": 2}])
+        with self.assertLogs("utils.outbox", "ERROR"):
+            for n in range(3):
+                self._add([{"n": 10 + n}])
+                await self.flusher.flush()
+
+        stats = self.outbox.stats()
+        self.assertEqual((stats["pending"], stats["parked"]), (0, 1))
+        self.assertEqual(sorted(p["n"] for p in self.sink.rows), [1, 2, 10, 11, 12])
+
+    async def test_bad_writes_at_the_head_do_not_block(self):
+        self._add([{"n": i, "bad": True} for i in range(3)] + [{"n": i} for i in range(3, 6)])
+        # First flush only reaches the bad writes and can't tell them from an outage
+        with self.assertLogs("utils.outbox", "WARNING"):
+            self.assertEqual(await self.flusher.flush(), 0)
+        self.assertEqual(await self.flusher.flush(), 3)
+
+        self.assertEqual(sorted(p["n"] for p in self.sink.rows), [3, 4, 5])
+        self.assertTrue(all(row["attempts"] == 1 for row in self.outbox.pending(100)))
+
+    async def test_on_delivered_sees_only_saved_writes(self):
+        delivered = []
+        self.flusher.on_delivered = lambda kind, payloads: delivered.extend((kind, p["n"]) for p in payloads)
+        self._add([{"n": 0}, {"n": 1, "bad": True}, {"n": 2}])
+
+        self.sink.up = False
+        with self.assertLogs("utils.outbox", "WARNING"):
+            await self.flusher.flush()
+        self.assertEqual(delivered, [])
+
+        self.sink.up = True
+        await self.flusher.flush()
+        self.assertEqual(delivered, [(OutboxKind.EVALUATION, 0), (OutboxKind.EVALUATION, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Keyset cursors and field projection of /evaluations
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import base64
+import unittest
+
+from utils.pagination import decode_cursor, encode_cursor, page_response, parse_fields, with_keyset
+
+
+def _rows(n):
+    # Newest first, two rows per timestamp so the id breaks ties
+    return [
+        {"id": f"id-{i:03d}", "evaluated_at": f"2026-10-{10 + i // 2:02d}T00:00:00+00:00", "overall_score": i}
+        for i in range(n)
+    ][::-1]
+
+
+class CursorTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        row = {"id": "3f2a", "evaluated_at": "2026-10-17T08:30:00.123456+00:00"}
+        cursor = encode_cursor(row)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), ("2026-10-17T08:30:00.123456+00:00", "3f2a"))
+
+    def test_bad_cursors_are_rejected(self):
+        for cursor in (
+            "", "not-a-cursor", "%%%",
+            base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+            base64.urlsafe_b64encode(b'["2026-10-17", 5]').decode(),
+            base64.urlsafe_b64encode(b'["2026-10-17", "id", "extra"]').decode(),
+        ):
+            with self.subTest(cursor=cursor), self.assertRaisesRegex(ValueError, "Invalid cursor"):
+                decode_cursor(cursor)
+
+    def test_pages_walk_every_row_once(self):
+        rows = _rows(7)
+        seen, cursor = [], None
+        while True:
+            remaining = rows
+            if cursor:
+                after = decode_cursor(cursor)
+                remaining = [r for r in rows if (r["evaluated_at"], r["id"]) < after]
+            page = page_response(remaining[:3 + 1], 3)
+            seen.extend(r["id"] for r in page["evaluations"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [r["id"] for r in rows])
+
+    def test_last_page_has_no_cursor(self):
+        self.assertIsNone(page_response(_rows(3), 3)["next_cursor"])
+        self.assertEqual(page_response([], 3), {"evaluations": [], "next_cursor": None})
+
+
+class FieldsTest(unittest.TestCase):
+
+    def test_keyset_columns_are_always_selected(self):
+        self.assertEqual(parse_fields("overall_score"), ["id", "overall_score", "evaluated_at"])
+        self.assertEqual(parse_fields(""), with_keyset(None))
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "password"):
+            parse_fields("id,password")
+
+
+if __name__ == "__main__":
+    unittest.main()
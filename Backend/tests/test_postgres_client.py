@@ -0,0 +1,54 @@
+"""
+AsyncPostgresClient query building, without a database
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from utils.postgres_client import AsyncPostgresClient
+
+
+class _PoolSpy:
+    """Stands in for the asyncpg pool, recording every query"""
+
+    def __init__(self):
+        self.queries = []
+
+    async def fetchrow(self, query, *args):
+        self.queries.append((query, args))
+        return None
+
+    def acquire(self):
+        raise AssertionError("no connection expected")
+
+
+class UpdateCandidateTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.client = AsyncPostgresClient("postgresql://unused")
+        self.client.pool = _PoolSpy()
+
+    async def test_only_id_does_not_query(self):
+        result = await self.client.update_candidate("c1", {"id": "c1"})
+        self.assertEqual(result, {})
+        self.assertEqual(self.client.pool.queries, [])
+
+    async def test_empty_data_does_not_query(self):
+        self.assertEqual(await self.client.update_candidate("c1", {}), {})
+        self.assertEqual(self.client.pool.queries, [])
+
+    async def test_columns_are_assigned(self):
+        await self.client.update_candidate("c1", {"id": "c1", "status": "completed", "overall_score": 80})
+        query, args = self.client.pool.queries[0]
+        self.assertIn("SET overall_score = $2, status = $3 WHERE id = $1", query)
+        self.assertEqual(args, ("c1", 80, "completed"))
+
+    async def test_bulk_with_only_ids_does_not_query(self):
+        self.assertEqual(await self.client.update_candidates([{"id": "c1"}, {"id": "c2"}]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
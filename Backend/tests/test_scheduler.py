@@ -0,0 +1,88 @@
+"""
+FairScheduler: global limit shared round-robin between companies
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+
+from utils.scheduler import FairScheduler
+
+
+class FairSchedulerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def _run(self, scheduler, submissions):
+        """Start every (company, label) in order behind a held slot; returns the order they ran in"""
+        order = []
+        gate = asyncio.Event()
+
+        async def job(company_id, label):
+            async with scheduler.slot(company_id):
+                order.append(label)
+                await asyncio.sleep(0)
+
+        async def blocker():
+            async with scheduler.slot("blocker"):
+                await gate.wait()
+
+        holding = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(job(company, label)) for company, label in submissions]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holding, *tasks)
+        return order
+
+    async def test_round_robin_between_companies(self):
+        submissions = [("big", f"big-{n}") for n in range(4)] + [("a", "a-0"), ("b", "b-0"), ("a", "a-1")]
+        order = await self._run(FairScheduler(max_concurrency=1), submissions)
+        self.assertEqual(order, ["big-0", "a-0", "b-0", "big-1", "a-1", "big-2", "big-3"])
+
+    async def test_concurrency_limit(self):
+        scheduler = FairScheduler(max_concurrency=2)
+        running = peak = 0
+
+        async def job(company_id):
+            nonlocal running, peak
+            async with scheduler.slot(company_id):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.001)
+                running -= 1
+
+        await asyncio.gather(*(job(f"co{n % 3}") for n in range(12)))
+        self.assertEqual(peak, 2)
+        self.assertEqual(scheduler.stats()["active"], 0)
+
+    async def test_cancelled_waiter_frees_its_place(self):
+        scheduler = FairScheduler(max_concurrency=1)
+        gate = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("a"):
+                await gate.wait()
+
+        async def waiter():
+            async with scheduler.slot("b"):
+                pass
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.stats()["queued"], 1)
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        gate.set()
+        await holding
+        self.assertEqual(scheduler.stats(), {
+            "max_concurrency": 1, "active": 0, "queued": 0, "queued_by_company": {}, "in_flight_by_company": {}
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
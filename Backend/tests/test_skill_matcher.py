@@ -0,0 +1,87 @@
+"""
+Local skill match and the CV pre-filter built on it
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from agents.cv_evaluator import _prefilter_output
+from schemas.state import AgentState
+from utils.skill_matcher import SkillMatcher, extract_skills
+
+
+def _state(requirements, cv_text):
+    return AgentState(
+        candidate_id="c1", job_id="j1", company_id="co1", cv_text=cv_text, job_requirements=requirements
+    )
+
+
+class SkillMatcherTest(unittest.TestCase):
+
+    def test_synonyms_match_both_ways(self):
+        self.assertEqual(SkillMatcher(["Kubernetes"]).match("Deployed on k8s").coverage, 1.0)
+        self.assertEqual(SkillMatcher(["k8s"]).match("Kubernetes admin").coverage, 1.0)
+
+    def test_skills_inside_requirement_phrases(self):
+        match = SkillMatcher(["3+ years of Python experience", "Trabajo en equipo"]).match("Python, Django")
+        self.assertEqual(match.matched, ["3+ years of Python experience"])
+        self.assertEqual(match.unknown, ["Trabajo en equipo"])
+        self.assertEqual(match.recognized, 0.5)
+
+    def test_ambiguous_words_inside_phrases_are_not_skills(self):
+        self.assertEqual(extract_skills("Willing to go the extra mile"), [])
+
+    def test_specific_skills_meet_umbrella_requirements(self):
+        for requirement, cv_text in (
+            ("SQL", "PostgreSQL, MySQL"),
+            ("Experience with cloud", "AWS and GCP"),
+            ("Frontend", "React developer"),
+            ("NoSQL databases", "MongoDB"),
+        ):
+            with self.subTest(requirement=requirement):
+                self.assertEqual(SkillMatcher([requirement]).match(cv_text).coverage, 1.0)
+
+    def test_umbrella_skill_does_not_meet_specific_requirement(self):
+        self.assertEqual(SkillMatcher(["PostgreSQL"]).match("SQL").coverage, 0.0)
+
+
+class PrefilterTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {
+            "SKILL_PREFILTER_ENABLED": "true",
+            "SKILL_PREFILTER_MIN_REQUIREMENTS": "3",
+            "SKILL_PREFILTER_MIN_RECOGNIZED": "0.5"
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rejects_cv_meeting_no_requirement(self):
+        output = _prefilter_output(_state(["Python", "Docker", "AWS"], "Java developer, Spring"))
+        self.assertTrue(output["prefiltered"])
+        self.assertEqual(output["cv_score"], 0)
+
+    def test_any_match_goes_to_llm(self):
+        requirements = ["Python", "Docker", "AWS", "Terraform", "Kafka", "Redis", "Go", "Rust", "Scala", "Spark", "Java"]
+        self.assertIsNone(_prefilter_output(_state(requirements, "Java developer")))
+
+    def test_too_few_recognized_requirements_go_to_llm(self):
+        self.assertIsNone(_prefilter_output(_state(["SQL", "Docker"], "Java developer")))
+        self.assertIsNone(_prefilter_output(_state(
+            ["Python", "Docker", "AWS", "Liderazgo", "Comunicacion", "Proactividad", "Trabajo en equipo"],
+            "Java developer"
+        )))
+
+    def test_umbrella_requirements_are_not_rejected(self):
+        self.assertIsNone(_prefilter_output(_state(["SQL", "cloud", "frontend"], "PostgreSQL, GCP, React")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Parsing of LLM answers: repair of damaged JSON and schema validation
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import utils.llm_cache as llm_cache
+from schemas.llm_outputs import CVEvaluation, ScoreOutput
+from utils.llm_cache import LLMCache, cached_invoke
+from utils.structured_output import StructuredOutputError, parse_structured, repair_json
+
+
+class RepairJsonTest(unittest.TestCase):
+
+    def test_truncated_string_value_is_kept(self):
+        repaired = repair_json('{"score": 80, "summary": "Strong backe')
+        self.assertEqual(json.loads(repaired), {"score": 80, "summary": "Strong backe"})
+
+    def test_truncated_number_is_dropped(self):
+        # 8 may have been 85
+        self.assertEqual(json.loads(repair_json('{"technical_score": 8')), {})
+        self.assertEqual(json.loads(repair_json('{"score": 80, "gaps": ["aws", 1')), {"score": 80, "gaps": ["aws"]})
+
+    def test_truncated_key_is_dropped(self):
+        self.assertEqual(json.loads(repair_json('{"techni')), {})
+
+    def test_prose_fences_and_trailing_commas(self):
+        repaired = repair_json('Here you go:\n{"questions": ["a", "b",],} hope it helps')
+        self.assertEqual(json.loads(repaired), {"questions": ["a", "b"]})
+
+    def test_no_json(self):
+        self.assertIsNone(repair_json("I can't evaluate this CV"))
+
+
+class ParseStructuredTest(unittest.TestCase):
+
+    def test_truncated_score_answer_is_invalid(self):
+        for content in ('{"technical_score": 8', '{"techni', '{"technical_score": 80, "behavioral_score": 70'):
+            with self.assertRaises(StructuredOutputError):
+                parse_structured(AIMessage(content=content), ScoreOutput, node="test")
+
+    def test_truncated_recommendation_is_invalid(self):
+        content = '{"technical_score": 80, "behavioral_score": 70, "recommendation": "hi'
+        with self.assertRaises(StructuredOutputError):
+            parse_structured(AIMessage(content=content), ScoreOutput, node="test")
+
+    def test_lenient_coercion(self):
+        content = '```json\n{"technical_score": 80, "behavioral_score": 70, "recommendation": "Hire"}\n```'
+        result = parse_structured(AIMessage(content=content), ScoreOutput, node="test")
+        self.assertEqual(result.recommendation, "hire")
+        self.assertEqual(parse_structured(AIMessage(content='{"score": "85/100"}'), CVEvaluation, "test").score, 85)
+
+
+class RepairedAnswerCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.previous = llm_cache._llm_cache
+        llm_cache._llm_cache = LLMCache(os.path.join(self.directory.name, "cache.db"))
+        self.prompt = ChatPromptTemplate.from_template("Evaluate {cv}")
+
+    def tearDown(self):
+        llm_cache._llm_cache._conn.close()
+        llm_cache._llm_cache = self.previous
+        self.directory.cleanup()
+
+    def _invoke(self, content):
+        llm = RunnableLambda(lambda prompt_value: AIMessage(content=content))
+        return cached_invoke(
+            self.prompt, llm, {"cv": "cv"},
+            parse=lambda response: parse_structured(response, CVEvaluation, node="test")
+        )
+
+    def test_repaired_answer_is_not_cached(self):
+        self.assertEqual(self._invoke('{"score": 70, "summary": "cut her').score, 70)
+        self.assertEqual(llm_cache._llm_cache.stats()["writes"], 0)
+
+    def test_clean_answer_is_cached(self):
+        self._invoke('{"score": 70}')
+        self.assertEqual(self._invoke('{"score": 10}').score, 70)
@@ -0,0 +1,165 @@
+"""
+TaskQueue leases with several processes on one queue file
+
+Run from the Backend directory:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from fastapi.testclient import TestClient
+
+from utils.task_queue import TaskQueue, TaskStatus
+
+
+class TaskLeaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tasks.db")
+        # Two processes sharing the file
+        self.alive = TaskQueue(self.path, lease_seconds=60)
+        self.restarted = TaskQueue(self.path, lease_seconds=60)
+
+    def tearDown(self):
+        self.alive.close()
+        self.restarted.close()
+        self.directory.cleanup()
+
+    def _age_heartbeat(self, task_id, seconds):
+        with self.alive._lock:
+            self.alive._conn.execute(
+                "UPDATE tasks SET heartbeat_at = heartbeat_at - ? WHERE id = ?", (seconds, task_id)
+            )
+
+    def test_recover_leaves_live_peer_tasks_running(self):
+        task_id = self.alive.submit({"company_id": "c1"})
+        self.assertEqual(self.alive.claim()["id"], task_id)
+
+        self.assertEqual(self.restarted.recover(), 0)
+        self.assertEqual(self.restarted.get(task_id)["status"], TaskStatus.RUNNING)
+        self.assertIsNone(self.restarted.claim())
+
+    def test_recover_requeues_expired_lease(self):
+        task_id = self.alive.submit({"company_id": "c1"})
+        self.alive.claim()
+        self._age_heartbeat(task_id, 61)
+
+        self.assertEqual(self.restarted.recover(), 1)
+        self.assertEqual(self.restarted.claim()["id"], task_id)
+        self.assertEqual(self.restarted.get(task_id)["attempts"], 2)
+
+    def test_heartbeat_keeps_lease(self):
+        task_id = self.alive.submit({"company_id": "c1"})
+        self.alive.claim()
+        self._age_heartbeat(task_id, 61)
+
+        self.assertEqual(self.alive.heartbeat([task_id]), 1)
+        self.assertEqual(self.restarted.recover(), 0)
+
+    def test_stale_owner_cannot_finish_reclaimed_task(self):
+        task_id = self.alive.submit({"company_id": "c1"})
+        self.alive.claim()
+        self._age_heartbeat(task_id, 61)
+        self.restarted.recover()
+        self.restarted.claim()
+
+        self.assertFalse(self.alive.complete(task_id, {"success": True}))
+        self.assertEqual(self.alive.heartbeat([task_id]), 0)
+        self.assertTrue(self.restarted.complete(task_id, {"success": True}))
+        self.assertEqual(self.alive.get(task_id)["status"], TaskStatus.COMPLETED)
+
+    def test_queue_file_without_lease_columns(self):
+        path = os.path.join(self.directory.name, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TABLE tasks (
+                id TEXT PRIMARY KEY, company_id TEXT, payload TEXT NOT NULL, status TEXT NOT NULL,
+                result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL, started_at REAL, finished_at REAL
+            )
+        """)
+        conn.execute(
+            "INSERT INTO tasks (id, payload, status, created_at, started_at) VALUES ('t1', '{}', ?, ?, ?)",
+            (TaskStatus.RUNNING, time.time() - 600, time.time() - 600)
+        )
+        conn.commit()
+        conn.close()
+
+        queue = TaskQueue(path, lease_seconds=60)
+        try:
+            self.assertEqual(queue.recover(), 1)
+            self.assertEqual(queue.claim()["id"], "t1")
+        finally:
+            queue.close()
+
+
+class TaskLimitsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = TaskQueue(
+            os.path.join(self.directory.name, "tasks.db"), lease_seconds=60, max_attempts=2, retention_seconds=3600
+        )
+
+    def tearDown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    def _shift(self, column, seconds):
+        with self.queue._lock:
+            self.queue._conn.execute(f"UPDATE tasks SET {column} = {column} - ?", (seconds,))
+
+    def test_task_losing_its_worker_every_time_fails(self):
+        task_id = self.queue.submit({"company_id": "c1"})
+        self.queue.claim()
+        self._shift("heartbeat_at", 61)
+        self.assertEqual(self.queue.recover(), 1)
+
+        self.queue.claim()
+        self._shift("heartbeat_at", 61)
+        with self.assertLogs("utils.task_queue", "ERROR"):
+            self.assertEqual(self.queue.recover(), 0)
+
+        task = self.queue.get(task_id)
+        self.assertEqual((task["status"], task["attempts"]), (TaskStatus.FAILED, 2))
+        self.assertIsNone(self.queue.claim())
+
+    def test_purge_deletes_only_old_finished_tasks(self):
+        old, recent, queued = (self.queue.submit({"n": n}) for n in range(3))
+        for task_id in (old, recent):
+            self.assertEqual(self.queue.claim()["id"], task_id)
+            self.queue.complete(task_id, {"success": True})
+        with self.queue._lock:
+            self.queue._conn.execute("UPDATE tasks SET finished_at = finished_at - 3601 WHERE id = ?", (old,))
+
+        self.assertEqual(self.queue.purge(), 1)
+        self.assertIsNone(self.queue.get(old))
+        self.assertEqual(self.queue.get(recent)["status"], TaskStatus.COMPLETED)
+        self.assertEqual(self.queue.get(queued)["status"], TaskStatus.QUEUED)
+
+
+class TaskEndpointsWithoutQueueTest(unittest.TestCase):
+
+    def test_unavailable_queue_returns_503(self):
+        import main
+
+        # No lifespan: nothing initialised, as when the queue fails to start
+        client = TestClient(main.app)
+        self.assertIsNone(main.task_queue)
+        self.assertEqual(client.post("/tasks/evaluate", json={}).status_code, 503)
+        self.assertEqual(client.post("/tasks/batch-evaluate", json=[]).status_code, 503)
+        self.assertEqual(client.get("/tasks/abc").status_code, 503)
+        self.assertEqual(client.get("/tasks/abc/result").status_code, 503)
+        self.assertEqual(client.get("/tasks/stats").json(), {"success": True, "enabled": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+from utils.database import call_db
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_KEYS = {
+    "hire": "recommended",
+    "maybe": "maybe",
+    "reject": "rejected"
+}
+
+# overall_score histogram: ten buckets of ten points, 100 falls in the last one
+HISTOGRAM_BUCKETS = 10
+
+def _histogram_bucket(score: float) -> int:
+    return min(max(int(score // 10), 0), HISTOGRAM_BUCKETS - 1)
+
+def _day(evaluated_at: Union[datetime, date, str, None]) -> date:
+    """UTC calendar day of an evaluation (today when unknown)"""
+    if evaluated_at is None:
+        return datetime.now(timezone.utc).date()
+    if isinstance(evaluated_at, str):
+        evaluated_at = datetime.fromisoformat(evaluated_at.replace("Z", "+00:00"))
+    if isinstance(evaluated_at, datetime):
+        if evaluated_at.tzinfo is not None:
+            evaluated_at = evaluated_at.astimezone(timezone.utc)
+        return evaluated_at.date()
+    return evaluated_at
+
+class StatsAccumulator:
+    """
+    Counts and score sums behind the /stats/{company_id} response
+
+    Filled either from a database aggregate (company_stats RPC) or row
+    by row, so both paths produce the exact same response. Kept per
+    company in CompanyStatsCache and updated with add() on every write
+    """
+
+    def __init__(self, total: int = 0, score_sum: float = 0.0, recommended: int = 0,
+                 maybe: int = 0, rejected: int = 0, histogram: Optional[Dict[int, int]] = None,
+                 daily: Optional[Dict[date, list]] = None):
+        self.total = total
+        self.score_sum = score_sum
+        self.counts = {"recommended": recommended, "maybe": maybe, "rejected": rejected}
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+        for bucket, count in (histogram or {}).items():
+            self.histogram[_histogram_bucket(int(bucket) * 10)] += count
+        # day -> [evaluations, score_sum]
+        self.daily: Dict[date, list] = daily or {}
+
+    def add(self, overall_score: Optional[float], recommendation: Optional[str],
+            evaluated_at: Union[datetime, date, str, None] = None):
+        score = float(overall_score or 0)
+        self.total += 1
+        self.score_sum += score
+        key = RECOMMENDATION_KEYS.get(recommendation)
+        if key:
+            self.counts[key] += 1
+        self.histogram[_histogram_bucket(score)] += 1
+        day = self.daily.setdefault(_day(evaluated_at), [0, 0.0])
+        day[0] += 1
+        day[1] += score
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "StatsAccumulator":
+        stats = cls()
+        for row in rows:
+            stats.add(row.get("overall_score"), row.get("recommendation"), row.get("evaluated_at"))
+        return stats
+
+    @classmethod
+    def from_aggregate(cls, data: Dict[str, Any]) -> "StatsAccumulator":
+        """From the JSON returned by the company_stats SQL function"""
+        return cls(
+            total=int(data.get("total_evaluations") or 0),
+            score_sum=float(data.get("score_sum") or 0),
+            recommended=int(data.get("recommended") or 0),
+            maybe=int(data.get("maybe") or 0),
+            rejected=int(data.get("rejected") or 0),
+            histogram={int(bucket): int(count) for bucket, count in (data.get("histogram") or {}).items()},
+            daily={
+                _day(day): [int(values["count"]), float(values["score_sum"] or 0)]
+                for day, values in (data.get("daily") or {}).items()
+            }
+        )
+
+    def to_response(self, daily_days: int = 30) -> Dict[str, Any]:
+        if not self.total:
+            return {"total_evaluations": 0}
+
+        today = datetime.now(timezone.utc).date()
+        days = [today - timedelta(days=offset) for offset in range(daily_days - 1, -1, -1)]
+
+        return {
+            "total_evaluations": self.total,
+            "average_score": round(self.score_sum / self.total, 2),
+            "recommended": self.counts["recommended"],
+            "maybe": self.counts["maybe"],
+            "rejected": self.counts["rejected"],
+            "score_histogram": {
+                f"{bucket * 10}-{bucket * 10 + (10 if bucket == HISTOGRAM_BUCKETS - 1 else 9)}": count
+                for bucket, count in enumerate(self.histogram)
+            },
+            "daily": [
+                {
+                    "date": day.isoformat(),
+                    "evaluations": self.daily[day][0],
+                    "average_score": round(self.daily[day][1] / self.daily[day][0], 2)
+                }
+                for day in days if day in self.daily
+            ]
+        }
+
+class CompanyStatsCache:
+    """
+    Per-company stats held in memory, updated incrementally on every write
+
+    A company is loaded from the database on its first read (concurrent
+    reads share that one load); after that record() applies each saved
+    evaluation to the cached accumulator, so reads cost O(1). reconcile()
+    reloads every cached company from the database, correcting drift from
+    writes made elsewhere or landing while a load was in flight.
+    invalidate() drops one company, or all of them. Least recently read
+    companies are evicted past max_entries
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        max_entries: int = 1000,
+        daily_days: int = 30
+    ):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.daily_days = daily_days
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, StatsAccumulator]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self._counters = {
+            "hits": 0, "misses": 0, "load_failures": 0, "records": 0,
+            "invalidations": 0, "reconciles": 0, "drifted": 0, "evictions": 0
+        }
+
+    async def get(self, company_id: str) -> Optional[Dict[str, Any]]:
+        """Stats response for a company, None when it can't be loaded"""
+        with self._lock:
+            stats = self._entries.get(company_id)
+            if stats is not None:
+                self._entries.move_to_end(company_id)
+                self._counters["hits"] += 1
+                return stats.to_response(self.daily_days)
+            self._counters["misses"] += 1
+
+        # Shielded: a cancelled request must not cancel the load other requests wait on
+        stats = await asyncio.shield(self._schedule_load(company_id))
+        return stats.to_response(self.daily_days) if stats is not None else None
+
+    def record(self, company_id: str, overall_score: Optional[float], recommendation: Optional[str],
+               evaluated_at: Union[datetime, date, str, None] = None):
+        """Apply a saved evaluation; companies not in memory are loaded on their next read"""
+        with self._lock:
+            stats = self._entries.get(company_id)
+            if stats is None:
+                return
+            stats.add(overall_score, recommendation, evaluated_at)
+            self._counters["records"] += 1
+
+    def invalidate(self, company_id: Optional[str] = None) -> int:
+        """Drop a company (or every company) so the next read reloads it"""
+        with self._lock:
+            if company_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                dropped = 1 if self._entries.pop(company_id, None) is not None else 0
+            self._counters["invalidations"] += dropped
+        return dropped
+
+    async def reconcile(self) -> int:
+        """Reload every cached company from the database; returns how many had drifted"""
+        with self._lock:
+            company_ids = list(self._entries)
+
+        drifted = 0
+        for company_id in company_ids:
+            fresh = await call_db(self.loader, company_id)
+            if fresh is None:
+                continue
+            with self._lock:
+                cached = self._entries.get(company_id)
+                if cached is None:
+                    continue
+                if cached.to_response(self.daily_days) != fresh.to_response(self.daily_days):
+                    drifted += 1
+                self._entries[company_id] = fresh
+
+        with self._lock:
+            self._counters["reconciles"] += 1
+            self._counters["drifted"] += drifted
+        if drifted:
+            logger.info(f"📊 Company stats reconciled: {drifted}/{len(company_ids)} had drifted")
+        return drifted
+
+    def start(self, interval_seconds: float):
+        """Reconcile in the background every interval_seconds"""
+        if interval_seconds > 0 and self._reconcile_task is None:
+            self._reconcile_task = asyncio.create_task(self._reconcile_loop(interval_seconds))
+
+    async def stop(self):
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            await asyncio.gather(self._reconcile_task, return_exceptions=True)
+            self._reconcile_task = None
+
+    async def _reconcile_loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.warning(f"⚠️ Company stats reconcile failed: {e}")
+
+    def _schedule_load(self, company_id: str) -> asyncio.Task:
+        task = self._loading.get(company_id)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._load(company_id))
+            self._loading[company_id] = task
+        return task
+
+    async def _load(self, company_id: str) -> Optional[StatsAccumulator]:
+        try:
+            stats = await call_db(self.loader, company_id)
+            if stats is None:
+                with self._lock:
+                    self._counters["load_failures"] += 1
+                return None
+
+            with self._lock:
+                self._entries[company_id] = stats
+                self._entries.move_to_end(company_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters["evictions"] += 1
+            return stats
+        finally:
+            self._loading.pop(company_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "companies": len(self._entries),
+                "loading": len(self._loading),
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0,
+                "reconciling": bool(self._reconcile_task and not self._reconcile_task.done()),
+                **self._counters
+            }
@@ -0,0 +1,227 @@
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from utils.llm_utils import estimate_tokens
+from utils.skill_matcher import get_skill_matcher, normalize
+
+# Section kind -> heading words (English and Spanish, accents stripped)
+SECTION_HEADINGS: Dict[str, List[str]] = {
+    "summary": ["summary", "profile", "about me", "objective", "resumen", "perfil", "sobre mi", "objetivo"],
+    "experience": [
+        "experience", "work experience", "professional experience", "employment", "work history",
+        "experiencia", "experiencia laboral", "experiencia profesional", "trayectoria"
+    ],
+    "skills": [
+        "skills", "technical skills", "technologies", "tech stack", "competencies", "tools",
+        "habilidades", "competencias", "tecnologias", "conocimientos", "herramientas", "aptitudes"
+    ],
+    "projects": ["projects", "proyectos", "portfolio", "portafolio"],
+    "education": ["education", "academic background", "educacion", "formacion", "formacion academica", "estudios"],
+    "certifications": ["certifications", "certificates", "courses", "certificaciones", "certificados", "cursos"],
+    "languages": ["languages", "idiomas", "lenguas"],
+    "other": [
+        "references", "referencias", "interests", "hobbies", "intereses", "aficiones",
+        "personal information", "datos personales", "contact", "contacto"
+    ],
+}
+
+# Base weight of each section kind, before relevance to the job
+SECTION_PRIORITY = {
+    "experience": 3.0, "skills": 3.0, "projects": 2.0, "summary": 2.0,
+    "certifications": 1.0, "education": 1.0, "languages": 1.0, "other": 0.0
+}
+
+# Lines that cost tokens and say nothing about the candidate
+BOILERPLATE_PATTERNS = [
+    r"^(curriculum vitae|curriculum|resume|hoja de vida|cv)$",
+    r"^(page|pagina|pag)\.? ?\d+( ?(of|de|/) ?\d+)?$",
+    r"^\d+ ?(/|of|de) ?\d+$",
+    r"^(references|referencias).*(request|solicitud|disposicion|demand)",
+    r"^[\W_]+$",
+]
+
+# Lines of the untitled top of the CV (name, headline, contact) always kept
+HEADER_LINES = 3
+
+_HEADING_INDEX = {
+    heading: kind for kind, headings in SECTION_HEADINGS.items() for heading in headings
+}
+_BOILERPLATE_RE = re.compile("|".join(BOILERPLATE_PATTERNS))
+_HEADING_CLEAN_RE = re.compile(r"[#*_:|=\-\s]+")
+
+def cv_token_budget() -> int:
+    return int(os.getenv("CV_PROMPT_TOKEN_BUDGET", "700"))
+
+def job_description_token_budget() -> int:
+    return int(os.getenv("JOB_DESCRIPTION_TOKEN_BUDGET", "150"))
+
+@dataclass
+class CVSection:
+    """Lines under one heading of a CV"""
+    kind: str
+    title: str = ""
+    lines: List[str] = field(default_factory=list)
+
+def _heading_kind(line: str) -> Optional[str]:
+    if len(line) > 40:
+        return None
+    key = _HEADING_CLEAN_RE.sub(" ", normalize(line)).strip()
+    return _HEADING_INDEX.get(key)
+
+def split_sections(cv_text: str) -> List[CVSection]:
+    """
+    Split a CV into sections at recognised headings
+
+    Duplicate lines (headers and footers repeated on every PDF page,
+    copy-pasted bullets) and boilerplate lines are dropped on the way.
+    Text before the first heading becomes a "header" section
+    """
+    sections = [CVSection(kind="header")]
+    seen = set()
+
+    for raw in cv_text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        kind = _heading_kind(line)
+        if kind is not None:
+            sections.append(CVSection(kind=kind, title=line))
+            continue
+
+        key = normalize(line)
+        if key in seen or _BOILERPLATE_RE.match(key):
+            continue
+        seen.add(key)
+        sections[-1].lines.append(line)
+
+    return [s for s in sections if s.lines]
+
+@dataclass
+class CompressedCV:
+    """Compressed CV text with its token counts"""
+    text: str
+    original_tokens: int
+    tokens: int
+    sections_kept: int
+    sections_dropped: int
+    over_budget: bool = False
+
+def _pack(sections: List[CVSection], requirements: List[str], budget: int) -> Tuple[str, int, int]:
+    """
+    Fill the budget with the most relevant lines
+
+    Sections are ranked by the requirements they mention plus their kind
+    priority. The budget is filled in passes: the first HEADER_LINES of
+    the header, then every line mentioning a requirement (most matches
+    first), then the remaining lines one per section per round in rank
+    order, so no single long section crowds out the rest. Kept lines are
+    written back in document order
+    """
+    matcher = get_skill_matcher(requirements) if requirements else None
+    kept: Dict[int, set] = {}
+    used = 0
+
+    def take(index: int, line: int) -> bool:
+        nonlocal used
+        section = sections[index]
+        cost = estimate_tokens(section.lines[line]) + 1
+        if index not in kept and section.title:
+            cost += estimate_tokens(section.title) + 1
+        if used + cost > budget:
+            return False
+        kept.setdefault(index, set()).add(line)
+        used += cost
+        return True
+
+    hits = [[len(matcher.match(line).matched) if matcher else 0 for line in s.lines] for s in sections]
+    ranked = sorted(
+        (i for i, s in enumerate(sections) if s.kind != "header"),
+        key=lambda i: (-(sum(1 for h in hits[i] if h) + SECTION_PRIORITY[sections[i].kind]), i)
+    )
+
+    for index, section in enumerate(sections):
+        if section.kind == "header":
+            for line in range(min(HEADER_LINES, len(section.lines))):
+                take(index, line)
+
+    relevant = [(hits[i][line], i, line) for i in ranked for line in range(len(sections[i].lines)) if hits[i][line]]
+    for _, index, line in sorted(relevant, key=lambda item: -item[0]):
+        take(index, line)
+
+    queues = {i: [line for line in range(len(sections[i].lines)) if line not in kept.get(i, ())] for i in ranked}
+    for pass_ranked in ([i for i in ranked if SECTION_PRIORITY[sections[i].kind] > 0], ranked):
+        while any(queues[i] for i in pass_ranked) and used < budget:
+            for index in pass_ranked:
+                if queues[index]:
+                    take(index, queues[index].pop(0))
+
+    parts = []
+    for index in sorted(kept):
+        section = sections[index]
+        if section.title:
+            parts.append(section.title)
+        parts.extend(section.lines[line] for line in sorted(kept[index]))
+    return "\n".join(parts), len(kept), len(sections) - len(kept)
+
+@lru_cache(maxsize=256)
+def _compress(cv_text: str, requirements: Tuple[str, ...], budget: int) -> CompressedCV:
+    original_tokens = estimate_tokens(cv_text)
+    sections = split_sections(cv_text)
+    deduped = "\n".join(
+        line for section in sections for line in ([section.title] if section.title else []) + section.lines
+    )
+    deduped_tokens = estimate_tokens(deduped)
+
+    if deduped_tokens <= budget:
+        compressed = CompressedCV(deduped, original_tokens, deduped_tokens, len(sections), 0)
+    else:
+        text, kept, dropped = _pack(sections, list(requirements), budget)
+        compressed = CompressedCV(text, original_tokens, estimate_tokens(text), kept, dropped, over_budget=True)
+
+    compression_stats.record(compressed)
+    return compressed
+
+def compress_cv(cv_text: str, requirements: List[str], budget: Optional[int] = None) -> CompressedCV:
+    """
+    CV text reduced to a token budget, keeping what matters for the job
+
+    Deterministic for the same input, so prompts built from it stay
+    cacheable. Memoized: the CV evaluator builds a candidate's prompt
+    inputs several times (cache lookup, batch packing, cache store)
+    """
+    return _compress(cv_text or "", tuple(requirements or ()), budget or cv_token_budget())
+
+class CompressionStats:
+    """Counters for CV compression, one entry per distinct CV and job"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.over_budget = 0
+        self.original_tokens = 0
+        self.tokens = 0
+
+    def record(self, result: CompressedCV):
+        with self._lock:
+            self.compressed += 1
+            self.over_budget += 1 if result.over_budget else 0
+            self.original_tokens += result.original_tokens
+            self.tokens += result.tokens
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "token_budget": cv_token_budget(),
+                "cvs_compressed": self.compressed,
+                "cvs_over_budget": self.over_budget,
+                "original_tokens": self.original_tokens,
+                "prompt_tokens": self.tokens,
+                "tokens_saved": self.original_tokens - self.tokens,
+                "compression_ratio": round(self.tokens / self.original_tokens, 4) if self.original_tokens else 0
+            }
+
+compression_stats = CompressionStats()
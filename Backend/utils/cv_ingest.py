@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+from xml.etree.ElementTree import iterparse
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction changes, so texts stored by an older version are re-extracted
+EXTRACTOR_VERSION = 1
+
+CV_KINDS = ("pdf", "docx", "txt")
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+class CVUploadError(ValueError):
+    """Rejected upload; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.status_code = status_code
+
+def detect_kind(filename: str, head: bytes) -> str:
+    """File type from its first bytes, the extension only breaks ties"""
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "docx"
+    name = (filename or "").lower()
+    if name.endswith((".pdf", ".docx", ".doc")):
+        raise CVUploadError(f"{filename} does not look like a valid {name.rsplit('.', 1)[-1].upper()} file", 415)
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at the end of the sample is fine
+        if e.start < len(head) - 3:
+            raise CVUploadError("Unsupported file type: expected PDF, DOCX or plain text", 415)
+    return "txt"
+
+def _clean_text(text: str) -> str:
+    lines = [re.sub(r"[ \t ]+", " ", line).strip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def _extract_pdf(path: str, max_chars: int) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise CVUploadError("PDF support requires pypdf (pip install pypdf)", 415)
+
+    # PdfReader reads objects from the file on demand, page by page
+    reader = PdfReader(path)
+    parts, size = [], 0
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        parts.append(text)
+        size += len(text)
+        if size >= max_chars:
+            break
+    return "\n".join(parts)
+
+def _extract_docx(path: str, max_chars: int) -> str:
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise CVUploadError("Invalid DOCX file")
+
+    with archive:
+        if "word/document.xml" not in archive.namelist():
+            raise CVUploadError("Invalid DOCX file: no word/document.xml")
+        parts, size = [], 0
+        # Streamed: the XML is parsed as it is decompressed, never held whole
+        with archive.open("word/document.xml") as document:
+            for _, element in iterparse(document, events=("end",)):
+                tag = element.tag
+                if tag == f"{_WORD_NS}t" and element.text:
+                    parts.append(element.text)
+                    size += len(element.text)
+                elif tag == f"{_WORD_NS}tab":
+                    parts.append("\t")
+                elif tag in (f"{_WORD_NS}br", f"{_WORD_NS}p"):
+                    parts.append("\n")
+                if tag == f"{_WORD_NS}p":
+                    element.clear()
+                if size >= max_chars:
+                    break
+    return "".join(parts)
+
+def _extract_txt(path: str, max_chars: int) -> str:
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        return f.read(max_chars)
+
+_EXTRACTORS = {"pdf": _extract_pdf, "docx": _extract_docx, "txt": _extract_txt}
+
+def extract_text(path: str, kind: str, max_chars: int = 200_000) -> str:
+    """
+    Plain text of a CV file, at most max_chars characters
+
+    Runs in a worker process (CPU-bound for PDFs). Raises CVUploadError
+    when the file can't be read
+    """
+    try:
+        text = _EXTRACTORS[kind](path, max_chars)
+    except CVUploadError:
+        raise
+    except Exception as e:
+        raise CVUploadError(f"Could not extract text from {kind.upper()} file: {e}")
+    return _clean_text(text)[:max_chars]
+
+class CVTextStore:
+    """
+    Extracted CV texts in SQLite, keyed by the SHA-256 of the uploaded file
+
+    The same file uploaded again (by any company) maps to the same row,
+    so it is never parsed twice
+    """
+
+    def __init__(self, path: str = "data/cv_texts.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cv_texts (
+                hash TEXT PRIMARY KEY,
+                extractor_version INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                filename TEXT,
+                size_bytes INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, cv_hash: str, with_text: bool = False) -> Optional[Dict[str, Any]]:
+        """Stored entry for a hash (None if unknown or from an older extractor)"""
+        columns = "hash, kind, filename, size_bytes, length(text) AS chars, created_at"
+        if with_text:
+            columns += ", text"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns} FROM cv_texts WHERE hash = ? AND extractor_version = ?",
+                (cv_hash, EXTRACTOR_VERSION)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_text(self, cv_hash: str) -> Optional[str]:
+        entry = self.get(cv_hash, with_text=True)
+        return entry["text"] if entry else None
+
+    def put(self, cv_hash: str, kind: str, filename: str, size_bytes: int, text: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cv_texts "
+                "(hash, extractor_version, kind, filename, size_bytes, text, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cv_hash, EXTRACTOR_VERSION, kind, filename, size_bytes, text, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _write_chunk(file, hasher, chunk: bytes):
+    hasher.update(chunk)
+    file.write(chunk)
+
+class CVIngestor:
+    """
+    Turns uploaded CV files into stored text
+
+    The upload is streamed chunk by chunk into a temporary file while it
+    is hashed, so memory stays flat whatever the file size (up to
+    max_bytes). A hash already in the store returns at once; otherwise
+    the text is extracted in a process pool, off the event loop, and
+    stored. Concurrent uploads of the same file share one extraction
+    """
+
+    def __init__(
+        self,
+        store: CVTextStore,
+        workers: int = 2,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_chars: int = 200_000,
+        timeout: float = 60,
+        chunk_size: int = 1024 * 1024
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._extracting: Dict[str, asyncio.Future] = {}
+        self._counters = {"uploads": 0, "cached": 0, "extracted": 0, "failed": 0, "bytes_received": 0}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: children don't inherit the server's threads and event loop
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def ingest(self, upload) -> Dict[str, Any]:
+        """
+        Store the text of an UploadFile; returns hash, kind, size, chars and
+        whether extraction was skipped (cached). Raises CVUploadError
+        """
+        self._counters["uploads"] += 1
+        tmp = tempfile.NamedTemporaryFile(prefix="cv-", delete=False)
+        try:
+            hasher = hashlib.sha256()
+            size = 0
+            head = b""
+            try:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise CVUploadError(f"File larger than {self.max_bytes // (1024 * 1024)} MB", 413)
+                    if not head:
+                        head = chunk[:1024]
+                    await asyncio.to_thread(_write_chunk, tmp, hasher, chunk)
+            finally:
+                tmp.close()
+                self._counters["bytes_received"] += size
+
+            if not size:
+                raise CVUploadError("Empty file", 400)
+
+            cv_hash = hasher.hexdigest()
+            entry = await asyncio.to_thread(self.store.get, cv_hash)
+            if entry is not None:
+                self._counters["cached"] += 1
+                return {**entry, "cached": True}
+
+            kind = detect_kind(upload.filename, head)
+            await self._extract_once(cv_hash, tmp.name, kind, upload.filename, size)
+            entry = await asyncio.to_thread(self.store.get, cv_hash)
+            return {**entry, "cached": False}
+        except CVUploadError:
+            self._counters["failed"] += 1
+            raise
+        finally:
+            try:
+                os.unlink(tmp.name)
+            except OSError:
+                pass
+
+    async def _extract_once(self, cv_hash: str, path: str, kind: str, filename: str, size: int):
+        future = self._extracting.get(cv_hash)
+        if future is not None:
+            # Same file already being extracted for another upload
+            await asyncio.shield(future)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._extracting[cv_hash] = future
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                text = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor(), extract_text, path, kind, self.max_chars),
+                    timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise CVUploadError(f"Text extraction took longer than {self.timeout:.0f}s")
+            if not text.strip():
+                raise CVUploadError("No text found in the file (scanned PDF?)")
+
+            await asyncio.to_thread(self.store.put, cv_hash, kind, filename, size, text)
+            self._counters["extracted"] += 1
+            logger.info(f"📄 Extracted {len(text)} chars from {filename} ({kind}, {size} bytes)")
+            future.set_result(None)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so a future nobody else awaited doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._extracting.pop(cv_hash, None)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "extracting": len(self._extracting),
+            **self._counters
+        }
@@ -0,0 +1,72 @@
+import asyncio
+import inspect
+import os
+import time
+from functools import partial
+from typing import Any, Callable
+
+from utils.metrics import DB_CALL_DURATION, DB_CALL_ERRORS
+
+DB_BACKENDS = ("supabase", "postgres")
+
+async def create_db_client():
+    """
+    Data-access client picked by DB_BACKEND
+
+    supabase (default): SupabaseClient over the REST API, blocking calls
+    postgres: AsyncPostgresClient on an asyncpg pool to DATABASE_URL
+    """
+    backend = os.getenv("DB_BACKEND", "supabase").lower()
+    if backend not in DB_BACKENDS:
+        raise ValueError(f"DB_BACKEND must be one of {', '.join(DB_BACKENDS)}, got {backend}")
+
+    if backend == "postgres":
+        # Imported here so the default backend doesn't need asyncpg
+        from utils.postgres_client import AsyncPostgresClient
+
+        dsn = os.getenv("DATABASE_URL")
+        if not dsn:
+            raise ValueError("DATABASE_URL required for DB_BACKEND=postgres")
+        client = AsyncPostgresClient(
+            dsn,
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+        )
+        await client.connect()
+        return client
+
+    from utils.supabase_client import SupabaseClient
+    return SupabaseClient()
+
+async def close_db_client(client):
+    if client is not None and hasattr(client, "close"):
+        await call_db(client.close)
+
+def _method_name(method: Callable[..., Any]) -> str:
+    while isinstance(method, partial):
+        method = method.func
+    return getattr(method, "__name__", type(method).__name__)
+
+async def call_db(method: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call a client method from async code, whichever backend it belongs to
+
+    Coroutine methods (AsyncPostgresClient) are awaited directly; blocking
+    ones (SupabaseClient) run in a worker thread. Latency and errors are
+    recorded per method for /metrics
+    """
+    name = _method_name(method)
+    started = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(method):
+            return await method(*args, **kwargs)
+        result = await asyncio.to_thread(method, *args, **kwargs)
+        if inspect.isawaitable(result):
+            return await result
+        return result
+    except Exception:
+        DB_CALL_ERRORS.labels(name).inc()
+        raise
+    finally:
+        DB_CALL_DURATION.labels(name).observe(time.perf_counter() - started)
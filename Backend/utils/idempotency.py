@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyConflict(ValueError):
+    """An Idempotency-Key was reused with a different request"""
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+def request_fingerprint(request: dict) -> str:
+    """
+    Hash of what decides an evaluation's outcome: company, candidate,
+    job, CV content, requirements and job description
+    """
+    return _sha256(json.dumps([
+        str(request.get("company_id")),
+        str(request.get("candidate_id")),
+        str(request.get("job_id")),
+        _sha256(request.get("cv_text") or ""),
+        [str(r) for r in request.get("job_requirements") or []],
+        _sha256(request.get("job_description") or "")
+    ]))
+
+def idempotency_key(request: dict, header_key: Optional[str] = None) -> str:
+    """
+    Key an evaluation request is deduplicated under
+
+    An explicit Idempotency-Key (scoped to the company, so tenants can't
+    collide; reusing it with another body is a conflict, see
+    IdempotentRunner); otherwise the request fingerprint, so a retry or
+    double submit of the same request maps to the same key
+    """
+    if header_key:
+        return "key:" + _sha256(f"{request.get('company_id')}:{header_key}")
+    return "eval:" + request_fingerprint(request)
+
+class IdempotencyStore:
+    """
+    Completed evaluation responses in SQLite, kept for ttl_seconds
+
+    Shared by every worker process on the host, so a retry landing on
+    another worker is still answered from here
+    """
+
+    def __init__(self, path: str = "data/idempotency.db", ttl_seconds: float = 86400):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotent_results (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_idempotent_results_created ON idempotent_results (created_at)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(fingerprint, result) stored under key, None if missing or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, result FROM idempotent_results WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put(self, key: str, fingerprint: str, result: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO idempotent_results (key, fingerprint, result, created_at) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(result, default=str), time.time())
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM idempotent_results WHERE created_at <= ?", (time.time() - self.ttl_seconds,)
+            )
+        return cursor.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM idempotent_results").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class IdempotentRunner:
+    """
+    Runs each evaluation at most once per idempotency key
+
+    A key with a stored result is answered from the store. Concurrent
+    requests for a key already running wait for that one execution
+    (single-flight) instead of starting their own; the execution is
+    shielded, so it completes and is stored even if the request that
+    started it goes away. Only successful results are stored, so a
+    failed evaluation can be retried
+    """
+
+    # Outcomes returned by run()
+    EXECUTED = "executed"
+    JOINED = "joined"
+    STORED = "stored"
+
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+        self._inflight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self._counters = {"executed": 0, "joined": 0, "stored": 0, "conflicts": 0}
+
+    async def lookup(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Stored result for key; raises IdempotencyConflict if it was for another request"""
+        stored = await asyncio.to_thread(self.store.get, key)
+        if stored is None:
+            return None
+        self._check(stored[0], fingerprint)
+        self._counters["stored"] += 1
+        return stored[1]
+
+    async def remember(self, key: str, fingerprint: str, result: Dict[str, Any]):
+        if result.get("success"):
+            await asyncio.to_thread(self.store.put, key, fingerprint, result)
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """(result, outcome) for key, calling execute only when nothing stored or running"""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check(inflight[0], fingerprint)
+            self._counters["joined"] += 1
+            return await asyncio.shield(inflight[1]), self.JOINED
+
+        stored = await self.lookup(key, fingerprint)
+        if stored is not None:
+            return stored, self.STORED
+
+        # Re-check: another request may have started it while the store was read
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check(inflight[0], fingerprint)
+            self._counters["joined"] += 1
+            return await asyncio.shield(inflight[1]), self.JOINED
+
+        task = asyncio.create_task(self._execute(key, fingerprint, execute))
+        self._inflight[key] = (fingerprint, task)
+        self._counters["executed"] += 1
+        return await asyncio.shield(task), self.EXECUTED
+
+    async def _execute(self, key: str, fingerprint: str, execute: Callable[[], Awaitable[Dict[str, Any]]]):
+        try:
+            result = await execute()
+            try:
+                await self.remember(key, fingerprint, result)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not store idempotent result: {e}")
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _check(self, stored_fingerprint: str, fingerprint: str):
+        if stored_fingerprint != fingerprint:
+            self._counters["conflicts"] += 1
+            raise IdempotencyConflict("Idempotency-Key already used for a different request")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._inflight),
+            "stored_results": self.store.count(),
+            "ttl_seconds": self.store.ttl_seconds,
+            **self._counters
+        }
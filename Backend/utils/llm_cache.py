@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessage
+
+from utils.structured_output import needs_repair
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    Content-addressed cache of LLM responses
+
+    Keys are a hash of model, temperature and the fully rendered prompt.
+    Entries live in an in-memory LRU in front of a SQLite store; both
+    honour the TTL and evict least recently used entries past their size
+    """
+
+    def __init__(
+        self,
+        path: str = "data/llm_cache.db",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 50000
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self._counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "writes": 0}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+
+    @staticmethod
+    def make_key(model: str, temperature: Optional[float], prompt: str) -> str:
+        """sha256 over model, temperature and rendered prompt"""
+        raw = json.dumps([model, temperature, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached value for key, None on miss or expiry"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._counters["misses"] += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self._counters["hits"] += 1
+            self._counters["disk_hits"] += 1
+            return row[0]
+
+    def set(self, key: str, value: str):
+        """Store value in memory and on disk"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._counters["writes"] += 1
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= 100:
+                self._trim_disk(now)
+
+    def record_bypass(self):
+        with self._lock:
+            self._counters["bypassed"] += 1
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self, now: float):
+        """Drop expired rows, then the least recently used past max_disk_entries"""
+        self._writes_since_trim = 0
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        excess = total - self.max_disk_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            memory_entries = len(self._memory)
+
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0,
+            "memory_entries": memory_entries,
+            "disk_entries": disk_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Process-wide cache, created on first use; None when LLM_CACHE_ENABLED=false"""
+    global _llm_cache
+
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "false":
+        return None
+
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(
+                    path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.db"),
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+                    max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024")),
+                    max_disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", "50000"))
+                )
+    return _llm_cache
+
+def _cache_key(prompt_value, llm) -> str:
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    temperature = getattr(llm, "temperature", None)
+    return LLMCache.make_key(model, temperature, prompt_value.to_string())
+
+def cached_invoke(prompt, llm, inputs: Dict[str, Any], parse: Callable[[Any], Any], bypass: bool = False):
+    """
+    Render the prompt, answer from cache when possible, else call the LLM
+
+    parse turns the response into the node output; only responses that
+    parse as they are get stored, so neither a malformed answer nor one
+    that needed repair (likely truncated) is replayed on retry. bypass
+    skips the lookup but still refreshes the entry
+    """
+    cache = get_llm_cache()
+    prompt_value = prompt.invoke(inputs)
+    if cache is None:
+        return parse(llm.invoke(prompt_value))
+
+    key = _cache_key(prompt_value, llm)
+    if bypass:
+        cache.record_bypass()
+    else:
+        cached = cache.get(key)
+        if cached is not None:
+            return parse(AIMessage(content=cached))
+
+    response = llm.invoke(prompt_value)
+    result = parse(response)
+    if not needs_repair(response.content):
+        cache.set(key, response.content)
+    return result
+
+async def acached_invoke(prompt, llm, inputs: Dict[str, Any], parse: Callable[[Any], Any], bypass: bool = False):
+    """
+    Async variant of cached_invoke, the LLM call is awaited
+
+    SQLite reads and writes (and the trims they trigger) run in a worker
+    thread so a slow disk doesn't stall the event loop
+    """
+    cache = get_llm_cache()
+    prompt_value = await prompt.ainvoke(inputs)
+    if cache is None:
+        return parse(await llm.ainvoke(prompt_value))
+
+    key = _cache_key(prompt_value, llm)
+    if bypass:
+        cache.record_bypass()
+    else:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return parse(AIMessage(content=cached))
+
+    response = await llm.ainvoke(prompt_value)
+    result = parse(response)
+    if not needs_repair(response.content):
+        await asyncio.to_thread(cache.set, key, response.content)
+    return result
+
+async def acache_lookup(prompt, llm, inputs: Dict[str, Any]) -> Optional[str]:
+    """Cached response content for a prompt without calling the LLM"""
+    cache = get_llm_cache()
+    if cache is None:
+        return None
+    return await asyncio.to_thread(cache.get, _cache_key(prompt.invoke(inputs), llm))
+
+async def acache_store(prompt, llm, inputs: Dict[str, Any], content: str):
+    """
+    Store content as the response to a prompt
+
+    Lets one entry of a multi-part answer (a batched prompt) be cached
+    under inputs of its own
+    """
+    cache = get_llm_cache()
+    if cache is not None:
+        await asyncio.to_thread(cache.set, _cache_key(prompt.invoke(inputs), llm), content)
@@ -0,0 +1,479 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+from utils.llm_utils import estimate_tokens
+from utils.metrics import (
+    LLM_COMPLETION_TOKENS, LLM_COST, LLM_ERRORS, LLM_PROMPT_TOKENS, LLM_REQUEST_DURATION, company_label
+)
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens (input, output), for the cost estimates in /llm/stats
+MODEL_PRICING = {
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+def model_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimated USD cost of a call, 0 for models missing from MODEL_PRICING"""
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+# HTTP statuses worth retrying (besides timeouts and connection errors)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Reservation-based token bucket
+
+    reserve() takes the amount right away, letting the balance go
+    negative, and returns how long the caller must wait for it to be
+    covered. Callers are served in arrival order without polling, and a
+    request larger than the bucket still gets through eventually.
+    Thread-safe, shared by the sync and async paths
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def adjust(self, amount: float):
+        """Give back (positive) or take (negative) tokens after the fact"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+class _CallerStats:
+    """Per-caller counters (one caller per node module)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.queue_wait_s = 0.0
+        self.queue_wait_max_s = 0.0
+        self.latency_s = 0.0
+        self.latency_max_s = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 4),
+            "avg_queue_wait_ms": round(self.queue_wait_s / calls * 1000, 2),
+            "max_queue_wait_ms": round(self.queue_wait_max_s * 1000, 2),
+            "avg_latency_ms": round(self.latency_s / calls * 1000, 2),
+            "max_latency_ms": round(self.latency_max_s * 1000, 2)
+        }
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait (Retry-After / retry-after-ms), if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, 429 and 5xx"""
+    name = type(error).__name__
+    if name in ("APITimeoutError", "APIConnectionError", "TimeoutError", "ConnectError", "ReadTimeout"):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+class LLMGateway:
+    """
+    Single entry point for every LLM call of the agents
+
+    All models share one pooled HTTP client, and calls go through:
+    - a concurrency cap of max_concurrency calls in flight (the async
+      path the API uses; the blocking path of scripts has its own),
+    - token buckets on requests per minute and on estimated tokens per
+      minute (prompt + expected_output_tokens, corrected with the real
+      usage once the response arrives),
+    - retries with jittered exponential backoff for timeouts, 429 and
+      5xx. A provider Retry-After is honoured and pauses every caller,
+      not only the one that got throttled.
+    The OpenAI client's own retries are disabled so they don't bypass
+    the limits. Queue waits, throttling, tokens and estimated cost are
+    counted per caller (stats())
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        rpm_limit: float = 500,
+        tpm_limit: float = 300_000,
+        max_retries: int = 4,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 30.0,
+        request_timeout: float = 60.0,
+        max_connections: int = 50,
+        expected_output_tokens: int = 400
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+        self.expected_output_tokens = expected_output_tokens
+
+        self._requests = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self._tokens = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self._blocked_until = 0.0
+
+        # Builds the underlying chat model; swapped for a stub in benchmarks
+        self.model_factory: Callable[[str, float], Runnable] = self._openai_model
+        self._models: Dict[tuple, Runnable] = {}
+        self._http_clients = None
+        self._lock = threading.Lock()
+
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._async_loop = None
+
+        self._callers: Dict[str, _CallerStats] = {}
+        self._in_flight = 0
+        self._waiting = 0
+        self._throttle = {"limiter_waits": 0, "limiter_wait_s": 0.0, "provider_429": 0, "cooldowns": 0}
+
+    # ---------- models ----------
+
+    def _openai_model(self, model: str, temperature: float) -> Runnable:
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        if self._http_clients is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            timeout = httpx.Timeout(self.request_timeout, connect=10.0)
+            self._http_clients = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout)
+            )
+        sync_client, async_client = self._http_clients
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            max_retries=0,
+            request_timeout=self.request_timeout,
+            http_client=sync_client,
+            http_async_client=async_client
+        )
+
+    def _model(self, model: str, temperature: float, json_mode: bool = False) -> Runnable:
+        key = (model, temperature, json_mode, self.model_factory)
+        with self._lock:
+            instance = self._models.get(key)
+            if instance is None:
+                instance = self.model_factory(model, temperature)
+                # JSON mode: the provider only returns syntactically valid JSON
+                if json_mode and isinstance(instance, BaseChatModel):
+                    instance = instance.bind(response_format={"type": "json_object"})
+                self._models[key] = instance
+        return instance
+
+    def set_model_factory(self, factory: Callable[[str, float], Runnable]):
+        """Build models with factory from now on (stub models in benchmarks)"""
+        with self._lock:
+            self.model_factory = factory
+            self._models.clear()
+
+    # ---------- limits ----------
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """
+        Take one request and estimated_tokens from the buckets, returns the wait
+
+        The token estimate is only taken on the first attempt (retries pass
+        0): a rejected attempt used no tokens, and the reservation is
+        settled once, on success or final failure
+        """
+        wait = 0.0
+        if self._requests:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens and estimated_tokens:
+            wait = max(wait, self._tokens.reserve(estimated_tokens))
+        return max(wait, self._blocked_until - time.monotonic())
+
+    def _record_limiter_wait(self, wait: float):
+        if wait > 0:
+            with self._lock:
+                self._throttle["limiter_waits"] += 1
+                self._throttle["limiter_wait_s"] += wait
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._async_slots is None or self._async_loop is not loop:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+            self._async_loop = loop
+        return self._async_slots
+
+    def _retry_delay(self, caller: _CallerStats, error: Exception, attempt: int) -> float:
+        backoff = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+        retry_after = _retry_after(error)
+        with self._lock:
+            caller.retries += 1
+            if _status_code(error) == 429:
+                caller.throttled += 1
+                self._throttle["provider_429"] += 1
+        if retry_after is None:
+            return backoff
+
+        # Honour the provider's pause for everyone, plus jitter so callers don't return in lockstep
+        delay = min(retry_after, self.retry_max_seconds) + random.uniform(0, 0.1 * max(retry_after, 1.0))
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._throttle["cooldowns"] += 1
+        logger.warning(f"⚠️ LLM provider throttled, pausing calls for {delay:.1f}s")
+        return delay
+
+    # ---------- accounting ----------
+
+    def _caller(self, name: str) -> _CallerStats:
+        with self._lock:
+            return self._callers.setdefault(name, _CallerStats(name))
+
+    def _record_success(self, caller: _CallerStats, model: str, response, prompt_tokens: int,
+                        estimated_tokens: int, queue_wait: float, latency: float):
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens") or prompt_tokens
+        output_tokens = usage.get("output_tokens")
+        if output_tokens is None:
+            output_tokens = estimate_tokens(getattr(response, "content", "") or "")
+
+        # Settle the TPM reservation against what the call really used
+        if self._tokens:
+            self._tokens.adjust(estimated_tokens - (input_tokens + output_tokens))
+
+        cost = model_cost(model, input_tokens, output_tokens)
+        with self._lock:
+            caller.calls += 1
+            caller.input_tokens += input_tokens
+            caller.output_tokens += output_tokens
+            caller.cost_usd += cost
+            caller.queue_wait_s += queue_wait
+            caller.queue_wait_max_s = max(caller.queue_wait_max_s, queue_wait)
+            caller.latency_s += latency
+            caller.latency_max_s = max(caller.latency_max_s, latency)
+
+        LLM_REQUEST_DURATION.labels(caller.name, model).observe(latency)
+        LLM_PROMPT_TOKENS.labels(caller.name, model).inc(input_tokens)
+        LLM_COMPLETION_TOKENS.labels(caller.name, model).inc(output_tokens)
+        LLM_COST.labels(company_label(), model).inc(cost)
+
+    def _record_failure(self, caller: _CallerStats, error: Exception, estimated_tokens: int):
+        # No usage to settle against: give the whole TPM reservation back
+        if self._tokens:
+            self._tokens.adjust(estimated_tokens)
+        with self._lock:
+            caller.calls += 1
+            caller.errors += 1
+        LLM_ERRORS.labels(caller.name).inc()
+        logger.error(f"❌ LLM call failed after retries: {type(error).__name__}: {error}")
+
+    # ---------- calls ----------
+
+    def _estimate(self, prompt_value) -> int:
+        text = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+        return estimate_tokens(text)
+
+    def invoke(self, handle: "GatewayLLM", prompt_value, config=None, **kwargs):
+        """Blocking call (scripts and sync nodes)"""
+        caller = self._caller(handle.name)
+        prompt_tokens = self._estimate(prompt_value)
+        estimated = prompt_tokens + self.expected_output_tokens
+        model = self._model(handle.model_name, handle.temperature, handle.json_mode)
+        queued = time.perf_counter()
+
+        with self._sync_slots:
+            for attempt in range(self.max_retries + 1):
+                wait = self._reserve(estimated if attempt == 0 else 0)
+                self._record_limiter_wait(wait)
+                if wait > 0:
+                    time.sleep(wait)
+                started = time.perf_counter()
+                try:
+                    response = model.invoke(prompt_value, config, **kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        self._record_failure(caller, e, estimated)
+                        raise
+                    time.sleep(self._retry_delay(caller, e, attempt))
+                    continue
+                self._record_success(caller, handle.model_name, response, prompt_tokens, estimated,
+                                     started - queued, time.perf_counter() - started)
+                return response
+
+    async def ainvoke(self, handle: "GatewayLLM", prompt_value, config=None, **kwargs):
+        """Async call, waits on limits without blocking the event loop"""
+        caller = self._caller(handle.name)
+        prompt_tokens = self._estimate(prompt_value)
+        estimated = prompt_tokens + self.expected_output_tokens
+        model = self._model(handle.model_name, handle.temperature, handle.json_mode)
+        queued = time.perf_counter()
+
+        slots = self._async_semaphore()
+        self._waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                wait = self._reserve(estimated if attempt == 0 else 0)
+                self._record_limiter_wait(wait)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                started = time.perf_counter()
+                try:
+                    response = await model.ainvoke(prompt_value, config, **kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        self._record_failure(caller, e, estimated)
+                        raise
+                    await asyncio.sleep(self._retry_delay(caller, e, attempt))
+                    continue
+                self._record_success(caller, handle.model_name, response, prompt_tokens, estimated,
+                                     started - queued, time.perf_counter() - started)
+                return response
+        finally:
+            self._in_flight -= 1
+            slots.release()
+
+    async def aclose(self):
+        """Close the pooled HTTP clients"""
+        if self._http_clients is not None:
+            sync_client, async_client = self._http_clients
+            self._http_clients = None
+            sync_client.close()
+            await async_client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            callers = {name: stats.snapshot() for name, stats in self._callers.items()}
+            throttle = dict(self._throttle)
+        totals = {
+            key: sum(c[key] for c in callers.values())
+            for key in ("calls", "errors", "retries", "throttled", "input_tokens", "output_tokens")
+        }
+        totals["cost_usd"] = round(sum(c["cost_usd"] for c in callers.values()), 4)
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "rpm_limit": self._requests.capacity if self._requests else None,
+            "tpm_limit": self._tokens.capacity if self._tokens else None,
+            "cooldown_remaining_s": round(max(self._blocked_until - time.monotonic(), 0.0), 3),
+            "limiter_waits": throttle["limiter_waits"],
+            "limiter_wait_s": round(throttle["limiter_wait_s"], 3),
+            "provider_429": throttle["provider_429"],
+            "cooldowns": throttle["cooldowns"],
+            **totals,
+            "callers": callers
+        }
+
+class GatewayLLM(Runnable):
+    """
+    Chat model handle routed through the LLMGateway
+
+    Drop-in for a ChatOpenAI instance in chains (PROMPT | llm) and in
+    the LLM cache helpers: same invoke/ainvoke, model_name and
+    temperature. json_mode asks the provider for a JSON object answer
+    """
+
+    def __init__(self, gateway: LLMGateway, name: str, model: str, temperature: float, json_mode: bool = False):
+        self.gateway = gateway
+        self.name = name
+        self.model_name = model
+        self.temperature = temperature
+        self.json_mode = json_mode
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.gateway.invoke(self, input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.gateway.ainvoke(self, input, config, **kwargs)
+
+_llm_gateway: Optional[LLMGateway] = None
+_llm_gateway_lock = threading.Lock()
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway, configured from the environment on first use"""
+    global _llm_gateway
+
+    if _llm_gateway is None:
+        with _llm_gateway_lock:
+            if _llm_gateway is None:
+                _llm_gateway = LLMGateway(
+                    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+                    rpm_limit=float(os.getenv("LLM_RPM_LIMIT", "500")),
+                    tpm_limit=float(os.getenv("LLM_TPM_LIMIT", "300000")),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                    retry_base_seconds=float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5")),
+                    retry_max_seconds=float(os.getenv("LLM_RETRY_MAX_SECONDS", "30")),
+                    request_timeout=float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60")),
+                    max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "50")),
+                    expected_output_tokens=int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "400"))
+                )
+    return _llm_gateway
+
+def get_llm(name: str, model: str = "gpt-4-turbo", temperature: float = 0.0, json_mode: bool = False) -> GatewayLLM:
+    """Chat model for a node module; every call goes through the shared gateway"""
+    return GatewayLLM(get_llm_gateway(), name, model, temperature, json_mode)
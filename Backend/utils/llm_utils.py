@@ -1,7 +1,10 @@
 import os
 import logging
+from functools import lru_cache
 from typing import Dict, Any
 
+from utils.structured_output import parse_json, strip_fences
+
 logger = logging.getLogger(__name__)
 
 def validate_api_keys():
@@ -44,34 +47,60 @@ def validate_api_keys():
     
     logger.info("✅ All required API keys validated")
 
+# Model whose tokenizer is used to count prompt tokens (see estimate_tokens)
+TOKENIZER_MODEL = "gpt-4-turbo"
+
+@lru_cache(maxsize=4)
+def _encoding(model: str):
+    """tiktoken encoding for a model, None when tiktoken or its BPE files are unavailable"""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"⚠️ tiktoken unavailable for {model}, estimating ~4 chars/token: {e}")
+        return None
+
+def estimate_tokens(text: str, model: str = TOKENIZER_MODEL) -> int:
+    """
+    Token count for prompt budgeting
+
+    Exact with tiktoken; falls back to ~4 characters per token
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int, model: str = TOKENIZER_MODEL) -> str:
+    """Longest prefix of text within max_tokens, cut at a word boundary"""
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _encoding(model)
+    if encoding is None:
+        prefix = text[:max_tokens * 4]
+    else:
+        prefix = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    cut = prefix.rfind(" ")
+    return (prefix[:cut] if cut > len(prefix) // 2 else prefix).rstrip()
+
 def clean_json_response(content: str) -> str:
     """
     Clean JSON response from LLM
     Handles markdown code blocks and formatting
     """
-    
-    # Remove markdown code blocks
-    if content.startswith("```"):
-        content = content.split("```")[1]
-        if content.startswith("json"):
-            content = content[4:].strip()
-        content = content.rstrip("```").strip()
-    
-    return content
+    return strip_fences(content)
 
 def parse_llm_json(response: Any) -> Dict[str, Any]:
     """
     Parse LLM response as JSON
-    Handles common LLM formatting issues
+    Handles common LLM formatting issues, repairs truncated answers
     """
     
     try:
-        import json
-        
         content = response.content if hasattr(response, 'content') else str(response)
-        content = clean_json_response(content)
-        
-        return json.loads(content)
+        parsed, _ = parse_json(content)
+        return parsed
     
     except Exception as e:
         logger.error(f"Error parsing LLM JSON: {e}")
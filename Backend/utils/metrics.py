@@ -0,0 +1,273 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds), from a cache hit to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Company of the evaluation being run, for per-company metrics deep in the call stack
+current_company: ContextVar[Optional[str]] = ContextVar("current_company", default=None)
+
+@contextmanager
+def company_context(company_id: Optional[str]):
+    """Attribute what runs inside (tasks and threads started from here too) to company_id"""
+    token = current_company.set(company_id)
+    try:
+        yield
+    finally:
+        try:
+            current_company.reset(token)
+        except ValueError:
+            # Async generator closed from another context: nothing to restore
+            pass
+
+def company_label() -> str:
+    return current_company.get() or "unknown"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    """
+    One metric family, children per label values
+
+    Children are created on first use and kept in a dict, so recording a
+    sample is a dict lookup plus a lock-protected add
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    """Monotonic total; label values go to labels(), inc() on the result"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+class Gauge(Counter):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets (cumulative in the output)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+# A collector returns (name, kind, help, [(labels dict, value)]) families at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+class MetricsRegistry:
+    """
+    Metrics exposed at /metrics in the Prometheus text format
+
+    Instrumented code records into registered metrics as it runs;
+    collectors read components that already keep their own counters
+    (LLM cache, scheduler, gateway) only when scraped. Blocking
+    collectors (they query SQLite) are run apart, off the event loop
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+        self._blocking_collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector, blocking: bool = False):
+        with self._lock:
+            (self._blocking_collectors if blocking else self._collectors).append(collector)
+
+    def collect_blocking(self) -> list:
+        """Families of the blocking collectors, to pass to render()"""
+        with self._lock:
+            collectors = list(self._blocking_collectors)
+        return [family for collector in collectors for family in collector()]
+
+    def render(self, blocking_families: Iterable = ()) -> str:
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+
+        blocks = [metric.render() for metric in metrics]
+        families = [family for collector in collectors for family in collector()]
+        for name, kind, documentation, samples in families + list(blocking_families):
+            lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+            blocks.append("\n".join(lines))
+        return "\n".join(blocks) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+# ---------- metrics shared across modules ----------
+
+NODE_DURATION = histogram("agent_node_duration_seconds", "Duration of LangGraph node runs", ["node"])
+NODE_ERRORS = counter("agent_node_errors_total", "Node runs that raised or reported errors", ["node"])
+EVALUATIONS_IN_FLIGHT = gauge("evaluations_in_flight", "Agent runs currently holding a scheduler slot")
+EVALUATION_DURATION = histogram("evaluation_duration_seconds", "Duration of whole agent runs")
+LLM_REQUEST_DURATION = histogram("llm_request_duration_seconds", "LLM provider call latency", ["caller", "model"])
+LLM_PROMPT_TOKENS = counter("llm_prompt_tokens_total", "Prompt tokens sent to the LLM", ["caller", "model"])
+LLM_COMPLETION_TOKENS = counter("llm_completion_tokens_total", "Completion tokens received from the LLM", ["caller", "model"])
+LLM_COST = counter("llm_cost_usd_total", "Estimated LLM spend in USD", ["company", "model"])
+LLM_ERRORS = counter("llm_errors_total", "LLM calls that failed after retries", ["caller"])
+DB_CALL_DURATION = histogram("db_call_duration_seconds", "Database client call latency", ["method"])
+DB_CALL_ERRORS = counter("db_call_errors_total", "Database client calls that raised", ["method"])
+
+def instrument_node(name: str, func: Callable, afunc: Callable) -> Tuple[Callable, Callable]:
+    """Sync and async node functions timed into agent_node_duration_seconds"""
+    duration = NODE_DURATION.labels(name)
+    errors = NODE_ERRORS.labels(name)
+
+    @wraps(func)
+    def timed(state):
+        started = time.perf_counter()
+        try:
+            output = func(state)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+        if isinstance(output, dict) and output.get("errors"):
+            errors.inc()
+        return output
+
+    @wraps(afunc)
+    async def atimed(state):
+        started = time.perf_counter()
+        try:
+            output = await afunc(state)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+        if isinstance(output, dict) and output.get("errors"):
+            errors.inc()
+        return output
+
+    return timed, atimed
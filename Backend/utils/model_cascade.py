@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Optional
+
+from utils.llm_gateway import model_cost
+
+logger = logging.getLogger(__name__)
+
+# Tiers of the CV evaluation cascade
+TRIAGE = "triage"
+ESCALATION = "escalation"
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    """
+    How a company's CVs are scored
+
+    With the cascade enabled, triage_model scores every CV first; only
+    scores inside [band_low, band_high] (the borderline ones) are scored
+    again by escalation_model, whose answer is the one kept
+    """
+    enabled: bool = False
+    triage_model: str = "gpt-4o-mini"
+    escalation_model: str = "gpt-4-turbo"
+    band_low: float = 40
+    band_high: float = 70
+
+    def in_band(self, score: float) -> bool:
+        return self.band_low <= score <= self.band_high
+
+    def validate(self):
+        if not 0 <= self.band_low <= self.band_high <= 100:
+            raise ValueError("band_low and band_high must satisfy 0 <= band_low <= band_high <= 100")
+        if not self.triage_model or not self.escalation_model:
+            raise ValueError("triage_model and escalation_model are required")
+
+def _coerce(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Known fields of a config override, with their types checked"""
+    known = {f.name: f.type for f in fields(CascadeConfig)}
+    unknown = set(overrides) - set(known)
+    if unknown:
+        raise ValueError(f"Unknown cascade settings: {sorted(unknown)}")
+
+    coerced = {}
+    for name, value in overrides.items():
+        if name == "enabled":
+            if not isinstance(value, bool):
+                raise ValueError("enabled must be a boolean")
+            coerced[name] = value
+        elif name in ("band_low", "band_high"):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{name} must be a number")
+            coerced[name] = float(value)
+        else:
+            if not isinstance(value, str):
+                raise ValueError(f"{name} must be a string")
+            coerced[name] = value.strip()
+    return coerced
+
+class CascadePolicy:
+    """
+    Cascade settings: environment defaults plus per-company overrides
+
+    Overrides hold only the fields a company changed, so a new default
+    still reaches every company that didn't pin that field. They are
+    stored in a JSON file and survive restarts
+    """
+
+    def __init__(self, default: CascadeConfig, path: str = "data/cascade_config.json"):
+        default.validate()
+        self.default = default
+        self.path = path
+        self._lock = threading.Lock()
+        self._overrides: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load cascade config {self.path}: {e}")
+            return {}
+
+        overrides = {}
+        for company_id, values in stored.items():
+            try:
+                coerced = _coerce(values)
+                replace(self.default, **coerced).validate()
+                overrides[company_id] = coerced
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.warning(f"⚠️ Ignoring cascade config of company {company_id}: {e}")
+        return overrides
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._overrides, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def for_company(self, company_id: Optional[str]) -> CascadeConfig:
+        overrides = self._overrides.get(company_id) if company_id else None
+        return replace(self.default, **overrides) if overrides else self.default
+
+    def update(self, company_id: str, overrides: Dict[str, Any]) -> CascadeConfig:
+        """Merge overrides into a company's settings; raises ValueError if invalid"""
+        coerced = _coerce(overrides)
+        with self._lock:
+            merged = {**self._overrides.get(company_id, {}), **coerced}
+            config = replace(self.default, **merged)
+            config.validate()
+            self._overrides[company_id] = merged
+            self._save()
+        return config
+
+    def reset(self, company_id: str) -> bool:
+        """Back to the defaults; False if the company had no overrides"""
+        with self._lock:
+            if self._overrides.pop(company_id, None) is None:
+                return False
+            self._save()
+        return True
+
+    def overrides(self, company_id: str) -> Dict[str, Any]:
+        return dict(self._overrides.get(company_id, {}))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"default": asdict(self.default), "companies_with_overrides": len(self._overrides)}
+
+class _TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.cached = 0
+        self.latency_s = 0.0
+        self.cost_usd = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "cached": self.cached,
+            "avg_latency_ms": round(self.latency_s / self.calls * 1000, 2) if self.calls else 0,
+            "cost_usd": round(self.cost_usd, 4)
+        }
+
+class CascadeStats:
+    """
+    Counters to tune the cascade band
+
+    Cost saved prices the tokens of every triage call that settled a CV
+    at the escalation model (what the same prompt would have cost
+    there), minus everything spent on triage. Latency saved uses the
+    average escalation latency observed so far. Triage scores are kept
+    as a histogram, and for escalated CVs the gap between both tiers'
+    scores, to see whether the band is too wide or too narrow
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {TRIAGE: _TierStats(), ESCALATION: _TierStats()}
+        self.evaluated = 0
+        self.resolved = 0
+        self.escalated = 0
+        self.triage_failures = 0
+        self._histogram = [0] * 10
+        self._score_gap_sum = 0.0
+        self._score_gaps = 0
+        self._counterfactual_cost = 0.0
+
+    def record_call(self, tier: str, model: str, latency: float, usage: Optional[Dict[str, int]]):
+        """One answer from a tier; usage None means it came from the LLM cache"""
+        with self._lock:
+            stats = self._tiers[tier]
+            if not usage:
+                stats.cached += 1
+                return
+            stats.calls += 1
+            stats.latency_s += latency
+            stats.cost_usd += model_cost(model, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+    def record_decision(self, config: CascadeConfig, triage_score: Optional[float],
+                        triage_usage: Optional[Dict[str, int]] = None,
+                        escalated: bool = False, final_score: Optional[float] = None):
+        """
+        Outcome of one CV; triage_usage (tokens of its triage answer) prices
+        what escalating it would have cost
+        """
+        with self._lock:
+            self.evaluated += 1
+            if triage_score is None:
+                self.triage_failures += 1
+            else:
+                self._histogram[min(int(triage_score // 10), 9)] += 1
+            if not escalated:
+                self.resolved += 1
+                if triage_usage:
+                    self._counterfactual_cost += model_cost(
+                        config.escalation_model,
+                        triage_usage.get("input_tokens", 0), triage_usage.get("output_tokens", 0)
+                    )
+                return
+            self.escalated += 1
+            if triage_score is not None and final_score is not None:
+                self._score_gap_sum += abs(final_score - triage_score)
+                self._score_gaps += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            triage, escalation = self._tiers[TRIAGE], self._tiers[ESCALATION]
+            avg_escalation_latency = escalation.latency_s / escalation.calls if escalation.calls else None
+            latency_saved = (
+                self.resolved * avg_escalation_latency - triage.latency_s
+                if avg_escalation_latency is not None else None
+            )
+            return {
+                "evaluated": self.evaluated,
+                "resolved_by_triage": self.resolved,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.evaluated, 4) if self.evaluated else 0,
+                "triage_failures": self.triage_failures,
+                "triage_score_histogram": {
+                    f"{i * 10}-{i * 10 + 9 if i < 9 else 100}": n for i, n in enumerate(self._histogram)
+                },
+                "avg_escalation_score_gap": round(self._score_gap_sum / self._score_gaps, 2) if self._score_gaps else None,
+                "tiers": {TRIAGE: triage.snapshot(), ESCALATION: escalation.snapshot()},
+                "cost_saved_usd": round(self._counterfactual_cost - triage.cost_usd, 4),
+                "latency_saved_ms": round(latency_saved * 1000, 2) if latency_saved is not None else None
+            }
+
+cascade_stats = CascadeStats()
+
+_cascade_policy: Optional[CascadePolicy] = None
+_cascade_policy_lock = threading.Lock()
+
+def get_cascade_policy() -> CascadePolicy:
+    """Process-wide policy, defaults from the environment on first use"""
+    global _cascade_policy
+
+    if _cascade_policy is None:
+        with _cascade_policy_lock:
+            if _cascade_policy is None:
+                _cascade_policy = CascadePolicy(
+                    CascadeConfig(
+                        enabled=os.getenv("CV_CASCADE_ENABLED", "false").lower() == "true",
+                        triage_model=os.getenv("CV_CASCADE_TRIAGE_MODEL", "gpt-4o-mini"),
+                        escalation_model=os.getenv("CV_CASCADE_ESCALATION_MODEL", "gpt-4-turbo"),
+                        band_low=float(os.getenv("CV_CASCADE_BAND_LOW", "40")),
+                        band_high=float(os.getenv("CV_CASCADE_BAND_HIGH", "70"))
+                    ),
+                    path=os.getenv("CV_CASCADE_CONFIG_PATH", "data/cascade_config.json")
+                )
+    return _cascade_policy
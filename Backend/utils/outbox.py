@@ -0,0 +1,329 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from utils.database import call_db
+
+logger = logging.getLogger(__name__)
+
+class OutboxKind:
+    """Write types stored in the outbox, one bulk Supabase call each"""
+    EVALUATION = "evaluation"
+    CANDIDATE_UPDATE = "candidate_update"
+
+class Outbox:
+    """
+    Durable local buffer of pending Supabase writes backed by SQLite
+
+    Writes are appended in one transaction per evaluation and stay here
+    until the flusher confirms Supabase accepted them, so they survive
+    restarts and outages. A failed delivery the flusher blames on the
+    write itself counts an attempt; after max_attempts the write is
+    parked, out of the flushes until requeued, so it can't block the rest
+    """
+
+    def __init__(self, path: str = "data/outbox.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                parked INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_parked_id ON outbox (parked, id)")
+
+    def add(self, writes: Sequence[Tuple[str, Dict[str, Any]]]) -> int:
+        """Append (kind, payload) writes in one transaction"""
+        now = time.time()
+        rows = [(kind, json.dumps(payload, default=str), now) for kind, payload in writes]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO outbox (kind, payload, created_at) VALUES (?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def pending(self, limit: int) -> List[Dict[str, Any]]:
+        """Oldest writes not yet delivered (parked ones excluded)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload, attempts FROM outbox WHERE parked = 0 ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload"]), "attempts": row["attempts"]}
+            for row in rows
+        ]
+
+    def remove(self, ids: Sequence[int]):
+        """Drop delivered writes"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def record_failure(self, ids: Sequence[int], error: str, max_attempts: int) -> int:
+        """Count a failed delivery; returns how many writes got parked"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                    [(error, i) for i in ids]
+                )
+                parked = self._conn.execute(
+                    f"UPDATE outbox SET parked = 1 WHERE attempts >= ? AND id IN ({','.join('?' * len(ids))})",
+                    (max_attempts, *ids)
+                ).rowcount if ids else 0
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return parked
+
+    def requeue_parked(self) -> int:
+        """Give parked writes another round of attempts"""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE outbox SET parked = 0, attempts = 0 WHERE parked = 1")
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Outbox depth per kind and age of the oldest pending write"""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT kind, COUNT(*) FROM outbox WHERE parked = 0 GROUP BY kind"
+            ).fetchall())
+            parked = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE parked = 1").fetchone()[0]
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE parked = 0"
+            ).fetchone()[0]
+
+        return {
+            "pending": sum(counts.values()),
+            "pending_by_kind": counts,
+            "parked": parked,
+            "oldest_pending_age_s": round(time.time() - oldest, 3) if oldest else 0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class OutboxFlusher:
+    """
+    Background task draining an Outbox into Supabase with bulk calls
+
+    sinks maps each kind to a client method taking a list of payloads,
+    returning None on failure (blocking or async, see call_db). A flush
+    runs every flush_interval seconds, or as soon as batch_size writes
+    were added since the last one. When a bulk call fails its writes are
+    retried one by one so a single bad write can't hold back the batch.
+    Failed writes are only charged an attempt (and parked after
+    max_attempts) when something else in their batch went through, which
+    shows Supabase is reachable and the write itself is bad. When nothing
+    goes through (Supabase down) nothing is charged and flushing backs
+    off exponentially up to max_backoff seconds. on_delivered(kind,
+    payloads) is called once writes are confirmed and removed
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        sinks: Dict[str, Callable[[List[Dict[str, Any]]], Any]],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_attempts: int = 5,
+        max_backoff: float = 60.0,
+        on_delivered: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None
+    ):
+        self.outbox = outbox
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.on_delivered = on_delivered
+
+        self._full = asyncio.Event()
+        self._added = 0
+        self._delay = flush_interval
+        self._flush_lock = asyncio.Lock()
+        # Writes that failed in a batch where nothing went through: tried
+        # last next time, so they can't keep hiding the good ones behind them
+        self._suspects: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {
+            "flushes": 0, "writes_flushed": 0, "bulk_failures": 0,
+            "write_failures": 0, "parked": 0
+        }
+        self._flush_ms = {"last": 0.0, "total": 0.0, "max": 0.0}
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="outbox-flusher")
+
+    async def stop(self, timeout: float = 5.0):
+        """Stop the loop and try one last flush; whatever is left stays on disk"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ Final outbox flush incomplete: {e}")
+
+    def notify(self, added: int = 1):
+        """Count writes added; wakes the flusher once a full batch is waiting"""
+        self._added += added
+        if self._added >= self.batch_size:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            backing_off = self._delay > self.flush_interval
+            try:
+                if backing_off:
+                    await asyncio.sleep(self._delay)
+                else:
+                    await asyncio.wait_for(self._full.wait(), timeout=self._delay)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Outbox flush error: {e}")
+
+    async def flush(self) -> int:
+        """Deliver pending writes batch by batch; returns how many went through"""
+        delivered_total = 0
+        async with self._flush_lock:
+            self._full.clear()
+            self._added = 0
+            while True:
+                rows = await asyncio.to_thread(self.outbox.pending, self.batch_size)
+                if not rows:
+                    self._delay = self.flush_interval
+                    break
+
+                start = time.perf_counter()
+                by_kind: Dict[str, List[Dict[str, Any]]] = {}
+                for row in rows:
+                    by_kind.setdefault(row["kind"], []).append(row)
+
+                delivered = 0
+                failed: Dict[str, List[Dict[str, Any]]] = {}
+                for kind, kind_rows in by_kind.items():
+                    kind_delivered, failed[kind] = await self._deliver(kind, kind_rows)
+                    delivered += kind_delivered
+                self._record_flush(time.perf_counter() - start, delivered)
+                delivered_total += delivered
+
+                if not delivered:
+                    # Likely an outage: back off without charging anything
+                    self._suspects.update(row["id"] for kind_rows in failed.values() for row in kind_rows)
+                    self._delay = min(max(self._delay * 2, self.flush_interval), self.max_backoff)
+                    logger.warning(f"⚠️ Outbox flush failed, retrying in {self._delay:.1f}s")
+                    break
+                for kind, kind_rows in failed.items():
+                    await self._failed(kind_rows, f"{kind} write rejected")
+                self._delay = self.flush_interval
+                if len(rows) < self.batch_size:
+                    break
+        return delivered_total
+
+    async def _deliver(self, kind: str, rows: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """(writes delivered, writes that failed), failures are charged by flush()"""
+        sink = self.sinks.get(kind)
+        if sink is None:
+            # Not an outage, the write can never go through
+            await self._failed(rows, f"no sink for {kind}")
+            return 0, []
+
+        if await call_db(sink, [row["payload"] for row in rows]) is not None:
+            await asyncio.to_thread(self.outbox.remove, [row["id"] for row in rows])
+            self._suspects.difference_update(row["id"] for row in rows)
+            self._delivered(kind, rows)
+            return len(rows), []
+
+        self._counters["bulk_failures"] += 1
+        if len(rows) == 1:
+            return 0, rows
+
+        # Isolate the bad writes, new ones first and known bad ones last.
+        # Stop after 3 failures while nothing went through (likely an outage)
+        rows = sorted(rows, key=lambda row: (row["id"] in self._suspects, row["attempts"] > 0, row["id"]))
+        delivered, failed = [], []
+        for row in rows:
+            if not delivered and len(failed) >= 3:
+                break
+            if await call_db(sink, [row["payload"]]) is not None:
+                delivered.append(row)
+            else:
+                failed.append(row)
+
+        if delivered:
+            await asyncio.to_thread(self.outbox.remove, [row["id"] for row in delivered])
+            self._suspects.difference_update(row["id"] for row in delivered)
+            self._delivered(kind, delivered)
+        return len(delivered), failed
+
+    def _delivered(self, kind: str, rows: List[Dict[str, Any]]):
+        if self.on_delivered is None:
+            return
+        try:
+            self.on_delivered(kind, [row["payload"] for row in rows])
+        except Exception as e:
+            logger.error(f"Outbox on_delivered callback error: {e}")
+
+    async def _failed(self, rows: List[Dict[str, Any]], error: str):
+        if not rows:
+            return
+        self._counters["write_failures"] += len(rows)
+        self._suspects.difference_update(row["id"] for row in rows)
+        parked = await asyncio.to_thread(
+            self.outbox.record_failure, [row["id"] for row in rows], error, self.max_attempts
+        )
+        if parked:
+            self._counters["parked"] += parked
+            logger.error(f"❌ Parked {parked} outbox writes after {self.max_attempts} attempts ({error})")
+
+    def _record_flush(self, seconds: float, delivered: int):
+        ms = seconds * 1000
+        self._counters["flushes"] += 1
+        self._counters["writes_flushed"] += delivered
+        self._flush_ms["last"] = ms
+        self._flush_ms["total"] += ms
+        self._flush_ms["max"] = max(self._flush_ms["max"], ms)
+
+    def stats(self) -> Dict[str, Any]:
+        flushes = self._counters["flushes"]
+        return {
+            **self._counters,
+            "last_flush_ms": round(self._flush_ms["last"], 2),
+            "avg_flush_ms": round(self._flush_ms["total"] / flushes, 2) if flushes else 0,
+            "max_flush_ms": round(self._flush_ms["max"], 2),
+            "retry_delay_s": self._delay
+        }
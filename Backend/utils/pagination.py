@@ -0,0 +1,60 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Columns a caller may ask for in /evaluations?fields=
+EVALUATION_FIELDS = (
+    "id", "candidate_id", "job_id", "company_id", "technical_score", "behavioral_score",
+    "overall_score", "recommendation", "interview_transcript", "evaluated_at"
+)
+
+# The keyset columns; always selected so the next cursor can be built
+KEYSET_FIELDS = ("evaluated_at", "id")
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    Column list from a fields= parameter ("id,overall_score,..."), all columns when empty
+
+    Raises ValueError on an unknown column
+    """
+    if not fields:
+        return list(EVALUATION_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in EVALUATION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return with_keyset(requested)
+
+def with_keyset(fields: Optional[List[str]]) -> List[str]:
+    """fields (all columns when None) plus the keyset columns, in table order"""
+    if not fields:
+        return list(EVALUATION_FIELDS)
+    return [f for f in EVALUATION_FIELDS if f in fields or f in KEYSET_FIELDS]
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque token pointing after row (its evaluated_at and id)"""
+    payload = json.dumps([str(row["evaluated_at"]), str(row["id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(evaluated_at, id) from a token made by encode_cursor; ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        evaluated_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(evaluated_at, str) or not isinstance(row_id, str):
+            raise ValueError
+        return evaluated_at, row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def page_response(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """
+    Page out of limit + 1 fetched rows: the extra row only tells
+    whether there is a next page
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "evaluations": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more and rows else None
+    }
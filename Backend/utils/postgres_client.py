@@ -0,0 +1,325 @@
+import json
+import logging
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from utils.company_stats import StatsAccumulator
+from utils.pagination import decode_cursor, page_response, with_keyset
+
+logger = logging.getLogger(__name__)
+
+# Columns the backend may write; names are interpolated into SQL, values never are
+CANDIDATE_COLUMNS = (
+    "id", "company_id", "job_id", "name", "email", "cv_text", "cv_url", "overall_score", "status"
+)
+EVALUATION_COLUMNS = (
+    "id", "candidate_id", "job_id", "company_id", "technical_score", "behavioral_score",
+    "overall_score", "recommendation", "interview_transcript", "evaluated_at"
+)
+
+def _columns(data: Dict[str, Any], allowed: tuple) -> List[str]:
+    unknown = set(data) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    return [column for column in allowed if column in data]
+
+def _value(value: Any) -> Any:
+    """Python value for asyncpg: ISO strings (as sent to Supabase) become datetimes"""
+    if isinstance(value, str) and len(value) >= 19 and value[4] == "-" and value[10] == "T":
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    return value
+
+def _row(record: Optional[asyncpg.Record]) -> Optional[Dict[str, Any]]:
+    """Record as the dict supabase-py would return (uuids and timestamps as strings)"""
+    if record is None:
+        return None
+    row = {}
+    for key, value in record.items():
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        row[key] = value
+    return row
+
+def _evaluation_record(evaluation: Dict[str, Any], columns: List[str]) -> tuple:
+    """COPY row; COPY writes NULL for missing values, so id and evaluated_at get defaults here"""
+    defaults = {"id": lambda: str(uuid.uuid4()), "evaluated_at": lambda: datetime.now(timezone.utc)}
+    return tuple(
+        _value(evaluation[c]) if evaluation.get(c) is not None
+        else (defaults[c]() if c in defaults else None)
+        for c in columns
+    )
+
+async def _init_connection(conn: asyncpg.Connection):
+    # json/jsonb in and out as Python objects, like the REST client. Binary
+    # format so COPY can use them too (jsonb binary = version byte + text)
+    await conn.set_type_codec(
+        "json", schema="pg_catalog", format="binary",
+        encoder=lambda value: json.dumps(value).encode(), decoder=json.loads
+    )
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog", format="binary",
+        encoder=lambda value: b"\x01" + json.dumps(value).encode(), decoder=lambda data: json.loads(data[1:])
+    )
+
+class AsyncPostgresClient:
+    """
+    Async client for the backend tables, straight to Postgres over asyncpg
+
+    Same methods as SupabaseClient, as coroutines, so the event loop is
+    never blocked. Queries run on a bounded connection pool; asyncpg
+    prepares each statement once per connection and reuses it
+    (statement_cache_size, set it to 0 behind a transaction-mode
+    pgbouncer). Bulk writes use COPY and executemany. Errors are logged
+    and returned as None, like SupabaseClient
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        statement_cache_size: int = 100,
+        command_timeout: float = 30
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self.pool: Optional[asyncpg.Pool] = None
+
+    async def connect(self):
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+            command_timeout=self.command_timeout,
+            init=_init_connection
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    # ============== CANDIDATES ==============
+
+    async def create_candidate(self, data: Dict[str, Any]):
+        """Create a candidate"""
+        try:
+            columns = _columns(data, CANDIDATE_COLUMNS)
+            placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+            record = await self.pool.fetchrow(
+                f"INSERT INTO candidates ({', '.join(columns)}) VALUES ({placeholders}) RETURNING *",
+                *(_value(data[c]) for c in columns)
+            )
+            return _row(record)
+        except Exception as e:
+            logger.error(f"Error creating candidate: {e}")
+            return None
+
+    async def get_candidate(self, candidate_id: str):
+        """Get candidate by ID"""
+        try:
+            return _row(await self.pool.fetchrow("SELECT * FROM candidates WHERE id = $1", candidate_id))
+        except Exception as e:
+            logger.error(f"Error getting candidate: {e}")
+            return None
+
+    async def update_candidate(self, candidate_id: str, data: Dict[str, Any]):
+        """Update candidate"""
+        try:
+            columns = [c for c in _columns(data, CANDIDATE_COLUMNS) if c != "id"]
+            if not columns:
+                # Nothing to write besides the id (an empty SET is a syntax error)
+                return {}
+            assignments = ", ".join(f"{c} = ${i}" for i, c in enumerate(columns, start=2))
+            record = await self.pool.fetchrow(
+                f"UPDATE candidates SET {assignments} WHERE id = $1 RETURNING *",
+                candidate_id, *(_value(data[c]) for c in columns)
+            )
+            return _row(record) or {}
+        except Exception as e:
+            logger.error(f"Error updating candidate: {e}")
+            return None
+
+    async def update_candidates(self, updates: List[Dict[str, Any]]):
+        """
+        Update several candidates in one round-trip per column set
+
+        Each update carries the candidate id; updates of the same
+        candidate are merged, later values win
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for update in updates:
+            merged.setdefault(update["id"], {}).update(update)
+
+        try:
+            by_columns: Dict[tuple, List[Dict[str, Any]]] = {}
+            for data in merged.values():
+                columns = tuple(c for c in _columns(data, CANDIDATE_COLUMNS) if c != "id")
+                if columns:
+                    by_columns.setdefault(columns, []).append(data)
+            if not by_columns:
+                return len(merged)
+
+            async with self.pool.acquire() as conn, conn.transaction():
+                for columns, rows in by_columns.items():
+                    assignments = ", ".join(f"{c} = ${i}" for i, c in enumerate(columns, start=2))
+                    await conn.executemany(
+                        f"UPDATE candidates SET {assignments} WHERE id = $1",
+                        [(row["id"], *(_value(row[c]) for c in columns)) for row in rows]
+                    )
+            return len(merged)
+        except Exception as e:
+            logger.error(f"Error updating candidates: {e}")
+            return None
+
+    # ============== EVALUATIONS ==============
+
+    async def create_evaluation(self, evaluation_data: Dict[str, Any]):
+        """Create evaluation"""
+        try:
+            columns = _columns(evaluation_data, EVALUATION_COLUMNS)
+            placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+            record = await self.pool.fetchrow(
+                f"INSERT INTO evaluations ({', '.join(columns)}) VALUES ({placeholders}) "
+                f"ON CONFLICT (id) DO NOTHING RETURNING *",
+                *(_value(evaluation_data[c]) for c in columns)
+            )
+            return _row(record) or {}
+        except Exception as e:
+            logger.error(f"Error creating evaluation: {e}")
+            return None
+
+    async def create_evaluations(self, evaluations: List[Dict[str, Any]]):
+        """
+        Create several evaluations with one COPY
+
+        Rows are copied into a temporary table and moved over with
+        ON CONFLICT DO NOTHING, so retrying a batch does not insert it twice
+        """
+        try:
+            columns = [c for c in EVALUATION_COLUMNS if any(c in e for e in evaluations)]
+            records = [_evaluation_record(e, columns) for e in evaluations]
+            column_list = ", ".join(columns)
+            async with self.pool.acquire() as conn, conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE evaluations_incoming (LIKE evaluations INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table("evaluations_incoming", records=records, columns=columns)
+                status = await conn.execute(
+                    f"INSERT INTO evaluations ({column_list}) SELECT {column_list} FROM evaluations_incoming "
+                    f"ON CONFLICT (id) DO NOTHING"
+                )
+            return int(status.split()[-1])
+        except Exception as e:
+            logger.error(f"Error creating evaluations: {e}")
+            return None
+
+    async def get_evaluation(self, evaluation_id: str):
+        """Get evaluation by ID"""
+        try:
+            return _row(await self.pool.fetchrow("SELECT * FROM evaluations WHERE id = $1", evaluation_id))
+        except Exception as e:
+            logger.error(f"Error getting evaluation: {e}")
+            return None
+
+    async def get_evaluations_by_company(self, company_id: str, limit: int = 100):
+        """Get all evaluations for a company"""
+        try:
+            records = await self.pool.fetch(
+                "SELECT * FROM evaluations WHERE company_id = $1 ORDER BY evaluated_at DESC LIMIT $2",
+                company_id, limit
+            )
+            return [_row(r) for r in records]
+        except Exception as e:
+            logger.error(f"Error getting evaluations: {e}")
+            return []
+
+    async def get_evaluations_page(self, company_id: str, limit: int = 100, cursor: Optional[str] = None,
+                                   fields: Optional[List[str]] = None):
+        """One page of a company's evaluations, newest first (see SupabaseClient.get_evaluations_page)"""
+        try:
+            columns = _columns(dict.fromkeys(with_keyset(fields)), EVALUATION_COLUMNS)
+            select = f"SELECT {', '.join(columns)} FROM evaluations WHERE company_id = $1"
+            order = "ORDER BY evaluated_at DESC, id DESC"
+
+            if cursor:
+                evaluated_at, row_id = decode_cursor(cursor)
+                records = await self.pool.fetch(
+                    f"{select} AND (evaluated_at, id) < ($2, $3::uuid) {order} LIMIT $4",
+                    company_id, _value(evaluated_at), row_id, limit + 1
+                )
+            else:
+                records = await self.pool.fetch(f"{select} {order} LIMIT $2", company_id, limit + 1)
+            return page_response([_row(r) for r in records], limit)
+        except Exception as e:
+            logger.error(f"Error getting evaluations page: {e}")
+            return None
+
+    # ============== JOBS ==============
+
+    async def get_job(self, job_id: str):
+        """Get job by ID"""
+        try:
+            return _row(await self.pool.fetchrow("SELECT * FROM jobs WHERE id = $1", job_id))
+        except Exception as e:
+            logger.error(f"Error getting job: {e}")
+            return None
+
+    # ============== STATS ==============
+
+    async def get_stats(self, company_id: str):
+        """Get company statistics (company_stats function, see SupabaseClient.get_stats)"""
+        stats = await self.get_stats_accumulator(company_id)
+        return stats.to_response() if stats is not None else {}
+
+    async def get_stats_accumulator(self, company_id: str, days: int = 30) -> Optional[StatsAccumulator]:
+        """
+        Company stats as a StatsAccumulator (loader of CompanyStatsCache), None on error
+
+        company_stats() reads the trigger-maintained rollups; without it
+        every evaluation of the company is streamed, linear in their number
+        """
+        try:
+            data = await self.pool.fetchval("SELECT company_stats($1::uuid, $2)", company_id, days)
+            return StatsAccumulator.from_aggregate(data or {})
+        except asyncpg.UndefinedFunctionError as e:
+            logger.warning(f"company_stats function missing, aggregating locally: {e}")
+        except Exception as e:
+            logger.error(f"Error getting stats: {e}")
+            return None
+
+        try:
+            stats = StatsAccumulator()
+            async with self.pool.acquire() as conn, conn.transaction():
+                async for record in conn.cursor(
+                    "SELECT overall_score, recommendation, evaluated_at FROM evaluations WHERE company_id = $1",
+                    company_id
+                ):
+                    stats.add(record["overall_score"], record["recommendation"], record["evaluated_at"])
+            return stats
+        except Exception as e:
+            logger.error(f"Error getting stats: {e}")
+            return None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        if self.pool is None:
+            return {"connected": False}
+        return {
+            "connected": True,
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size()
+        }
@@ -0,0 +1,337 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque, OrderedDict
+from typing import Awaitable, Callable, Deque, Dict, Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Served until the first LLM refill lands, and whenever generation fails
+DEFAULT_BEHAVIORAL_QUESTIONS = [
+    "Tell me about a challenge you overcame",
+    "Describe a conflict with a teammate and how you resolved it",
+    "Tell me about a time you had to learn something new under a tight deadline",
+    "Describe a situation where you disagreed with your manager. What did you do?",
+    "Tell me about a mistake you made at work and what you learned from it",
+    "Describe a time you had to adapt to a major change in priorities",
+    "Tell me about a time you received difficult feedback. How did you respond?",
+    "Describe a project where you had to coordinate with people from other teams",
+    "Tell me about a time you took the initiative without being asked",
+    "Describe a situation where you had to explain something complex to a non-expert",
+    "Tell me about a time you had to balance several urgent tasks",
+    "Describe a moment when you helped a colleague who was struggling",
+]
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+class BehavioralQuestionPool:
+    """
+    Locally stored pool of behavioral questions
+
+    Questions are dealt from a shuffled deck, so every question is served
+    once before any repeats. When fewer than low_watermark unserved
+    questions remain, a background task asks the generator for more,
+    until max_size; past that the deck is simply reshuffled. A refill
+    that fails or adds nothing is not retried for retry_after_seconds
+    """
+
+    def __init__(
+        self,
+        path: str = "data/behavioral_questions.json",
+        generator: Optional[Callable[[int, List[str]], Awaitable[List[str]]]] = None,
+        low_watermark: int = 5,
+        refill_size: int = 10,
+        max_size: int = 200,
+        retry_after_seconds: float = 60
+    ):
+        self.path = path
+        self.generator = generator
+        self.low_watermark = low_watermark
+        self.refill_size = refill_size
+        self.max_size = max_size
+        self.retry_after_seconds = retry_after_seconds
+
+        self._lock = threading.Lock()
+        self._questions: List[str] = self._load()
+        self._known = {_normalize_question(q) for q in self._questions}
+        self._deck: Deque[int] = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._next_refill_at = 0.0
+        self._counters = {"served": 0, "refills": 0, "refill_failures": 0, "reshuffles": 0}
+        self._reshuffle()
+
+    def _load(self) -> List[str]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                questions = [q for q in json.load(f) if isinstance(q, str) and q.strip()]
+            if questions:
+                return questions
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load question pool {self.path}: {e}")
+        return list(DEFAULT_BEHAVIORAL_QUESTIONS)
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._questions, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _reshuffle(self):
+        order = list(range(len(self._questions)))
+        random.shuffle(order)
+        self._deck = deque(order)
+        self._counters["reshuffles"] += 1
+
+    def draw(self, count: int = 1, exclude: Iterable[str] = ()) -> List[str]:
+        """Next unserved questions, never one already asked to this candidate"""
+        excluded = {_normalize_question(q) for q in exclude}
+        drawn: List[str] = []
+
+        with self._lock:
+            attempts = len(self._questions) * 2
+            while len(drawn) < count and attempts > 0:
+                attempts -= 1
+                if not self._deck:
+                    self._reshuffle()
+                question = self._questions[self._deck.popleft()]
+                key = _normalize_question(question)
+                if key in excluded:
+                    continue
+                excluded.add(key)
+                drawn.append(question)
+            self._counters["served"] += len(drawn)
+
+        self.maybe_refill()
+        return drawn
+
+    def add(self, questions: Iterable[str]) -> int:
+        """Add new distinct questions to the pool and the current deck"""
+        added = 0
+        with self._lock:
+            for question in questions:
+                question = question.strip() if isinstance(question, str) else ""
+                key = _normalize_question(question)
+                if not key or key in self._known or len(self._questions) >= self.max_size:
+                    continue
+                self._known.add(key)
+                self._questions.append(question)
+                # New questions go to a random spot in the remaining deck
+                self._deck.insert(random.randint(0, len(self._deck)), len(self._questions) - 1)
+                added += 1
+            if added:
+                self._save()
+        return added
+
+    def maybe_refill(self):
+        """Start a background refill when the deck runs low (needs a running loop)"""
+        if self.generator is None:
+            return
+        with self._lock:
+            low = len(self._deck) < self.low_watermark and len(self._questions) < self.max_size
+        if not low or (self._refill_task and not self._refill_task.done()):
+            return
+        # Back off after a refill that failed or brought nothing new
+        if time.monotonic() < self._next_refill_at:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refill_task = loop.create_task(self._refill())
+
+    async def _refill(self):
+        try:
+            with self._lock:
+                existing = list(self._questions)
+            generated = await self.generator(self.refill_size, existing)
+            added = await asyncio.to_thread(self.add, generated)
+            with self._lock:
+                self._counters["refills"] += 1
+                if not added:
+                    self._next_refill_at = time.monotonic() + self.retry_after_seconds
+            logger.info(f"🧠 Behavioral question pool refilled: +{added} ({len(self._questions)} total)")
+        except Exception as e:
+            with self._lock:
+                self._counters["refill_failures"] += 1
+                self._next_refill_at = time.monotonic() + self.retry_after_seconds
+            logger.warning(f"⚠️ Behavioral question refill failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._questions),
+                "unserved_in_cycle": len(self._deck),
+                "refilling": bool(self._refill_task and not self._refill_task.done()),
+                **self._counters
+            }
+
+def difficulty_band(cv_score: Optional[float]) -> str:
+    """Question difficulty for a candidate, from the CV score"""
+    score = cv_score or 0
+    if score >= 80:
+        return "senior"
+    if score >= 60:
+        return "mid"
+    return "junior"
+
+DIFFICULTY_BANDS = ("junior", "mid", "senior")
+
+class _BankEntry:
+    __slots__ = ("questions", "requirements", "created_at", "cursor")
+
+    def __init__(self, questions: List[str], requirements: tuple):
+        self.questions = questions
+        self.requirements = requirements
+        self.created_at = time.monotonic()
+        self.cursor = 0
+
+class TechnicalQuestionBank:
+    """
+    Technical question sets per (job_id, difficulty band), held in memory
+
+    The first request for a key generates the set (concurrent requests
+    share that one call); after ttl_seconds the set is still served while
+    a background task regenerates it. Least recently used keys are
+    evicted past max_entries. A build that fails is not retried for that
+    key and requirements for retry_after_seconds: misses meanwhile get
+    no questions instead of another LLM call
+    """
+
+    def __init__(
+        self,
+        generator: Callable[[List[str], str, int], Awaitable[List[str]]],
+        questions_per_entry: int = 8,
+        ttl_seconds: float = 6 * 3600,
+        max_entries: int = 300,
+        retry_after_seconds: float = 60
+    ):
+        self.generator = generator
+        self.questions_per_entry = questions_per_entry
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.retry_after_seconds = retry_after_seconds
+
+        self._entries: "OrderedDict[tuple, _BankEntry]" = OrderedDict()
+        self._building: Dict[tuple, asyncio.Task] = {}
+        # key -> (requirements, monotonic time) of the last failed build, until then no retry
+        self._retry_at: Dict[tuple, Tuple[tuple, float]] = {}
+        self._counters = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "builds": 0, "build_failures": 0,
+            "builds_skipped": 0, "evictions": 0
+        }
+
+    def _entry(self, key: tuple, requirements: tuple) -> Optional[_BankEntry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.requirements != requirements:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _serve(self, entry: _BankEntry, count: int, exclude: Iterable[str]) -> List[str]:
+        """Rotate through the set so consecutive candidates get different questions"""
+        excluded = {_normalize_question(q) for q in exclude}
+        served: List[str] = []
+        for _ in range(len(entry.questions)):
+            if len(served) >= count:
+                break
+            question = entry.questions[entry.cursor % len(entry.questions)]
+            entry.cursor += 1
+            if _normalize_question(question) not in excluded:
+                served.append(question)
+        return served
+
+    def peek(self, job_id: str, band: str, requirements: List[str], count: int = 1,
+             exclude: Iterable[str] = ()) -> List[str]:
+        """Questions already in memory (fresh or stale), without generating"""
+        entry = self._entry((job_id, band), tuple(requirements))
+        return self._serve(entry, count, exclude) if entry else []
+
+    async def get_questions(self, job_id: str, band: str, requirements: List[str], count: int = 1,
+                            exclude: Iterable[str] = ()) -> List[str]:
+        key = (job_id, band)
+        requirements = tuple(requirements)
+        entry = self._entry(key, requirements)
+
+        if entry is not None:
+            if time.monotonic() - entry.created_at >= self.ttl_seconds:
+                self._counters["stale_hits"] += 1
+                self._schedule_build(key, requirements)
+            else:
+                self._counters["hits"] += 1
+            return self._serve(entry, count, exclude)
+
+        self._counters["misses"] += 1
+        task = self._schedule_build(key, requirements)
+        if task is None:
+            return []
+        # Shielded: a cancelled request must not cancel the build other requests wait on
+        await asyncio.shield(task)
+        entry = self._entry(key, requirements)
+        return self._serve(entry, count, exclude) if entry else []
+
+    def warm(self, job_id: str, requirements: List[str], bands: Iterable[str] = DIFFICULTY_BANDS):
+        """Generate the sets for a job in the background"""
+        for band in bands:
+            key = (job_id, band)
+            if self._entry(key, tuple(requirements)) is None:
+                self._schedule_build(key, tuple(requirements))
+
+    def _schedule_build(self, key: tuple, requirements: tuple) -> Optional[asyncio.Task]:
+        """Running or new build for key, None while a failed build is backing off"""
+        task = self._building.get(key)
+        if task is None or task.done():
+            failed = self._retry_at.get(key)
+            if failed is not None and failed[0] == requirements and time.monotonic() < failed[1]:
+                self._counters["builds_skipped"] += 1
+                return None
+            task = asyncio.get_running_loop().create_task(self._build(key, requirements))
+            self._building[key] = task
+        return task
+
+    async def _build(self, key: tuple, requirements: tuple):
+        job_id, band = key
+        try:
+            questions = await self.generator(list(requirements), band, self.questions_per_entry)
+            questions = [q.strip() for q in questions if isinstance(q, str) and q.strip()]
+            if not questions:
+                raise ValueError("generator returned no questions")
+
+            self._entries[key] = _BankEntry(questions, requirements)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+            self._retry_at.pop(key, None)
+            self._counters["builds"] += 1
+            logger.info(f"🧠 Technical question bank built for job {job_id} ({band}): {len(questions)} questions")
+        except Exception as e:
+            self._counters["build_failures"] += 1
+            now = time.monotonic()
+            if len(self._retry_at) >= self.max_entries:
+                self._retry_at = {k: v for k, v in self._retry_at.items() if v[1] > now}
+            self._retry_at[key] = (requirements, now + self.retry_after_seconds)
+            logger.warning(
+                f"⚠️ Technical question bank build failed for job {job_id} ({band}), "
+                f"retrying after {self.retry_after_seconds:.0f}s: {e}"
+            )
+        finally:
+            self._building.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["hits"] + self._counters["stale_hits"] + self._counters["misses"]
+        return {
+            "entries": len(self._entries),
+            "building": len(self._building),
+            "hit_ratio": round((lookups - self._counters["misses"]) / lookups, 4) if lookups else 0,
+            **self._counters
+        }
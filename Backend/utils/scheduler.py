@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from collections import deque, defaultdict
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class FairScheduler:
+    """
+    Global concurrency limit for agent runs, fair across companies
+
+    Waiters are queued per company and slots are granted round-robin
+    between companies, so a 200-CV batch from one company only gets one
+    slot per turn while other companies' requests keep flowing
+    """
+
+    def __init__(self, max_concurrency: int = 10):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._rotation: Deque[str] = deque()
+        self._in_flight: Dict[str, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def slot(self, company_id: str):
+        """Hold one execution slot for company_id while the block runs"""
+        await self._acquire(company_id)
+        try:
+            yield
+        finally:
+            self._release(company_id)
+
+    async def _acquire(self, company_id: str):
+        # Fast path: free capacity and nobody queued ahead of us
+        if self._active < self.max_concurrency and not self._rotation:
+            self._grant(company_id)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._waiters.get(company_id)
+        if queue is None:
+            queue = deque()
+            self._waiters[company_id] = queue
+            self._rotation.append(company_id)
+        queue.append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted right before the cancellation
+                self._release(company_id)
+            else:
+                self._discard(company_id, future)
+            raise
+
+    def _grant(self, company_id: str):
+        self._active += 1
+        self._in_flight[company_id] += 1
+
+    def _release(self, company_id: str):
+        self._active -= 1
+        self._in_flight[company_id] -= 1
+        if self._in_flight[company_id] <= 0:
+            del self._in_flight[company_id]
+        self._wake_next()
+
+    def _discard(self, company_id: str, future: asyncio.Future):
+        queue = self._waiters.get(company_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._waiters[company_id]
+            self._rotation.remove(company_id)
+
+    def _wake_next(self):
+        while self._active < self.max_concurrency and self._rotation:
+            company_id = self._rotation.popleft()
+            queue = self._waiters[company_id]
+            future = queue.popleft()
+
+            # Company goes to the back of the line if it still has waiters
+            if queue:
+                self._rotation.append(company_id)
+            else:
+                del self._waiters[company_id]
+
+            if future.done():
+                continue
+
+            self._grant(company_id)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of scheduler occupancy"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": sum(len(q) for q in self._waiters.values()),
+            "queued_by_company": {c: len(q) for c, q in self._waiters.items()},
+            "in_flight_by_company": dict(self._in_flight)
+        }
@@ -0,0 +1,280 @@
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Canonical skill -> aliases seen in CVs. Matching is symmetric: a
+# requirement written as any alias matches a CV using any other one
+SKILL_SYNONYMS: Dict[str, List[str]] = {
+    "javascript": ["js", "ecmascript", "es6"],
+    "typescript": ["ts"],
+    "python": ["python3", "py"],
+    "node.js": ["node", "nodejs", "node js"],
+    "react": ["reactjs", "react.js", "react js"],
+    "vue": ["vuejs", "vue.js"],
+    "angular": ["angularjs", "angular.js"],
+    "postgresql": ["postgres", "psql", "postgre"],
+    "mysql": ["my sql"],
+    "mongodb": ["mongo"],
+    "kubernetes": ["k8s"],
+    "amazon web services": ["aws"],
+    "google cloud": ["gcp", "google cloud platform"],
+    "microsoft azure": ["azure"],
+    "machine learning": ["ml", "aprendizaje automatico"],
+    "artificial intelligence": ["ai", "ia", "inteligencia artificial"],
+    "natural language processing": ["nlp", "pln"],
+    "ci/cd": ["cicd", "continuous integration", "integracion continua"],
+    "c#": ["csharp", "c sharp"],
+    "c++": ["cpp"],
+    "go": ["golang"],
+    "sql": ["t-sql", "pl/sql", "plsql"],
+    "rest": ["restful", "rest api", "api rest"],
+    "english": ["ingles"],
+    "spanish": ["espanol", "castellano"],
+    "excel": ["microsoft excel", "ms excel"],
+    "project management": ["gestion de proyectos", "pmp"],
+    "frontend": ["front-end", "front end"],
+    "backend": ["back-end", "back end"],
+    "cloud": ["cloud computing", "nube"],
+    "nosql": ["no-sql"],
+    "devops": ["dev ops"],
+    "mobile": ["movil", "mobile development", "desarrollo movil"],
+}
+
+# Umbrella skill -> specific skills that imply it: a CV listing PostgreSQL
+# meets an "SQL" requirement, never the other way round
+SKILL_IMPLIES: Dict[str, List[str]] = {
+    "sql": ["postgresql", "mysql", "sqlite", "oracle", "sql server", "mariadb"],
+    "nosql": ["mongodb", "dynamodb", "cassandra", "redis", "elasticsearch"],
+    "cloud": ["amazon web services", "google cloud", "microsoft azure"],
+    "javascript": ["typescript", "react", "vue", "angular", "node.js", "next.js", "express"],
+    "frontend": ["react", "vue", "angular", "next.js", "html", "css", "javascript", "typescript"],
+    "backend": ["node.js", "django", "flask", "fastapi", "spring", "rails", "laravel", "express"],
+    "devops": ["docker", "kubernetes", "terraform", "ansible", "jenkins", "ci/cd"],
+    "mobile": ["android", "ios", "flutter", "react native", "swift", "kotlin"],
+    "machine learning": ["tensorflow", "pytorch", "scikit-learn"],
+}
+
+# Skills without common aliases; together with SKILL_SYNONYMS they are the
+# terms recognised inside requirement phrases ("Experiencia en Django")
+KNOWN_SKILLS = [
+    "java", "kotlin", "swift", "ruby", "php", "rust", "scala", "matlab", "bash",
+    "html", "css", "sass", "django", "flask", "fastapi", "spring", "rails", "laravel",
+    "next.js", "express", "redux", "graphql", "grpc", "redis", "elasticsearch", "kafka",
+    "rabbitmq", "sqlite", "oracle", "dynamodb", "cassandra", "docker", "terraform", "ansible",
+    "jenkins", "git", "linux", "nginx", "sql server", "mariadb", "spark", "hadoop", "airflow", "pandas", "numpy",
+    "tensorflow", "pytorch", "scikit-learn", "tableau", "power bi", "figma", "jira", "scrum",
+    "agile", "android", "ios", "flutter", "react native", "selenium", "microservices",
+]
+
+# Aliases that are also everyday words: recognised only when they are the
+# whole requirement, never inside a longer phrase ("go the extra mile")
+AMBIGUOUS_TERMS = {"go", "ts", "py", "js", "ai", "ia", "ml", "rest", "excel", "express", "spring", "agile"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./-]*")
+_COMPOUND_SPLIT_RE = re.compile(r"[/-]")
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'Inglés' and 'ingles' compare equal"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def tokenize(text: str) -> List[str]:
+    """Normalized tokens, keeping symbols used in skill names (c++, c#, node.js, ci/cd)"""
+    return [token.rstrip(".-/") for token in _TOKEN_RE.findall(normalize(text))]
+
+def _phrase(text: str) -> Tuple[str, ...]:
+    return tuple(tokenize(text))
+
+@lru_cache(maxsize=1)
+def _alias_groups() -> Dict[Tuple[str, ...], frozenset]:
+    """Every known skill phrase -> the full set of equivalent phrases"""
+    groups: Dict[Tuple[str, ...], frozenset] = {}
+    for skill in KNOWN_SKILLS:
+        phrase = _phrase(skill)
+        groups[phrase] = frozenset([phrase])
+    for canonical, aliases in SKILL_SYNONYMS.items():
+        phrases = frozenset(_phrase(p) for p in [canonical] + aliases)
+        for phrase in phrases:
+            groups[phrase] = phrases
+    return groups
+
+@lru_cache(maxsize=1)
+def _implied_by() -> Dict[frozenset, List[frozenset]]:
+    """Umbrella skill group -> groups of the specific skills implying it"""
+    groups = _alias_groups()
+    return {
+        groups[_phrase(umbrella)]: [groups[_phrase(skill)] for skill in skills]
+        for umbrella, skills in SKILL_IMPLIES.items()
+    }
+
+def extract_skills(requirement: str) -> List[frozenset]:
+    """
+    Known skills named in a requirement, each as its set of equivalent phrases
+
+    "3+ years of Python experience" -> [python group]. Compound tokens
+    ("Python/Django") are split too; an empty list means the requirement
+    names no known skill ("Trabajo en equipo")
+    """
+    groups = _alias_groups()
+    tokens = _phrase(requirement)
+    if tokens in groups:
+        return [groups[tokens]]
+
+    parts = [p for token in tokens for p in _COMPOUND_SPLIT_RE.split(token) if p]
+    max_len = max(len(phrase) for phrase in groups)
+    found: List[frozenset] = []
+    for sequence in (tokens, parts):
+        for n in range(1, max_len + 1):
+            for start in range(len(sequence) - n + 1):
+                window = tuple(sequence[start:start + n])
+                if n == 1 and window[0] in AMBIGUOUS_TERMS:
+                    continue
+                group = groups.get(window)
+                if group and group not in found:
+                    found.append(group)
+    return found
+
+@dataclass
+class SkillMatch:
+    """
+    Result of matching a CV against the job requirements
+
+    Requirements naming no known skill are unknown: they can't be
+    checked locally and don't count towards coverage
+    """
+    matched: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    unknown: List[str] = field(default_factory=list)
+
+    @property
+    def coverage(self) -> float:
+        total = len(self.matched) + len(self.missing)
+        return len(self.matched) / total if total else 1.0
+
+    @property
+    def recognized(self) -> float:
+        """Share of the requirements that name a known skill"""
+        total = len(self.matched) + len(self.missing) + len(self.unknown)
+        return (len(self.matched) + len(self.missing)) / total if total else 0.0
+
+class SkillMatcher:
+    """
+    Precompiled phrase index for one set of job requirements
+
+    The known skills named in each requirement (extract_skills) are
+    expanded to their synonyms, and umbrella skills to the specific ones
+    implying them (SKILL_IMPLIES), and stored as token tuples in a dict; a
+    requirement is met when the CV mentions any of its skills. A CV is
+    scanned once with windows up to the longest phrase, so matching is
+    O(tokens x max phrase length)
+    """
+
+    def __init__(self, requirements: List[str]):
+        self.requirements = [r for r in requirements if r and r.strip()]
+        self._index: Dict[Tuple[str, ...], List[int]] = {}
+        self._known = set()
+
+        implied_by = _implied_by()
+        for i, requirement in enumerate(self.requirements):
+            for group in extract_skills(requirement):
+                self._known.add(i)
+                for variant in group.union(*implied_by.get(group, [])):
+                    hits = self._index.setdefault(variant, [])
+                    if i not in hits:
+                        hits.append(i)
+
+        self._max_len = max((len(p) for p in self._index), default=0)
+
+    def match(self, cv_text: str) -> SkillMatch:
+        tokens = tokenize(cv_text)
+        found = set()
+        self._scan(tokens, found)
+
+        # "Python/Django" or "front-end" style lists: scan the parts as well
+        if len(found) < len(self._known):
+            parts = [p for token in tokens for p in _COMPOUND_SPLIT_RE.split(token) if p]
+            if len(parts) != len(tokens):
+                self._scan(parts, found)
+
+        return SkillMatch(
+            matched=[r for i, r in enumerate(self.requirements) if i in found],
+            missing=[r for i, r in enumerate(self.requirements) if i in self._known and i not in found],
+            unknown=[r for i, r in enumerate(self.requirements) if i not in self._known]
+        )
+
+    def _scan(self, tokens: List[str], found: set):
+        for n in range(1, self._max_len + 1):
+            for start in range(len(tokens) - n + 1):
+                hits = self._index.get(tuple(tokens[start:start + n]))
+                if hits:
+                    found.update(hits)
+            if len(found) == len(self._known):
+                return
+
+@lru_cache(maxsize=512)
+def _matcher_for(requirements: Tuple[str, ...]) -> SkillMatcher:
+    return SkillMatcher(list(requirements))
+
+def get_skill_matcher(requirements: List[str]) -> SkillMatcher:
+    """Compiled matcher, reused across candidates of the same job"""
+    return _matcher_for(tuple(requirements))
+
+class PrefilterStats:
+    """Counters for the CV pre-filter"""
+
+    # CV evaluation and scoring are both skipped for a clear reject
+    LLM_CALLS_PER_REJECT = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+        self.skipped = 0
+        self._coverage_sum = 0.0
+
+    def record(self, coverage: float, rejected: bool):
+        with self._lock:
+            self.checked += 1
+            self._coverage_sum += coverage
+            if rejected:
+                self.rejected += 1
+
+    def record_skipped(self):
+        """Too few requirements name a known skill: the CV goes to the LLM unchecked"""
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "enabled": prefilter_enabled(),
+                "min_requirements": prefilter_min_requirements(),
+                "min_recognized": prefilter_min_recognized(),
+                "checked": self.checked,
+                "skipped_unrecognized": self.skipped,
+                "rejected": self.rejected,
+                "passed_to_llm": self.checked - self.rejected,
+                "reject_rate": round(self.rejected / self.checked, 4) if self.checked else 0,
+                "average_coverage": round(self._coverage_sum / self.checked, 4) if self.checked else 0,
+                "llm_calls_saved": self.rejected * self.LLM_CALLS_PER_REJECT
+            }
+
+prefilter_stats = PrefilterStats()
+
+def prefilter_enabled() -> bool:
+    return os.getenv("SKILL_PREFILTER_ENABLED", "true").lower() != "false"
+
+def prefilter_min_requirements() -> int:
+    """Minimum number of requirements naming a known skill for a local reject"""
+    return int(os.getenv("SKILL_PREFILTER_MIN_REQUIREMENTS", "3"))
+
+def prefilter_min_recognized() -> float:
+    """Minimum share of requirements naming a known skill for the pre-filter to decide"""
+    return float(os.getenv("SKILL_PREFILTER_MIN_RECOGNIZED", "0.5"))
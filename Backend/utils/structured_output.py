@@ -0,0 +1,236 @@
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_PARTIAL_ESCAPE_RE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+_CLOSERS = {"{": "}", "[": "]"}
+
+class StructuredOutputError(ValueError):
+    """LLM answer that is not valid JSON for its schema, even after repair"""
+
+def strip_fences(content: str) -> str:
+    """JSON text of an answer, without markdown code fences around it"""
+    content = content.strip()
+    if "```" in content:
+        match = _FENCE_RE.search(content)
+        if match:
+            return match.group(1).strip()
+    return content
+
+class _Frame:
+    """Open container while scanning: its bracket and what comes next"""
+    __slots__ = ("bracket", "expect")
+
+    def __init__(self, bracket: str):
+        self.bracket = bracket
+        # object: key -> colon -> value -> comma; array: value -> comma
+        self.expect = "key" if bracket == "{" else "value"
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Best-effort valid JSON from a damaged answer, None if there is none
+
+    One pass over the text from the first { or [, tracking open
+    containers and strings. Prose around the JSON and trailing commas
+    are dropped. A truncated answer (cut by max tokens or a dropped
+    connection) keeps everything up to its last complete value, or the
+    partial string value it was cut in, and the open containers are
+    closed, so no second LLM call is needed. A number or literal cut at
+    the very end is dropped rather than trusted
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+
+    out: List[str] = []
+    stack: List[_Frame] = []
+    safe: Tuple[int, List[str]] = (0, [])
+    in_string = is_key = escaped = False
+    token: List[str] = []
+
+    def value_done():
+        nonlocal safe
+        if stack:
+            stack[-1].expect = "comma"
+        safe = (len(out), [f.bracket for f in stack])
+
+    def flush_token() -> bool:
+        if not token:
+            return True
+        literal = "".join(token)
+        token.clear()
+        try:
+            json.loads(literal)
+        except ValueError:
+            return False
+        out.append(literal)
+        value_done()
+        return True
+
+    for char in text[min(starts):]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if is_key:
+                    stack[-1].expect = "colon"
+                else:
+                    value_done()
+            continue
+
+        if char.isspace():
+            if not flush_token():
+                break
+            continue
+        if char in ",:]}" and not flush_token():
+            break
+
+        if char == '"':
+            is_key = bool(stack) and stack[-1].bracket == "{" and stack[-1].expect == "key"
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append(_Frame(char))
+            out.append(char)
+            safe = (len(out), [f.bracket for f in stack])
+        elif char in "]}":
+            if not stack or _CLOSERS[stack[-1].bracket] != char:
+                break
+            while out and out[-1] in ", \n\t":
+                out.pop()
+            stack.pop()
+            out.append(char)
+            value_done()
+            if not stack:
+                return "".join(out)
+        elif char == ",":
+            if stack:
+                stack[-1].expect = "key" if stack[-1].bracket == "{" else "value"
+            out.append(char)
+        elif char == ":":
+            if stack:
+                stack[-1].expect = "value"
+            out.append(char)
+        else:
+            token.append(char)
+    # A bare literal still open at the end is dropped: "score": 7 may have been 75
+
+    if not stack:
+        return "".join(out) if out else None
+
+    if in_string and not is_key:
+        # Cut inside a string value: keep the part received
+        partial = _PARTIAL_ESCAPE_RE.sub("", "".join(out))
+        return partial + '"' + "".join(_CLOSERS[f.bracket] for f in reversed(stack))
+
+    length, brackets = safe
+    kept = "".join(out[:length]).rstrip().rstrip(",")
+    return kept + "".join(_CLOSERS[b] for b in reversed(brackets))
+
+def needs_repair(content: str) -> bool:
+    """Whether an answer is only usable after repair_json (not worth caching)"""
+    try:
+        json.loads(strip_fences(content))
+    except ValueError:
+        return True
+    return False
+
+def parse_json(content: str) -> Tuple[Any, bool]:
+    """(parsed JSON, whether it needed repair); raises StructuredOutputError"""
+    text = strip_fences(content)
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+
+    repaired = repair_json(text)
+    if repaired is not None:
+        try:
+            return json.loads(repaired), True
+        except ValueError:
+            pass
+    raise StructuredOutputError(f"Invalid JSON in LLM answer: {content[:200]!r}")
+
+class StructuredOutputStats:
+    """Parse outcomes of LLM answers, per node"""
+
+    OUTCOMES = ("parsed", "repaired", "invalid_json", "invalid_schema")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, node: str, outcome: str, count: int = 1):
+        with self._lock:
+            counters = self._nodes.setdefault(node, dict.fromkeys(self.OUTCOMES + ("invalid_items",), 0))
+            counters[outcome] += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            nodes = {}
+            for node, counters in self._nodes.items():
+                answers = sum(counters[o] for o in self.OUTCOMES)
+                failed = counters["invalid_json"] + counters["invalid_schema"]
+                nodes[node] = {
+                    "answers": answers,
+                    **counters,
+                    "failure_rate": round(failed / answers, 4) if answers else 0,
+                    "repair_rate": round(counters["repaired"] / answers, 4) if answers else 0
+                }
+            return nodes
+
+structured_output_stats = StructuredOutputStats()
+
+def _content(response: Any) -> str:
+    return response.content if hasattr(response, "content") else str(response)
+
+def parse_structured(response: Any, schema: Type[T], node: str) -> T:
+    """
+    LLM answer (message or text) validated against a Pydantic schema
+
+    Fences and prose are stripped and truncated JSON is repaired before
+    validating. The outcome is counted under node; raises
+    StructuredOutputError when the answer can't be used
+    """
+    try:
+        parsed, repaired = parse_json(_content(response))
+    except StructuredOutputError:
+        structured_output_stats.record(node, "invalid_json")
+        raise
+
+    try:
+        result = schema.model_validate(parsed)
+    except ValidationError as e:
+        structured_output_stats.record(node, "invalid_schema")
+        raise StructuredOutputError(f"LLM answer doesn't match {schema.__name__}: {e.errors()[:3]}")
+
+    if repaired:
+        logger.info(f"🩹 Repaired malformed JSON answer of {node}")
+    structured_output_stats.record(node, "repaired" if repaired else "parsed")
+    return result
+
+def validate_items(items: List[Any], schema: Type[T], node: str) -> List[Optional[T]]:
+    """Each item validated on its own (None if invalid), so one bad entry doesn't sink a batch"""
+    results: List[Optional[T]] = []
+    for item in items:
+        try:
+            results.append(schema.model_validate(item))
+        except ValidationError:
+            results.append(None)
+    invalid = results.count(None)
+    if invalid:
+        structured_output_stats.record(node, "invalid_items", invalid)
+    return results
@@ -2,6 +2,8 @@ from supabase import create_client
 import os
 from typing import Dict, Any, Optional, List
 import logging
+from utils.company_stats import StatsAccumulator
+from utils.pagination import decode_cursor, page_response, with_keyset
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +50,30 @@ class SupabaseClient:
             logger.error(f"Error updating candidate: {e}")
             return None
     
+    def update_candidates(self, updates: List[Dict[str, Any]]):
+        """
+        Update several candidates in one request
+
+        Each update carries the candidate id; updates of the same
+        candidate are merged, later values win. Uses the update_candidates
+        function (db/migrations/003_bulk_writes.sql), one request per
+        candidate if it is not available
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for update in updates:
+            merged.setdefault(update['id'], {}).update(update)
+
+        try:
+            return self.client.rpc('update_candidates', {'p_updates': list(merged.values())}).execute()
+        except Exception as e:
+            logger.warning(f"update_candidates RPC unavailable, updating one by one: {e}")
+
+        results = [
+            self.update_candidate(candidate_id, {k: v for k, v in data.items() if k != 'id'})
+            for candidate_id, data in merged.items()
+        ]
+        return results if all(r is not None for r in results) else None
+    
     # ============== EVALUATIONS ==============
     
     def create_evaluation(self, evaluation_data: Dict[str, Any]):
@@ -58,6 +84,21 @@ class SupabaseClient:
             logger.error(f"Error creating evaluation: {e}")
             return None
     
+    def create_evaluations(self, evaluations: List[Dict[str, Any]]):
+        """
+        Create several evaluations in one request
+
+        Rows carry their own id and duplicates are ignored, so retrying a
+        batch whose response was lost does not insert it twice
+        """
+        try:
+            return self.client.table('evaluations').upsert(
+                evaluations, on_conflict='id', ignore_duplicates=True
+            ).execute()
+        except Exception as e:
+            logger.error(f"Error creating evaluations: {e}")
+            return None
+    
     def get_evaluation(self, evaluation_id: str):
         """Get evaluation by ID"""
         try:
@@ -79,6 +120,36 @@ class SupabaseClient:
             logger.error(f"Error getting evaluations: {e}")
             return []
     
+    def get_evaluations_page(self, company_id: str, limit: int = 100, cursor: Optional[str] = None,
+                             fields: Optional[List[str]] = None):
+        """
+        One page of a company's evaluations, newest first
+
+        Keyset pagination on (evaluated_at, id): the page after cursor is
+        read straight from the idx_evaluations_company_keyset index, so
+        every page costs the same. fields limits the selected columns.
+        Returns {"evaluations", "next_cursor"}, None on error
+        """
+        try:
+            query = self.client.table('evaluations').select(
+                ','.join(with_keyset(fields))
+            ).eq('company_id', company_id)
+
+            if cursor:
+                evaluated_at, row_id = decode_cursor(cursor)
+                query = query.or_(
+                    f'evaluated_at.lt."{evaluated_at}",'
+                    f'and(evaluated_at.eq."{evaluated_at}",id.lt.{row_id})'
+                )
+
+            response = query.order('evaluated_at', desc=True).order(
+                'id', desc=True
+            ).limit(limit + 1).execute()
+            return page_response(response.data or [], limit)
+        except Exception as e:
+            logger.error(f"Error getting evaluations page: {e}")
+            return None
+    
     # ============== JOBS ==============
     
     def get_job(self, job_id: str):
@@ -94,27 +165,48 @@ class SupabaseClient:
     # ============== STATS ==============
     
     def get_stats(self, company_id: str):
-        """Get company statistics"""
+        """
+        Get company statistics
+
+        Read by the company_stats function from per-company rollups kept
+        by triggers (db/migrations/005), so the cost does not grow with
+        the number of evaluations. If it is not available the same numbers
+        are computed locally from a projected, paged scan, which is
+        linear in the company's evaluations (seconds at 100k rows)
+        """
+        stats = self.get_stats_accumulator(company_id)
+        return stats.to_response() if stats is not None else {}
+
+    def get_stats_accumulator(self, company_id: str, days: int = 30) -> Optional[StatsAccumulator]:
+        """Company stats as a StatsAccumulator (loader of CompanyStatsCache), None on error"""
         try:
-            # Count evaluations
-            evals = self.client.table('evaluations').select('*').eq(
-                'company_id', company_id
+            response = self.client.rpc(
+                'company_stats', {'p_company_id': company_id, 'p_days': days}
             ).execute()
-            
-            if not evals.data:
-                return {"total_evaluations": 0}
-            
-            # Calculate averages
-            total = len(evals.data)
-            avg_score = sum(e.get('overall_score', 0) for e in evals.data) / total if total > 0 else 0
-            
-            return {
-                "total_evaluations": total,
-                "average_score": round(avg_score, 2),
-                "recommended": sum(1 for e in evals.data if e.get('recommendation') == 'hire'),
-                "maybe": sum(1 for e in evals.data if e.get('recommendation') == 'maybe'),
-                "rejected": sum(1 for e in evals.data if e.get('recommendation') == 'reject')
-            }
+            return StatsAccumulator.from_aggregate(response.data or {})
+        except Exception as e:
+            logger.warning(f"company_stats RPC unavailable, aggregating locally: {e}")
+
+        try:
+            return self._get_stats_local(company_id)
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
-            return {}
+            return None
+
+    def _get_stats_local(self, company_id: str, page_size: int = 1000) -> StatsAccumulator:
+        """Local fallback: only the needed columns, page by page (O(evaluations))"""
+        stats = StatsAccumulator()
+        start = 0
+        while True:
+            page = self.client.table('evaluations').select(
+                'overall_score,recommendation,evaluated_at'
+            ).eq(
+                'company_id', company_id
+            ).order('id').range(start, start + page_size - 1).execute()
+
+            rows = page.data or []
+            for row in rows:
+                stats.add(row.get('overall_score'), row.get('recommendation'), row.get('evaluated_at'))
+            if len(rows) < page_size:
+                return stats
+            start += page_size
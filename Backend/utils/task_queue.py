@@ -0,0 +1,362 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class TaskStatus:
+    """Task lifecycle values stored in the queue"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class TaskQueue:
+    """
+    Durable local queue of evaluation tasks backed by SQLite
+
+    Every task is a row; workers claim the oldest queued row inside a
+    write transaction, so a task is handed to exactly one worker. Several
+    processes may share the file: each claim records this queue's owner
+    id and a heartbeat the worker keeps fresh, and recover() only requeues
+    running rows whose heartbeat is older than lease_seconds, so a
+    restarting process never takes tasks a live peer is still running.
+    A task whose worker was lost max_attempts times is marked failed
+    instead of requeued, and finished tasks are deleted by purge() once
+    older than retention_seconds
+    """
+
+    def __init__(self, path: str = "data/tasks.db", lease_seconds: float = 120.0,
+                 max_attempts: int = 3, retention_seconds: float = 7 * 24 * 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                company_id TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+        """)
+        # Queue files created before leases existed
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {kind}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_finished ON tasks (finished_at)")
+
+    def submit(self, payload: Dict[str, Any]) -> str:
+        """Queue a task and return its id"""
+        task_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (id, company_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (task_id, payload.get("company_id"), json.dumps(payload), TaskStatus.QUEUED, time.time())
+            )
+        return task_id
+
+    def submit_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        """Queue several tasks in one transaction"""
+        now = time.time()
+        rows = [
+            (uuid.uuid4().hex, p.get("company_id"), json.dumps(p), TaskStatus.QUEUED, now)
+            for p in payloads
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO tasks (id, company_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [row[0] for row in rows]
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued task as running and return it"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload FROM tasks WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (TaskStatus.QUEUED,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                now = time.time()
+                self._conn.execute(
+                    "UPDATE tasks SET status = ?, started_at = ?, heartbeat_at = ?, owner = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (TaskStatus.RUNNING, now, now, self.owner, row["id"])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return {"id": row["id"], "payload": json.loads(row["payload"])}
+
+    def heartbeat(self, task_ids: List[str]) -> int:
+        """Renew the lease of tasks this queue is running, returns how many it still owns"""
+        if not task_ids:
+            return 0
+        placeholders = ", ".join("?" * len(task_ids))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE tasks SET heartbeat_at = ? WHERE status = ? AND owner = ? AND id IN ({placeholders})",
+                (time.time(), TaskStatus.RUNNING, self.owner, *task_ids)
+            )
+        return cursor.rowcount
+
+    def complete(self, task_id: str, result: Dict[str, Any]) -> bool:
+        """Store the result of a finished task"""
+        return self._finish(task_id, TaskStatus.COMPLETED, result=json.dumps(result, default=str))
+
+    def fail(self, task_id: str, error: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Mark a task as failed"""
+        return self._finish(
+            task_id, TaskStatus.FAILED,
+            result=json.dumps(result, default=str) if result is not None else None,
+            error=error
+        )
+
+    def _finish(self, task_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        # False when the lease was lost and the task requeued, the new run owns the row
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, error = ?, finished_at = ?, heartbeat_at = NULL "
+                "WHERE id = ? AND status = ? AND owner = ?",
+                (status, result, error, time.time(), task_id, TaskStatus.RUNNING, self.owner)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task with its result, None if unknown"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "task_id": row["id"],
+            "company_id": row["company_id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "error": row["error"],
+            "result": json.loads(row["result"]) if row["result"] else None
+        }
+
+    def recover(self) -> int:
+        """
+        Requeue running tasks whose lease expired (their worker stopped or hung)
+
+        Tasks already claimed max_attempts times are marked failed instead,
+        so one that brings its worker down every time isn't retried forever.
+        Returns how many were requeued
+        """
+        now = time.time()
+        expired = now - self.lease_seconds
+        lost = "COALESCE(heartbeat_at, started_at, 0) < ?"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self._conn.execute(
+                    f"UPDATE tasks SET status = ?, error = ?, finished_at = ?, heartbeat_at = NULL "
+                    f"WHERE status = ? AND {lost} AND attempts >= ?",
+                    (TaskStatus.FAILED, f"Worker lost on each of {self.max_attempts} attempts", now,
+                     TaskStatus.RUNNING, expired, self.max_attempts)
+                ).rowcount
+                requeued = self._conn.execute(
+                    f"UPDATE tasks SET status = ?, started_at = NULL, heartbeat_at = NULL, owner = NULL "
+                    f"WHERE status = ? AND {lost}",
+                    (TaskStatus.QUEUED, TaskStatus.RUNNING, expired)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if failed:
+            logger.error(f"❌ Gave up on {failed} tasks after {self.max_attempts} attempts")
+        return requeued
+
+    def purge(self) -> int:
+        """Delete completed and failed tasks finished more than retention_seconds ago"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM tasks WHERE finished_at < ? AND status IN (?, ?)",
+                (time.time() - self.retention_seconds, TaskStatus.COMPLETED, TaskStatus.FAILED)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per status and age of the oldest queued task"""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM tasks WHERE status = ?", (TaskStatus.QUEUED,)
+            ).fetchone()[0]
+            running_since = self._conn.execute(
+                "SELECT MIN(started_at) FROM tasks WHERE status = ?", (TaskStatus.RUNNING,)
+            ).fetchone()[0]
+
+        now = time.time()
+        return {
+            "queued": counts.get(TaskStatus.QUEUED, 0),
+            "running": counts.get(TaskStatus.RUNNING, 0),
+            "completed": counts.get(TaskStatus.COMPLETED, 0),
+            "failed": counts.get(TaskStatus.FAILED, 0),
+            "oldest_queued_age_s": round(now - oldest, 3) if oldest else 0,
+            "longest_running_s": round(now - running_since, 3) if running_since else 0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class TaskWorkerPool:
+    """
+    Pool of asyncio workers draining a TaskQueue
+
+    handler receives the task payload and returns a result dict; a result
+    with success=False or a raised exception marks the task as failed.
+    While tasks run, their leases are renewed every lease_seconds / 3;
+    as often, expired leases (of this or any other process) are requeued
+    and old finished tasks purged
+    """
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[str] = set()
+
+    def start(self):
+        self._recover()
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"task-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain(), name="task-maintenance"))
+
+    def _recover(self):
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info(f"♻️ Requeued {recovered} interrupted tasks")
+            self.notify()
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                running = list(self._running)
+                owned = await asyncio.to_thread(self.queue.heartbeat, running)
+                if owned < len(running):
+                    logger.warning(f"Task leases lost for {len(running) - owned} running tasks")
+                await asyncio.to_thread(self._recover)
+                purged = await asyncio.to_thread(self.queue.purge)
+                if purged:
+                    logger.info(f"🧹 Purged {purged} finished tasks")
+            except Exception as e:
+                logger.error(f"Task queue maintenance error: {e}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers after a submit"""
+        self._wakeup.set()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            # Cleared before claiming so a submit in between is never missed
+            self._wakeup.clear()
+            try:
+                task = await asyncio.to_thread(self.queue.claim)
+            except Exception as e:
+                logger.error(f"Task worker {worker_id} claim error: {e}")
+                task = None
+
+            if task is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(worker_id, task)
+
+    async def _run(self, worker_id: int, task: Dict[str, Any]):
+        task_id = task["id"]
+        self._running.add(task_id)
+        try:
+            result = await self.handler(task["payload"])
+        except asyncio.CancelledError:
+            # Shutdown: the row stays running and is requeued once its lease expires
+            raise
+        except Exception as e:
+            logger.error(f"Task {task_id} failed on worker {worker_id}: {e}")
+            finished = await asyncio.to_thread(self.queue.fail, task_id, str(e))
+        else:
+            if result.get("success", True):
+                finished = await asyncio.to_thread(self.queue.complete, task_id, result)
+            else:
+                finished = await asyncio.to_thread(self.queue.fail, task_id, str(result.get("error")), result)
+        finally:
+            self._running.discard(task_id)
+
+        if not finished:
+            logger.warning(f"Task {task_id} lease expired before worker {worker_id} finished, result dropped")
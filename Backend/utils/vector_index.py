@@ -0,0 +1,221 @@
+import logging
+import math
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.skill_matcher import SKILL_SYNONYMS, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Frequent English/Spanish words that only add noise to CV similarity
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it of on or the to with was were will
+al con de del el en es la las lo los para por que se su sus un una y o e
+""".split())
+
+@lru_cache(maxsize=1)
+def _canonical_tokens() -> Dict[str, str]:
+    """Single-token skill alias -> canonical skill, so 'k8s' and 'kubernetes' share a feature"""
+    canonical = {}
+    for skill, aliases in SKILL_SYNONYMS.items():
+        for alias in [skill] + aliases:
+            tokens = tokenize(alias)
+            if len(tokens) == 1:
+                canonical[tokens[0]] = skill
+    return canonical
+
+def _features(text: str) -> Counter:
+    """Word unigrams and bigrams with stopwords dropped and skill aliases merged"""
+    canonical = _canonical_tokens()
+    words = [canonical.get(t, t) for t in tokenize(text) if t not in STOPWORDS and len(t) > 1]
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return features
+
+class HashingVectorizer:
+    """
+    Text -> fixed-size vector through the hashing trick
+
+    Each feature is hashed (crc32) to one of dim buckets with a hash-based
+    sign, so collisions tend to cancel out. Counts are log-scaled and the
+    vector is L2-normalized, so a dot product is the cosine similarity.
+    Nothing is fitted: any text can be vectorized at any time
+    """
+
+    def __init__(self, dim: int = 2048):
+        self.dim = dim
+        # Vocabularies repeat a lot across CVs: hash each feature once
+        self._bucket = lru_cache(maxsize=200_000)(self._hash)
+
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode())
+        return h % self.dim, (1.0 if h & 0x80000000 else -1.0)
+
+    def transform(self, text: str) -> np.ndarray:
+        features = _features(text)
+        if not features:
+            return np.zeros(self.dim, dtype=np.float32)
+        buckets, weights = [], []
+        for feature, count in features.items():
+            bucket, sign = self._bucket(feature)
+            buckets.append(bucket)
+            weights.append(sign * (1.0 + math.log(count)))
+        vector = np.bincount(buckets, weights=weights, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class JobIndex:
+    """
+    CV vectors of one job's candidates in a growable NumPy matrix
+
+    Rows are inserted or replaced per candidate; removal swaps the last
+    row in, so the live rows stay contiguous and a search is a single
+    matrix-vector product over them. A document frequency per bucket is
+    kept up to date, so queries can weight rare terms up (TF-IDF style)
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 64):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._df = np.zeros(dim, dtype=np.int32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, candidate_id: str, vector: np.ndarray):
+        with self._lock:
+            row = self._rows.get(candidate_id)
+            if row is None:
+                row = len(self._ids)
+                if row == len(self._matrix):
+                    self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                self._ids.append(candidate_id)
+                self._rows[candidate_id] = row
+            else:
+                self._df -= self._matrix[row] != 0
+            self._matrix[row] = vector
+            self._df += vector != 0
+
+    def remove(self, candidate_id: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(candidate_id, None)
+            if row is None:
+                return False
+            self._df -= self._matrix[row] != 0
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._matrix[last] = 0
+            self._ids.pop()
+            return True
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Top k (candidate_id, cosine similarity), best first"""
+        with self._lock:
+            n = len(self._ids)
+            if not n or k <= 0:
+                return []
+            idf = np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+            # float32 throughout: a float64 query would upcast the whole matrix
+            weighted = (query * idf).astype(np.float32)
+            norm = np.linalg.norm(weighted)
+            if not norm:
+                return []
+            scores = self._matrix[:n] @ (weighted / norm)
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._ids[i], round(float(scores[i]), 4)) for i in top]
+
+    def memory_bytes(self) -> int:
+        return self._matrix.nbytes + self._df.nbytes
+
+class CandidateIndex:
+    """
+    Per-job similarity index over candidate CVs, held in memory
+
+    Used to shortlist large applicant pools before running the agent:
+    candidates are vectorized once when added, and ranking a job's pool
+    against its requirements is one matrix product. Jobs least recently
+    used are evicted past max_jobs
+    """
+
+    def __init__(self, dim: int = 2048, max_jobs: int = 200):
+        self.vectorizer = HashingVectorizer(dim)
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, JobIndex]" = OrderedDict()
+        self._counters = {"indexed": 0, "removed": 0, "searches": 0, "evictions": 0}
+
+    def _job(self, job_id: str, create: bool = False) -> Optional[JobIndex]:
+        with self._lock:
+            index = self._jobs.get(job_id)
+            if index is None and create:
+                index = self._jobs[job_id] = JobIndex(self.vectorizer.dim)
+                while len(self._jobs) > self.max_jobs:
+                    evicted, _ = self._jobs.popitem(last=False)
+                    self._counters["evictions"] += 1
+                    logger.info(f"🧠 Candidate index of job {evicted} evicted")
+            if index is not None:
+                self._jobs.move_to_end(job_id)
+            return index
+
+    def add(self, job_id: str, candidates: Iterable[Tuple[str, str]]) -> int:
+        """Index (candidate_id, cv_text) pairs; re-adding a candidate replaces its vector"""
+        index = self._job(job_id, create=True)
+        added = 0
+        for candidate_id, cv_text in candidates:
+            index.upsert(candidate_id, self.vectorizer.transform(cv_text))
+            added += 1
+        with self._lock:
+            self._counters["indexed"] += added
+        return added
+
+    def remove(self, job_id: str, candidate_id: str) -> bool:
+        index = self._job(job_id)
+        removed = bool(index and index.remove(candidate_id))
+        if removed:
+            with self._lock:
+                self._counters["removed"] += 1
+        return removed
+
+    def drop(self, job_id: str) -> int:
+        """Forget a job's whole index; returns how many candidates it held"""
+        with self._lock:
+            index = self._jobs.pop(job_id, None)
+        return len(index) if index else 0
+
+    def search(self, job_id: str, query_text: str, k: int = 50) -> Optional[List[Tuple[str, float]]]:
+        """Best k candidates of a job for the query text, None if the job has no index"""
+        index = self._job(job_id)
+        if index is None:
+            return None
+        with self._lock:
+            self._counters["searches"] += 1
+        return index.search(self.vectorizer.transform(query_text), k)
+
+    def size(self, job_id: str) -> int:
+        index = self._job(job_id)
+        return len(index) if index else 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            return {
+                "jobs": len(jobs),
+                "candidates": sum(len(index) for index in jobs),
+                "dim": self.vectorizer.dim,
+                "memory_mb": round(sum(index.memory_bytes() for index in jobs) / (1024 * 1024), 2),
+                **self._counters
+            }